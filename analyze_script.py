@@ -11,7 +11,11 @@ from scipy import stats
 from typing import Dict, List, Tuple, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
+import glob
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
 from pathlib import Path
 
 # ============================================================================
@@ -30,6 +34,33 @@ class AnalysisConfig:
     NEAR_SIGNIFICANCE_LEVEL = 0.10
     CONFIDENCE_INTERVAL = 0.95
     
+    # 多重比較校正：None (不校正)、'fdr_bh' (Benjamini-Hochberg) 或 'holm'
+    # 校正範圍為所有音樂類型 × 維度；設定後顯著性依校正後的 p 值判斷
+    MULTIPLE_COMPARISON_CORRECTION = None
+    
+    # 重抽樣推論設定 (bootstrap 信賴區間、符號翻轉排列檢定)
+    BOOTSTRAP_RESAMPLES = 10000
+    PERMUTATION_RESAMPLES = 10000
+    RESAMPLING_SEED = None                 # 設定整數可重現結果
+    RESAMPLING_CHUNK_ELEMENTS = 2_000_000  # 每批重抽樣矩陣的元素數上限 (限制記憶體)
+    EXACT_PERMUTATION_MAX_N = 13           # 樣本數不超過此值時列舉全部 2^n 種符號組合
+    
+    # 多場次 (受試者內) 設計設定
+    SESSION_RESULTS_PATH = './test_result'
+    SESSION_SUBJECT_COLUMN = 'subject_id'
+    SESSION_COLUMN = 'session_number'
+    CATEGORY_COLUMN = 'category'
+    SESSION_KEY_COLUMNS = ['subject_id', 'session_number', 'group', 'category', 'phase']
+    POSTHOC_CORRECTION = 'holm'            # 事後兩兩比較的校正方法 (每個結果變項內)
+    
+    # 檢定力模擬設定 (規劃中的設計與 ExperimentConfig.TOTAL_SUBJECTS / TOTAL_SESSIONS 一致，
+    # 受試者依 A/B 組別交替分派播放順序)
+    PLANNED_SUBJECTS = 30
+    PLANNED_SESSIONS = 6
+    POWER_SAMPLE_SIZES = list(range(10, 81))
+    POWER_REPLICATES = 5000
+    POWER_TARGET = 0.80
+    
     # 評分量表設定
     RATING_SCALE_MIN = 1
     RATING_SCALE_MAX = 5
@@ -101,49 +132,253 @@ class StatisticalResult:
     degrees_freedom: int
     effect_size: float
     sample_size: int
+    p_adjusted: Optional[float] = None
+    correction: Optional[str] = None
+    
+    @property
+    def effective_p(self) -> float:
+        """判斷顯著性使用的 p 值（有多重比較校正時為校正後的 p 值）"""
+        return self.p_adjusted if self.p_adjusted is not None else self.p_value
     
     def is_significant(self) -> bool:
-        return self.p_value < AnalysisConfig.SIGNIFICANCE_LEVEL
+        return self.effective_p < AnalysisConfig.SIGNIFICANCE_LEVEL
     
     def is_near_significant(self) -> bool:
-        return self.p_value < AnalysisConfig.NEAR_SIGNIFICANCE_LEVEL
+        return self.effective_p < AnalysisConfig.NEAR_SIGNIFICANCE_LEVEL
     
     def get_significance_level(self) -> str:
-        if self.p_value < 0.01:
+        if self.effective_p < 0.01:
             return 'highly_significant'
-        elif self.p_value < 0.05:
+        elif self.effective_p < 0.05:
             return 'significant'
-        elif self.p_value < 0.10:
+        elif self.effective_p < 0.10:
             return 'near_significant'
         else:
             return 'not_significant'
 
+@dataclass
+class ResamplingResult:
+    """重抽樣推論結果模型"""
+    dimension: str
+    genre: str
+    sample_size: int
+    mean_difference: float
+    mean_difference_ci: Tuple[float, float]
+    effect_size: float                      # 有方向的 Cohen's d (EQ - Flat)
+    effect_size_ci: Tuple[float, float]
+    permutation_p: float
+    bootstrap_resamples: int
+    permutation_resamples: int              # 列舉全部組合時為 2^n
+    exact_permutation: bool
+    confidence: float
+
+@dataclass
+class RepeatedMeasuresResult:
+    """重複量數分析結果模型"""
+    method: str                # 'anova' 或 'friedman'
+    factor: str                # 受試者內因子欄位 (如 session_number、category)
+    levels: List[Any]          # 因子水準 (依分析順序)
+    table: pd.DataFrame        # 每個結果變項一列的整體檢定
+    posthoc: pd.DataFrame      # 每個結果變項 × 水準配對一列的事後比較
+
+@dataclass
+class PowerResult:
+    """蒙地卡羅檢定力模擬結果模型"""
+    analysis: str              # 'paired' 或 'repeated_measures'
+    outcome: str               # 維度或結果變項
+    genre: Optional[str]       # 配對分析的音樂類型
+    effect_size: float         # 配對：d_z (平均差異 / 差異標準差)；重複量數：Cohen's f
+    order_effect: float        # 模擬時加入的播放順序效果 (第二首 - 第一首)
+    sample_sizes: np.ndarray
+    power: np.ndarray
+    replicates: int
+    alpha: float
+    
+    @property
+    def standard_error(self) -> np.ndarray:
+        """各樣本數檢定力估計的蒙地卡羅標準誤"""
+        return np.sqrt(self.power * (1 - self.power) / self.replicates)
+    
+    def power_at(self, sample_size: int) -> float:
+        """指定樣本數的檢定力 (未模擬的樣本數為 NaN)"""
+        match = np.flatnonzero(self.sample_sizes == sample_size)
+        return float(self.power[match[0]]) if len(match) else np.nan
+    
+    def required_n(self, target: Optional[float] = None) -> Optional[int]:
+        """達到目標檢定力的最小樣本數；模擬範圍內皆未達到時為 None"""
+        target = AnalysisConfig.POWER_TARGET if target is None else target
+        reached = np.flatnonzero(self.power >= target)
+        return int(self.sample_sizes[reached[0]]) if len(reached) else None
+
 class ExperimentDataModel:
-    """實驗資料核心模型"""
+    """
+    實驗資料核心模型
     
-    def __init__(self):
-        self.subjects_data: List[SubjectData] = []
+    資料以欄位方式保存在 DataFrame（受試者與音樂類型為 category），
+    音樂類型與受試者的列索引在載入時建立一次，篩選不需逐筆掃描。
+    SubjectData 只在呼叫舊有存取方法時才依列索引產生。
+    """
+    
+    KEY_COLUMNS = (AnalysisConfig.SUBJECT_COLUMN, AnalysisConfig.ROUND_COLUMN, AnalysisConfig.GENRE_COLUMN)
+    
+    def __init__(self, frame: Optional[pd.DataFrame] = None):
         self.metadata: Dict[str, Any] = {}
+        self._pending: List[SubjectData] = []
+        if frame is None:
+            frame = pd.DataFrame({column: [] for column in self.KEY_COLUMNS})
+        self._set_frame(frame)
+    
+    def _set_frame(self, frame: pd.DataFrame):
+        """設定資料表並建立類別代碼與群組索引"""
+        frame = frame.reset_index(drop=True)
+        subject_col, round_col, genre_col = self.KEY_COLUMNS
+        frame[subject_col] = frame[subject_col].astype(str).astype('category')
+        frame[genre_col] = frame[genre_col].astype(str).astype('category')
+        frame[round_col] = pd.to_numeric(frame[round_col], errors='coerce').fillna(0).astype(int)
+        self._frame = frame
+        self.response_columns: List[str] = [
+            column for column in frame.columns
+            if column not in self.KEY_COLUMNS and column != '' and not str(column).startswith('Unnamed')
+        ]
+        self.genre_codes = frame[genre_col].cat.codes.to_numpy()
+        self.subject_codes = frame[subject_col].cat.codes.to_numpy()
+        self._genre_index = self._build_index(frame[genre_col])
+        self._subject_index = self._build_index(frame[subject_col])
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._subjects_data: Optional[List[SubjectData]] = None
+        self._results: Dict[Any, Any] = {}
+    
+    @staticmethod
+    def _build_index(column: pd.Series) -> Dict[str, np.ndarray]:
+        """類別值 -> 列索引（依第一次出現的順序），一次排序建立"""
+        codes = column.cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(column.cat.categories) + 1))
+        first_seen = pd.unique(codes[codes >= 0])
+        return {
+            column.cat.categories[code]: order[bounds[code]:bounds[code + 1]]
+            for code in first_seen
+        }
+    
+    def _flush(self):
+        """將 add_subject_data 累積的資料併入資料表"""
+        if not self._pending:
+            return
+        records = [
+            {AnalysisConfig.SUBJECT_COLUMN: data.subject_id,
+             AnalysisConfig.ROUND_COLUMN: data.round_number,
+             AnalysisConfig.GENRE_COLUMN: data.genre,
+             **data.responses}
+            for data in self._pending
+        ]
+        self._pending = []
+        frame = self._frame.astype({AnalysisConfig.SUBJECT_COLUMN: str, AnalysisConfig.GENRE_COLUMN: str})
+        self._set_frame(pd.concat([frame, pd.DataFrame(records)], ignore_index=True))
+    
+    @property
+    def frame(self) -> pd.DataFrame:
+        """欄位式資料表"""
+        self._flush()
+        return self._frame
+    
+    @property
+    def subjects_data(self) -> List[SubjectData]:
+        """所有資料列的 SubjectData（第一次存取時產生）"""
+        self._flush()
+        if self._subjects_data is None:
+            self._subjects_data = self._make_subject_data(np.arange(len(self._frame)))
+        return self._subjects_data
+    
+    def _make_subject_data(self, rows: np.ndarray) -> List[SubjectData]:
+        subset = self._frame.iloc[rows]
+        responses = subset[self.response_columns].to_dict('records')
+        return [
+            SubjectData(subject_id=subject, round_number=int(round_number), genre=genre, responses=response)
+            for subject, round_number, genre, response in zip(
+                subset[AnalysisConfig.SUBJECT_COLUMN].astype(str),
+                subset[AnalysisConfig.ROUND_COLUMN],
+                subset[AnalysisConfig.GENRE_COLUMN].astype(str),
+                responses)
+        ]
     
     def add_subject_data(self, subject_data: SubjectData):
         """新增受試者資料"""
-        self.subjects_data.append(subject_data)
+        self._pending.append(subject_data)
+    
+    def cached_result(self, key: Any, compute):
+        """
+        取得以 key 記錄的分析結果，尚未計算時呼叫 compute() 並保存
+        
+        資料改變（新增資料列）時所有記錄的結果都會失效。
+        """
+        self._flush()
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+    
+    def __len__(self) -> int:
+        return len(self.frame)
+    
+    def genre_rows(self, genre: str) -> np.ndarray:
+        """音樂類型的列索引"""
+        self._flush()
+        return self._genre_index.get(genre, np.zeros(0, dtype=np.intp))
+    
+    def subject_rows(self, subject_name: str) -> np.ndarray:
+        """受試者的列索引"""
+        self._flush()
+        return self._subject_index.get(subject_name, np.zeros(0, dtype=np.intp))
+    
+    def column_values(self, column: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """回應欄位的 float64 陣列（非數值為 NaN），可只取指定列"""
+        self._flush()
+        values = self._numeric.get(column)
+        if values is None:
+            if column in self._frame.columns:
+                values = pd.to_numeric(self._frame[column], errors='coerce').to_numpy(dtype=float)
+            else:
+                values = np.full(len(self._frame), np.nan)
+            self._numeric[column] = values
+        return values if rows is None else values[rows]
+    
+    def paired_values(self, dimension: str, genre: Optional[str] = None,
+                      subject_name: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        維度的 (Flat, EQ) 配對數值，只保留兩者皆有值的列
+        
+        Args:
+            dimension: 分析維度 (如 'liking')
+            genre: 只取此音樂類型
+            subject_name: 只取此受試者
+        """
+        self._flush()
+        rows = np.arange(len(self._frame))
+        if genre is not None:
+            rows = self.genre_rows(genre)
+        if subject_name is not None:
+            rows = np.intersect1d(rows, self.subject_rows(subject_name))
+        flat = self.column_values(f"{dimension}_Flat", rows)
+        eq = self.column_values(f"{dimension}_EQ", rows)
+        valid = ~(np.isnan(flat) | np.isnan(eq))
+        return flat[valid], eq[valid]
     
     def get_subjects_by_genre(self, genre: str) -> List[SubjectData]:
         """根據音樂類型篩選資料"""
-        return [data for data in self.subjects_data if data.genre == genre]
+        return self._make_subject_data(self.genre_rows(genre))
     
     def get_subjects_by_name(self, subject_name: str) -> List[SubjectData]:
         """根據受試者姓名篩選資料"""
-        return [data for data in self.subjects_data if data.subject_id == subject_name]
+        return self._make_subject_data(self.subject_rows(subject_name))
     
     def get_unique_genres(self) -> List[str]:
-        """取得所有音樂類型"""
-        return list(set(data.genre for data in self.subjects_data))
+        """取得所有音樂類型（依資料中第一次出現的順序）"""
+        self._flush()
+        return list(self._genre_index)
     
     def get_unique_subjects(self) -> List[str]:
-        """取得所有受試者名單"""
-        return list(set(data.subject_id for data in self.subjects_data))
+        """取得所有受試者名單（依資料中第一次出現的順序）"""
+        self._flush()
+        return list(self._subject_index)
 
 # ============================================================================
 # 服務層 (Service Layer)
@@ -167,28 +402,14 @@ class DataLoaderService:
             # 讀取 CSV 檔案
             df = pd.read_csv(file_path, encoding=AnalysisConfig.DEFAULT_ENCODING)
             
-            # 建立資料模型
-            experiment_data = ExperimentDataModel()
-            
-            # 處理每一行資料
-            for _, row in df.iterrows():
-                # 將 row 轉換為字典，排除索引欄位
-                responses = {col: row[col] for col in df.columns if col not in ['', 'subject', 'round', 'genre']}
-                
-                subject_data = SubjectData(
-                    subject_id=str(row[AnalysisConfig.SUBJECT_COLUMN]),
-                    round_number=int(row[AnalysisConfig.ROUND_COLUMN]),
-                    genre=str(row[AnalysisConfig.GENRE_COLUMN]),
-                    responses=responses
-                )
-                
-                experiment_data.add_subject_data(subject_data)
+            # 建立資料模型（欄位式，不逐列轉換）
+            experiment_data = ExperimentDataModel(df)
             
             # 設定元資料
             experiment_data.metadata = {
                 'total_records': len(df),
-                'unique_subjects': len(df[AnalysisConfig.SUBJECT_COLUMN].unique()),
-                'genres': df[AnalysisConfig.GENRE_COLUMN].unique().tolist(),
+                'unique_subjects': len(experiment_data.get_unique_subjects()),
+                'genres': experiment_data.get_unique_genres(),
                 'columns': df.columns.tolist()
             }
             
@@ -197,6 +418,64 @@ class DataLoaderService:
         except Exception as e:
             raise ValueError(f"載入資料時發生錯誤: {str(e)}")
 
+    @staticmethod
+    def load_session_results(results_path: Optional[str] = None,
+                             features_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        載入多場次實驗的結果 (長格式，每個場次的每首音樂一列)
+        
+        問卷分數取自各場次目錄的 music*_evaluation_*.csv (每個 dimension 一欄)，
+        場次資訊取自目錄名稱與 experiment_info.json；指定 features_path 時
+        併入 bio_analysis.batch 產生的生理特徵表中對應音樂階段的特徵。
+        
+        Args:
+            results_path: 場次目錄所在位置，預設 AnalysisConfig.SESSION_RESULTS_PATH
+            features_path: 生理特徵表 CSV (study_features.csv)，可選
+            
+        Returns:
+            pd.DataFrame: 欄位為 SESSION_KEY_COLUMNS、session (場次目錄名稱) 加上各結果變項；
+                          問卷維度欄位記錄在 attrs['questionnaire_columns']
+        """
+        from bio_analysis.batch import SESSION_COLUMNS, WINDOW_COLUMNS, discover_sessions, read_session_info
+        
+        records = []
+        for session_dir in discover_sessions(results_path or AnalysisConfig.SESSION_RESULTS_PATH):
+            try:
+                info = read_session_info(session_dir)
+            except (OSError, ValueError) as e:
+                print(f"略過場次 {os.path.basename(session_dir)}: {e}")
+                continue
+            for path in sorted(glob.glob(os.path.join(session_dir, 'music*_evaluation_*.csv'))):
+                phase = os.path.basename(path).split('_evaluation_')[0]
+                try:
+                    answers = pd.read_csv(path, encoding=AnalysisConfig.DEFAULT_ENCODING)
+                except (OSError, ValueError) as e:
+                    print(f"略過問卷 {path}: {e}")
+                    continue
+                record = {key: info.get(key) for key in AnalysisConfig.SESSION_KEY_COLUMNS if key != 'phase'}
+                record['phase'] = phase
+                record['session'] = os.path.basename(session_dir)
+                record.update(
+                    pd.to_numeric(answers['score'], errors='coerce').groupby(answers['dimension']).mean().to_dict())
+                records.append(record)
+        frame = pd.DataFrame(records, columns=None if records else AnalysisConfig.SESSION_KEY_COLUMNS + ['session'])
+        keys = set(AnalysisConfig.SESSION_KEY_COLUMNS)
+        questionnaire_columns = [column for column in frame.select_dtypes(include='number').columns
+                                 if column not in keys]
+        
+        if features_path:
+            features = pd.read_csv(features_path, encoding=AnalysisConfig.DEFAULT_ENCODING)
+            # 以時間窗名稱對應問卷的音樂階段 (子時間窗名稱不同，不會併入)
+            features = features.drop(columns='phase').rename(columns={'window': 'phase'})
+            feature_columns = [
+                column for column in features.select_dtypes(include='number').columns
+                if column not in SESSION_COLUMNS + WINDOW_COLUMNS
+            ]
+            features = features[['session', 'phase'] + feature_columns]
+            frame = frame.merge(features, on=['session', 'phase'], how='left', validate='many_to_one')
+        frame.attrs['questionnaire_columns'] = questionnaire_columns
+        return frame
+
 class StatisticalAnalysisService:
     """統計分析服務"""
     
@@ -251,6 +530,143 @@ class StatisticalAnalysisService:
         
         return abs(mean_diff) / pooled_std
     
+    @staticmethod
+    def adjust_p_values(p_values: np.ndarray, method: Optional[str]) -> np.ndarray:
+        """
+        多重比較校正（NaN 不計入比較數）
+        
+        Args:
+            p_values: 原始 p 值
+            method: 'fdr_bh' (Benjamini-Hochberg)、'holm' 或 None
+            
+        Returns:
+            np.ndarray: 校正後的 p 值
+        """
+        p_values = np.asarray(p_values, dtype=float)
+        if method is None:
+            return p_values.copy()
+        adjusted = np.full(p_values.shape, np.nan)
+        valid = np.flatnonzero(~np.isnan(p_values))
+        m = len(valid)
+        if m == 0:
+            return adjusted
+        order = valid[np.argsort(p_values[valid], kind='stable')]
+        ranked = p_values[order]
+        if method == 'fdr_bh':
+            scaled = ranked * m / np.arange(1, m + 1)
+            scaled = np.minimum.accumulate(scaled[::-1])[::-1]
+        elif method == 'holm':
+            scaled = np.maximum.accumulate(ranked * (m - np.arange(m)))
+        else:
+            raise ValueError(f"不支援的多重比較校正方法: {method}")
+        adjusted[order] = np.minimum(scaled, 1.0)
+        return adjusted
+    
+    @staticmethod
+    def _group_sums(codes: np.ndarray, values: np.ndarray, groups: int) -> np.ndarray:
+        """依群組代碼加總每一欄：values (n, k) -> (groups, k)"""
+        return np.column_stack([
+            np.bincount(codes, weights=values[:, k], minlength=groups) for k in range(values.shape[1])
+        ]) if values.shape[1] else np.zeros((groups, 0))
+    
+    @staticmethod
+    def analyze_all_cells(experiment_data: ExperimentDataModel,
+                          correction: Optional[str] = None) -> Dict[Tuple[str, str], Any]:
+        """
+        一次計算所有音樂類型 × 維度的配對 t 檢定
+        
+        每個維度取 Flat / EQ 兩欄，以音樂類型代碼分組加總（bincount）得到樣本數、平均數與
+        平方偏差和，再一次算出所有格的 t、p、自由度與 Cohen's d；結果記錄在資料模型上，
+        報告、統計摘要與匯出共用同一份。
+        
+        Args:
+            experiment_data: 實驗資料模型
+            correction: 多重比較校正 ('fdr_bh'、'holm' 或 None)
+            
+        Returns:
+            Dict[(genre, dimension), StatisticalResult 或 錯誤訊息字串]
+        """
+        return experiment_data.cached_result(
+            ('paired_cells', correction),
+            lambda: StatisticalAnalysisService._compute_all_cells(experiment_data, correction)
+        )
+    
+    @staticmethod
+    def _compute_all_cells(experiment_data: ExperimentDataModel,
+                           correction: Optional[str]) -> Dict[Tuple[str, str], Any]:
+        genres = experiment_data.get_unique_genres()
+        dimensions = list(AnalysisConfig.ANALYSIS_DIMENSIONS)
+        categories = list(experiment_data.frame[AnalysisConfig.GENRE_COLUMN].cat.categories)
+        groups = len(categories)
+        codes = experiment_data.genre_codes
+        
+        # (n, D) 的 Flat / EQ 矩陣，兩者皆有值的格才納入
+        flat = np.column_stack([experiment_data.column_values(f"{dim}_Flat") for dim in dimensions])
+        eq = np.column_stack([experiment_data.column_values(f"{dim}_EQ") for dim in dimensions])
+        valid = ~(np.isnan(flat) | np.isnan(eq)) & (codes >= 0)[:, None]
+        safe_codes = np.where(codes >= 0, codes, 0)
+        flat = np.where(valid, flat, 0.0)
+        eq = np.where(valid, eq, 0.0)
+        diff = eq - flat
+        
+        sum_group = StatisticalAnalysisService._group_sums
+        n = sum_group(safe_codes, valid.astype(float), groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            flat_mean = sum_group(safe_codes, flat, groups) / n
+            eq_mean = sum_group(safe_codes, eq, groups) / n
+            diff_mean = sum_group(safe_codes, diff, groups) / n
+            
+            # 第二輪：與組平均的平方偏差（避免平方和相減的數值誤差）
+            def variance(values, means):
+                deviation = np.where(valid, values - means[safe_codes], 0.0)
+                return sum_group(safe_codes, deviation ** 2, groups) / (n - 1)
+            
+            flat_std = np.sqrt(variance(flat, flat_mean))
+            eq_std = np.sqrt(variance(eq, eq_mean))
+            diff_std = np.sqrt(variance(diff, diff_mean))
+            
+            df = n - 1
+            t_stat = diff_mean / (diff_std / np.sqrt(n))
+            p_value = 2 * stats.t.sf(np.abs(t_stat), np.maximum(df, 1))
+            pooled_std = np.sqrt((flat_std ** 2 + eq_std ** 2) / 2)
+            effect_size = np.where(pooled_std == 0, 0.0, np.abs(diff_mean) / pooled_std)
+        
+        enough = n >= 2
+        p_value = np.where(enough, p_value, np.nan)
+        p_adjusted = None
+        if correction is not None:
+            cells = np.array([[categories.index(genre), k] for genre in genres for k in range(len(dimensions))])
+            flat_p = p_value[cells[:, 0], cells[:, 1]] if len(cells) else np.zeros(0)
+            adjusted = StatisticalAnalysisService.adjust_p_values(flat_p, correction)
+            p_adjusted = np.full(p_value.shape, np.nan)
+            if len(cells):
+                p_adjusted[cells[:, 0], cells[:, 1]] = adjusted
+        
+        results: Dict[Tuple[str, str], Any] = {}
+        for genre in genres:
+            g = categories.index(genre)
+            for k, dimension in enumerate(dimensions):
+                if not enough[g, k]:
+                    results[(genre, dimension)] = "資料量不足，無法進行統計分析"
+                    continue
+                results[(genre, dimension)] = StatisticalResult(
+                    dimension=dimension,
+                    genre=genre,
+                    flat_mean=float(flat_mean[g, k]),
+                    eq_mean=float(eq_mean[g, k]),
+                    flat_std=float(flat_std[g, k]),
+                    eq_std=float(eq_std[g, k]),
+                    mean_difference=float(eq_mean[g, k] - flat_mean[g, k]),
+                    t_statistic=float(t_stat[g, k]),
+                    p_value=float(p_value[g, k]),
+                    degrees_freedom=int(df[g, k]),
+                    effect_size=float(effect_size[g, k]),
+                    sample_size=int(n[g, k]),
+                    p_adjusted=float(p_adjusted[g, k]) if p_adjusted is not None else None,
+                    correction=correction
+                )
+        return results
+    
     @staticmethod
     def analyze_dimension_by_genre(experiment_data: ExperimentDataModel, 
                                  dimension: str, genre: str) -> StatisticalResult:
@@ -265,10 +681,8 @@ class StatisticalAnalysisService:
         Returns:
             StatisticalResult: 統計分析結果
         """
-        # 取得該類型音樂的所有資料
-        genre_data = experiment_data.get_subjects_by_genre(genre)
-        
-        if not genre_data:
+        # 確認該類型音樂有資料
+        if len(experiment_data.genre_rows(genre)) == 0:
             raise ValueError(f"找不到音樂類型 '{genre}' 的資料")
         
         # 取得維度設定
@@ -276,48 +690,713 @@ class StatisticalAnalysisService:
         if not dim_config:
             raise ValueError(f"未知的分析維度: {dimension}")
         
-        # 提取數值
-        flat_values = []
-        eq_values = []
+        # 從一次算完的所有格結果中取出（同一份結果由各報告共用）
+        result = StatisticalAnalysisService.analyze_all_cells(
+            experiment_data, AnalysisConfig.MULTIPLE_COMPARISON_CORRECTION
+        )[(genre, dimension)]
+        if isinstance(result, str):
+            raise ValueError(result)
+        return result
+
+class ResamplingAnalysisService:
+    """
+    重抽樣推論服務
+    
+    每格 (音樂類型 × 維度) 的配對差異做：
+    - bootstrap：重抽配對，取平均差異與 Cohen's d 的百分位數信賴區間
+    - 符號翻轉排列檢定：隨機翻轉每對差異的正負號，雙尾 p 值
+    
+    重抽樣以 (批次大小, n) 的矩陣一次計算，批次大小依 RESAMPLING_CHUNK_ELEMENTS 限制記憶體；
+    各格使用由同一個種子衍生的獨立亂數序列，平行計算時結果仍可重現。
+    """
+    
+    @staticmethod
+    def _chunks(total: int, n: int):
+        """將 total 次重抽樣切成多批，每批矩陣不超過 RESAMPLING_CHUNK_ELEMENTS 個元素"""
+        size = max(1, AnalysisConfig.RESAMPLING_CHUNK_ELEMENTS // max(n, 1))
+        for start in range(0, total, size):
+            yield min(size, total - start)
+    
+    @staticmethod
+    def _effect_sizes(flat: np.ndarray, eq: np.ndarray) -> np.ndarray:
+        """每列一組樣本的有方向 Cohen's d（合併標準差為 0 時為 0）"""
+        pooled = np.sqrt((flat.var(axis=-1, ddof=1) + eq.var(axis=-1, ddof=1)) / 2)
+        difference = eq.mean(axis=-1) - flat.mean(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(pooled == 0, 0.0, difference / pooled)
+    
+    @staticmethod
+    def bootstrap(flat_values: np.ndarray, eq_values: np.ndarray, n_resamples: int,
+                  rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        配對 bootstrap
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (平均差異樣本, Cohen's d 樣本)，長度皆為 n_resamples
+        """
+        n = len(flat_values)
+        mean_differences = np.empty(n_resamples)
+        effect_sizes = np.empty(n_resamples)
+        start = 0
+        for size in ResamplingAnalysisService._chunks(n_resamples, n):
+            index = rng.integers(0, n, size=(size, n))
+            flat = flat_values[index]
+            eq = eq_values[index]
+            mean_differences[start:start + size] = (eq - flat).mean(axis=1)
+            effect_sizes[start:start + size] = ResamplingAnalysisService._effect_sizes(flat, eq)
+            start += size
+        return mean_differences, effect_sizes
+    
+    @staticmethod
+    def sign_flip_p_value(differences: np.ndarray, n_resamples: int,
+                          rng: np.random.Generator) -> Tuple[float, int, bool]:
+        """
+        符號翻轉排列檢定的雙尾 p 值
+        
+        翻轉符號不改變差異的平方和，因此以 |平均差異| 為統計量與以 |t| 為統計量等價。
+        樣本數小時列舉全部 2^n 種組合（精確檢定），否則隨機抽樣並以 (k + 1) / (B + 1) 計算。
+        
+        Returns:
+            Tuple[float, int, bool]: (p 值, 使用的組合數, 是否為精確檢定)
+        """
+        n = len(differences)
+        observed = abs(differences.mean())
+        tolerance = 1e-12 * max(1.0, observed)
+        extreme = 0
+        if n <= AnalysisConfig.EXACT_PERMUTATION_MAX_N:
+            total = 2 ** n
+            bits = (np.arange(total)[:, None] >> np.arange(n)) & 1
+            stats_ = np.abs(((1 - 2 * bits) * differences).mean(axis=1))
+            extreme = int(np.count_nonzero(stats_ >= observed - tolerance))
+            return extreme / total, total, True
+        for size in ResamplingAnalysisService._chunks(n_resamples, n):
+            signs = rng.integers(0, 2, size=(size, n), dtype=np.int8) * 2 - 1
+            stats_ = np.abs((signs * differences).mean(axis=1))
+            extreme += int(np.count_nonzero(stats_ >= observed - tolerance))
+        return (extreme + 1) / (n_resamples + 1), n_resamples, False
+    
+    @staticmethod
+    def analyze_cell(flat_values: np.ndarray, eq_values: np.ndarray, genre: str, dimension: str,
+                     n_bootstrap: int, n_permutation: int, seed: np.random.SeedSequence,
+                     confidence: float) -> ResamplingResult:
+        """單一格的 bootstrap 信賴區間與排列檢定"""
+        bootstrap_rng, permutation_rng = [np.random.default_rng(child) for child in seed.spawn(2)]
+        differences = eq_values - flat_values
+        mean_samples, effect_samples = ResamplingAnalysisService.bootstrap(
+            flat_values, eq_values, n_bootstrap, bootstrap_rng)
+        tail = (1 - confidence) / 2 * 100
+        mean_ci = np.percentile(mean_samples, [tail, 100 - tail])
+        effect_ci = np.nanpercentile(effect_samples, [tail, 100 - tail])
+        p_value, permutations, exact = ResamplingAnalysisService.sign_flip_p_value(
+            differences, n_permutation, permutation_rng)
+        return ResamplingResult(
+            dimension=dimension,
+            genre=genre,
+            sample_size=len(differences),
+            mean_difference=float(differences.mean()),
+            mean_difference_ci=(float(mean_ci[0]), float(mean_ci[1])),
+            effect_size=float(ResamplingAnalysisService._effect_sizes(flat_values, eq_values)),
+            effect_size_ci=(float(effect_ci[0]), float(effect_ci[1])),
+            permutation_p=float(p_value),
+            bootstrap_resamples=n_bootstrap,
+            permutation_resamples=permutations,
+            exact_permutation=exact,
+            confidence=confidence
+        )
+    
+    @staticmethod
+    def analyze_all_cells(experiment_data: ExperimentDataModel,
+                          n_bootstrap: Optional[int] = None,
+                          n_permutation: Optional[int] = None,
+                          seed: Optional[int] = None,
+                          confidence: Optional[float] = None,
+                          workers: Optional[int] = None) -> Dict[Tuple[str, str], Any]:
+        """
+        所有音樂類型 × 維度的重抽樣推論（結果記錄在資料模型上）
         
-        for data in genre_data:
-            flat_val = data.get_response(dimension, 'Flat')
-            eq_val = data.get_response(dimension, 'EQ')
+        Args:
+            experiment_data: 實驗資料模型
+            n_bootstrap / n_permutation: 重抽樣次數，預設依 AnalysisConfig
+            seed: 亂數種子，預設 AnalysisConfig.RESAMPLING_SEED
+            confidence: 信賴水準，預設 AnalysisConfig.CONFIDENCE_INTERVAL
+            workers: 平行計算的執行緒數，預設為 CPU 核心數
             
-            if flat_val is not None and eq_val is not None:
-                flat_values.append(float(flat_val))
-                eq_values.append(float(eq_val))
+        Returns:
+            Dict[(genre, dimension), ResamplingResult 或 錯誤訊息字串]
+        """
+        n_bootstrap = n_bootstrap or AnalysisConfig.BOOTSTRAP_RESAMPLES
+        n_permutation = n_permutation or AnalysisConfig.PERMUTATION_RESAMPLES
+        seed = AnalysisConfig.RESAMPLING_SEED if seed is None else seed
+        confidence = confidence or AnalysisConfig.CONFIDENCE_INTERVAL
+        key = ('resampling', n_bootstrap, n_permutation, seed, confidence)
+        return experiment_data.cached_result(key, lambda: ResamplingAnalysisService._compute_all_cells(
+            experiment_data, n_bootstrap, n_permutation, seed, confidence, workers))
+    
+    @staticmethod
+    def _compute_all_cells(experiment_data: ExperimentDataModel, n_bootstrap: int, n_permutation: int,
+                           seed: Optional[int], confidence: float,
+                           workers: Optional[int]) -> Dict[Tuple[str, str], Any]:
+        cells = [(genre, dimension)
+                 for genre in experiment_data.get_unique_genres()
+                 for dimension in AnalysisConfig.ANALYSIS_DIMENSIONS]
+        # 每格一個獨立的亂數序列（依格的順序衍生），與執行順序無關
+        seeds = dict(zip(cells, np.random.SeedSequence(seed).spawn(len(cells))))
         
-        if len(flat_values) < 2:
-            raise ValueError(f"資料量不足，無法進行統計分析")
+        def run(cell):
+            genre, dimension = cell
+            flat_values, eq_values = experiment_data.paired_values(dimension, genre)
+            if len(flat_values) < 2:
+                return "資料量不足，無法進行統計分析"
+            return ResamplingAnalysisService.analyze_cell(
+                flat_values, eq_values, genre, dimension, n_bootstrap, n_permutation, seeds[cell], confidence)
         
-        # 計算基本統計量
-        flat_mean = np.mean(flat_values)
-        eq_mean = np.mean(eq_values)
-        flat_std = np.std(flat_values, ddof=1)
-        eq_std = np.std(eq_values, ddof=1)
-        mean_difference = eq_mean - flat_mean
+        # 先在主執行緒備妥欄位陣列快取，工作執行緒只讀取
+        for dimension in AnalysisConfig.ANALYSIS_DIMENSIONS:
+            experiment_data.column_values(f"{dimension}_Flat")
+            experiment_data.column_values(f"{dimension}_EQ")
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            return dict(zip(cells, executor.map(run, cells)))
+
+class RepeatedMeasuresService:
+    """
+    重複量數分析服務 (受試者內因子：場次或音樂類型)
+    
+    將長格式資料整理為 (受試者, 水準, 結果變項) 的三維陣列後，所有結果變項一次計算：
+    - 'anova'：單因子重複量數 ANOVA，含 Greenhouse-Geisser 校正與 partial eta²；事後比較為配對 t 檢定
+    - 'friedman'：Friedman 檢定 (含同分校正) 與 Kendall's W；事後比較為 Wilcoxon 符號等級檢定
+    
+    每個結果變項只使用所有水準皆有資料的受試者；同一受試者同一水準有多列時取平均
+    (例如同一場次的兩首音樂)。
+    """
+    
+    @staticmethod
+    def build_array(frame: pd.DataFrame, outcomes: List[str], factor: str, subject: str,
+                    levels: Optional[List[Any]] = None) -> Tuple[np.ndarray, List[Any], List[Any]]:
+        """
+        長格式資料轉為 (受試者, 水準, 結果變項) 陣列，缺值為 NaN
         
-        # 執行統計檢定
-        t_stat, p_value, df = StatisticalAnalysisService.paired_t_test(flat_values, eq_values)
+        Returns:
+            Tuple[np.ndarray, List, List]: (陣列, 受試者清單, 水準清單)
+        """
+        data = frame[[subject, factor] + outcomes].copy()
+        data[outcomes] = data[outcomes].apply(pd.to_numeric, errors='coerce')
+        grouped = data.groupby([subject, factor])[outcomes].mean()
+        subjects = sorted(data[subject].dropna().unique().tolist())
+        if levels is None:
+            levels = sorted(data[factor].dropna().unique().tolist())
+        index = pd.MultiIndex.from_product([subjects, levels], names=[subject, factor])
+        values = grouped.reindex(index).to_numpy(dtype=float)
+        return values.reshape(len(subjects), len(levels), len(outcomes)), subjects, levels
+    
+    @staticmethod
+    def _anova(values: np.ndarray, complete: np.ndarray) -> Dict[str, np.ndarray]:
+        """所有結果變項的單因子重複量數 ANOVA"""
+        n_subjects = complete.sum(axis=0)
+        k = values.shape[1]
+        weights = complete[:, None, :]
+        filled = np.where(weights, values, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            level_means = filled.sum(axis=0) / n_subjects
+            subject_means = filled.mean(axis=1)
+            grand_mean = level_means.mean(axis=0)
+            
+            ss_conditions = n_subjects * ((level_means - grand_mean) ** 2).sum(axis=0)
+            ss_subjects = k * (complete * (subject_means - grand_mean) ** 2).sum(axis=0)
+            ss_total = (weights * (filled - grand_mean) ** 2).sum(axis=(0, 1))
+            ss_error = np.maximum(ss_total - ss_conditions - ss_subjects, 0.0)
+            
+            df_conditions = np.full(values.shape[2], k - 1, dtype=float)
+            df_error = (n_subjects - 1) * (k - 1.0)
+            f_value = (ss_conditions / df_conditions) / (ss_error / df_error)
+            p_value = stats.f.sf(f_value, df_conditions, df_error)
+            partial_eta = ss_conditions / (ss_conditions + ss_error)
+            
+            # Greenhouse-Geisser epsilon：水準共變異數矩陣雙重中心化後計算
+            centered = np.where(weights, values - level_means, 0.0)
+            covariance = np.einsum('slo,smo->olm', centered, centered) / (n_subjects - 1)[:, None, None]
+            double_centered = (covariance - covariance.mean(axis=1, keepdims=True)
+                               - covariance.mean(axis=2, keepdims=True)
+                               + covariance.mean(axis=(1, 2), keepdims=True))
+            trace = np.trace(double_centered, axis1=1, axis2=2)
+            epsilon = trace ** 2 / ((k - 1) * (double_centered ** 2).sum(axis=(1, 2)))
+            epsilon = np.clip(epsilon, 1.0 / (k - 1), 1.0)
+            p_gg = stats.f.sf(f_value, epsilon * df_conditions, epsilon * df_error)
+        return {
+            'statistic': f_value, 'df1': df_conditions, 'df2': df_error, 'p_value': p_value,
+            'epsilon_gg': epsilon, 'p_gg': p_gg, 'effect_size': partial_eta,
+        }
+    
+    @staticmethod
+    def _friedman(values: np.ndarray, complete: np.ndarray) -> Dict[str, np.ndarray]:
+        """所有結果變項的 Friedman 檢定 (同分以平均等級並做校正)"""
+        n_subjects = complete.sum(axis=0)
+        k = values.shape[1]
+        filled = np.where(complete[:, None, :], values, 0.0)
+        ranks = stats.rankdata(filled, axis=1)
+        rank_sums = (ranks * complete[:, None, :]).sum(axis=0)
+        # 同分組大小：每個值在同一受試者內與多少個值相等
+        tie_sizes = (filled[:, :, None, :] == filled[:, None, :, :]).sum(axis=2)
+        tie_term = ((tie_sizes ** 2 - 1) * complete[:, None, :]).sum(axis=(0, 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chi_square = (12.0 / (n_subjects * k * (k + 1)) * (rank_sums ** 2).sum(axis=0)
+                          - 3.0 * n_subjects * (k + 1))
+            chi_square = chi_square / (1 - tie_term / (n_subjects * k * (k ** 2 - 1)))
+            p_value = stats.chi2.sf(chi_square, k - 1)
+            kendall_w = chi_square / (n_subjects * (k - 1))
+        return {
+            'statistic': chi_square, 'df1': np.full(values.shape[2], k - 1, dtype=float),
+            'df2': np.full(values.shape[2], np.nan), 'p_value': p_value, 'effect_size': kendall_w,
+        }
+    
+    @staticmethod
+    def _posthoc(values: np.ndarray, complete: np.ndarray, method: str,
+                 pairs: List[Tuple[int, int]]) -> Dict[str, np.ndarray]:
+        """所有水準配對 × 結果變項的事後比較，回傳 (配對, 結果變項) 陣列"""
+        first = [i for i, _ in pairs]
+        second = [j for _, j in pairs]
+        differences = values[:, second, :] - values[:, first, :]
+        mask = complete[:, None, :]
+        n = np.broadcast_to(complete.sum(axis=0), differences.shape[1:]).astype(float)
+        filled = np.where(mask, differences, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_difference = filled.sum(axis=0) / n
+            if method == 'anova':
+                deviation = np.where(mask, differences - mean_difference, 0.0)
+                sd = np.sqrt((deviation ** 2).sum(axis=0) / (n - 1))
+                statistic = mean_difference / (sd / np.sqrt(n))
+                p_value = 2 * stats.t.sf(np.abs(statistic), np.maximum(n - 1, 1))
+                p_value = np.where(n >= 2, p_value, np.nan)
+            else:
+                flat = np.where(mask, differences, np.nan).reshape(differences.shape[0], -1)
+                statistic = np.full(flat.shape[1], np.nan)
+                p_value = np.full(flat.shape[1], np.nan)
+                # 全為 0 差異的配對無法做符號等級檢定
+                testable = np.nansum(np.abs(flat), axis=0) > 0
+                if testable.any():
+                    result = stats.wilcoxon(flat[:, testable], axis=0, nan_policy='omit')
+                    statistic[testable] = result.statistic
+                    p_value[testable] = result.pvalue
+                statistic = statistic.reshape(differences.shape[1:])
+                p_value = p_value.reshape(differences.shape[1:])
+        return {'n': n, 'mean_difference': mean_difference, 'statistic': statistic, 'p_value': p_value}
+    
+    @staticmethod
+    def analyze(frame: pd.DataFrame, outcomes: Optional[List[str]] = None,
+                factor: Optional[str] = None, subject: Optional[str] = None,
+                method: str = 'anova', levels: Optional[List[Any]] = None,
+                posthoc: bool = True) -> RepeatedMeasuresResult:
+        """
+        對多個結果變項一次做重複量數分析
         
-        # 計算效果量
-        effect_size = StatisticalAnalysisService.calculate_effect_size(flat_values, eq_values)
+        Args:
+            frame: 長格式資料 (如 DataLoaderService.load_session_results 的結果)
+            outcomes: 結果變項欄位，預設為所有非鍵值的數值欄位
+            factor: 受試者內因子欄位，預設 AnalysisConfig.SESSION_COLUMN
+            subject: 受試者欄位，預設 AnalysisConfig.SESSION_SUBJECT_COLUMN
+            method: 'anova' 或 'friedman'
+            levels: 因子水準順序，預設為排序後的所有水準
+            posthoc: 是否做兩兩事後比較
+            
+        Returns:
+            RepeatedMeasuresResult
+        """
+        if method not in ('anova', 'friedman'):
+            raise ValueError(f"未知的分析方法: {method}")
+        factor = factor or AnalysisConfig.SESSION_COLUMN
+        subject = subject or AnalysisConfig.SESSION_SUBJECT_COLUMN
+        if outcomes is None:
+            keys = set(AnalysisConfig.SESSION_KEY_COLUMNS) | {factor, subject}
+            outcomes = [column for column in frame.select_dtypes(include='number').columns
+                        if column not in keys]
+        values, subjects, levels = RepeatedMeasuresService.build_array(frame, outcomes, factor, subject, levels)
+        if len(levels) < 2:
+            raise ValueError(f"因子 '{factor}' 至少需要兩個水準")
+        complete = ~np.isnan(values).any(axis=1)
         
-        return StatisticalResult(
-            dimension=dimension,
-            genre=genre,
-            flat_mean=flat_mean,
-            eq_mean=eq_mean,
-            flat_std=flat_std,
-            eq_std=eq_std,
-            mean_difference=mean_difference,
-            t_statistic=t_stat,
-            p_value=p_value,
-            degrees_freedom=df,
-            effect_size=effect_size,
-            sample_size=len(flat_values)
-        )
+        if method == 'anova':
+            omnibus = RepeatedMeasuresService._anova(values, complete)
+        else:
+            omnibus = RepeatedMeasuresService._friedman(values, complete)
+        n_subjects = complete.sum(axis=0)
+        p_value = np.where(n_subjects >= 2, omnibus['p_value'], np.nan)
+        table = pd.DataFrame({
+            'outcome': outcomes,
+            'method': method,
+            'n_subjects': n_subjects,
+            'levels': len(levels),
+            'statistic': omnibus['statistic'],
+            'df1': omnibus['df1'],
+            'df2': omnibus['df2'],
+            'p_value': p_value,
+        })
+        if method == 'anova':
+            table['epsilon_gg'] = omnibus['epsilon_gg']
+            table['p_gg'] = np.where(n_subjects >= 2, omnibus['p_gg'], np.nan)
+            table['partial_eta_sq'] = omnibus['effect_size']
+        else:
+            table['kendall_w'] = omnibus['effect_size']
+        correction = AnalysisConfig.MULTIPLE_COMPARISON_CORRECTION
+        if correction is not None:
+            table['p_adjusted'] = StatisticalAnalysisService.adjust_p_values(p_value, correction)
+        
+        posthoc_table = pd.DataFrame()
+        if posthoc:
+            pairs = list(combinations(range(len(levels)), 2))
+            result = RepeatedMeasuresService._posthoc(values, complete, method, pairs)
+            adjusted = np.column_stack([
+                StatisticalAnalysisService.adjust_p_values(result['p_value'][:, o], AnalysisConfig.POSTHOC_CORRECTION)
+                for o in range(len(outcomes))
+            ]) if outcomes else result['p_value']
+            # 依結果變項排列，每個結果變項內為各水準配對
+            outcome_index, pair_index = [index.ravel() for index in np.meshgrid(
+                np.arange(len(outcomes)), np.arange(len(pairs)), indexing='ij')]
+            posthoc_table = pd.DataFrame({
+                'outcome': np.asarray(outcomes, dtype=object)[outcome_index],
+                'level_a': [levels[pairs[p][0]] for p in pair_index],
+                'level_b': [levels[pairs[p][1]] for p in pair_index],
+                'n': result['n'][pair_index, outcome_index],
+                'mean_difference': result['mean_difference'][pair_index, outcome_index],
+                'statistic': result['statistic'][pair_index, outcome_index],
+                'p_value': result['p_value'][pair_index, outcome_index],
+                'p_adjusted': adjusted[pair_index, outcome_index],
+            })
+        
+        return RepeatedMeasuresResult(method=method, factor=factor, levels=levels,
+                                      table=table, posthoc=posthoc_table)
+
+class PowerAnalysisService:
+    """
+    蒙地卡羅檢定力模擬服務
+    
+    以已觀察到的效果量與變異模擬規劃中的設計 (N 位受試者、每人 PLANNED_SESSIONS 個場次、
+    A/B 兩組交替分派兩首音樂的播放順序)，估計各候選樣本數的檢定力：
+    - 'paired'：各音樂類型 × 維度的配對 t 檢定；每位受試者的差異加上依組別正負的順序效果
+    - 'repeated_measures'：各結果變項在場次 (或音樂類型) 間的重複量數 ANOVA (Greenhouse-Geisser 校正)
+    
+    每個 (效果設定, 樣本數) 以 (批次大小, N[, 水準數]) 的矩陣一次模擬；各點使用由同一個種子衍生的
+    獨立亂數序列，以執行緒平行計算，結果與執行順序無關。
+    誤差可由常態分布產生 ('normal')，或重抽觀察到的殘差 ('empirical'，保留偏態與水準間的共變異結構)。
+    先導資料樣本少時觀察到的效果量含抽樣誤差 (通常偏高)，檢定力應視為樂觀估計。
+    """
+    
+    @staticmethod
+    def _order_signs(n: int) -> np.ndarray:
+        """受試者依序交替分派到 A (+1，先播第一首) / B (-1) 組"""
+        return np.where(np.arange(n) % 2 == 0, 1.0, -1.0)
+    
+    @staticmethod
+    def paired_rejections(n: int, replicates: int, mean_difference: float, sd_difference: float,
+                          order_effect: float, alpha: float, rng: np.random.Generator,
+                          residuals: Optional[np.ndarray] = None) -> int:
+        """
+        模擬 replicates 組 N 位受試者的配對差異，回傳雙尾 t 檢定顯著的次數
+        
+        A 組的差異為 平均差異 + 順序效果，B 組為 平均差異 - 順序效果 (兩組各半時互相抵銷，
+        但增加差異的變異)；sd_difference 與 residuals 為扣除順序效果後的組內變異，
+        residuals 不為 None 時誤差由觀察到的置中差異重抽。
+        """
+        critical = stats.t.ppf(1 - alpha / 2, n - 1)
+        shift = mean_difference + order_effect * PowerAnalysisService._order_signs(n)
+        rejected = 0
+        for size in ResamplingAnalysisService._chunks(replicates, n):
+            if residuals is None:
+                differences = rng.standard_normal((size, n)) * sd_difference + shift
+            else:
+                differences = residuals[rng.integers(0, len(residuals), size=(size, n))] + shift
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t_stat = differences.mean(axis=1) / (differences.std(axis=1, ddof=1) / np.sqrt(n))
+            rejected += int(np.count_nonzero(np.abs(t_stat) > critical))
+        return rejected
+    
+    @staticmethod
+    def anova_rejections(n: int, replicates: int, level_effects: np.ndarray, error_sd: float,
+                         alpha: float, rng: np.random.Generator,
+                         residuals: Optional[np.ndarray] = None, sphericity_correction: bool = True) -> int:
+        """
+        模擬 replicates 組 N 位受試者 × k 個水準的資料，回傳重複量數 ANOVA 顯著的次數
+        (sphericity_correction 為 True 時以 Greenhouse-Geisser 校正後的 p 值判斷)
+        
+        受試者間差異不影響受試者內 F 檢定，因此只模擬水準效果與誤差；同一場次兩首音樂取平均後
+        A/B 播放順序效果互相抵銷，也不需加入。residuals 為 (受試者, k) 的觀察殘差時整列重抽。
+        """
+        k = len(level_effects)
+        df_conditions = k - 1.0
+        df_error = (n - 1) * (k - 1.0)
+        critical = stats.f.ppf(1 - alpha, df_conditions, df_error)
+        rejected = 0
+        for size in ResamplingAnalysisService._chunks(replicates, n * k):
+            if residuals is None:
+                values = rng.standard_normal((size, n, k)) * error_sd + level_effects
+            else:
+                values = residuals[rng.integers(0, len(residuals), size=(size, n))] + level_effects
+            level_means = values.mean(axis=1)
+            centered = values - level_means[:, None, :]
+            # 水準共變異數矩陣雙重中心化：跡 × (n - 1) 即誤差平方和，並用於 GG epsilon
+            covariance = np.matmul(centered.transpose(0, 2, 1), centered) / (n - 1)
+            double_centered = (covariance - covariance.mean(axis=1, keepdims=True)
+                               - covariance.mean(axis=2, keepdims=True)
+                               + covariance.mean(axis=(1, 2), keepdims=True))
+            trace = np.trace(double_centered, axis1=1, axis2=2)
+            ss_conditions = n * ((level_means - level_means.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                f_value = (ss_conditions / df_conditions) / (trace * (n - 1) / df_error)
+                if not sphericity_correction:
+                    rejected += int(np.count_nonzero(f_value > critical))
+                    continue
+                epsilon = np.clip(trace ** 2 / (df_conditions * (double_centered ** 2).sum(axis=(1, 2))),
+                                  1.0 / df_conditions, 1.0)
+                p_value = stats.f.sf(f_value, epsilon * df_conditions, epsilon * df_error)
+            rejected += int(np.count_nonzero(p_value < alpha))
+        return rejected
+    
+    @staticmethod
+    def simulate(kernels: List[Any], sample_sizes: np.ndarray, replicates: int,
+                 seed: Optional[int] = None, workers: Optional[int] = None) -> np.ndarray:
+        """
+        平行執行所有 (效果設定, 樣本數) 的模擬
+        
+        Args:
+            kernels: 每個效果設定一個函式 kernel(n, replicates, rng) -> 顯著次數
+            sample_sizes: 候選樣本數
+            
+        Returns:
+            np.ndarray: (效果設定, 樣本數) 的檢定力
+        """
+        points = [(i, j) for i in range(len(kernels)) for j in range(len(sample_sizes))]
+        seeds = np.random.SeedSequence(seed).spawn(len(points))
+        
+        def run(point, point_seed):
+            i, j = point
+            return kernels[i](int(sample_sizes[j]), replicates, np.random.default_rng(point_seed))
+        
+        power = np.zeros((len(kernels), len(sample_sizes)))
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            for (i, j), rejected in zip(points, executor.map(run, points, seeds)):
+                power[i, j] = rejected / replicates
+        return power
+    
+    @staticmethod
+    def _settings(sample_sizes: Optional[List[int]], replicates: Optional[int],
+                  alpha: Optional[float]) -> Tuple[np.ndarray, int, float]:
+        sample_sizes = np.asarray(AnalysisConfig.POWER_SAMPLE_SIZES if sample_sizes is None else sample_sizes,
+                                  dtype=int)
+        if len(sample_sizes) == 0 or sample_sizes.min() < 2:
+            raise ValueError("候選樣本數至少需為 2")
+        return (sample_sizes, replicates or AnalysisConfig.POWER_REPLICATES,
+                AnalysisConfig.SIGNIFICANCE_LEVEL if alpha is None else alpha)
+    
+    @staticmethod
+    def paired_power(experiment_data: ExperimentDataModel,
+                     sample_sizes: Optional[List[int]] = None,
+                     replicates: Optional[int] = None,
+                     alpha: Optional[float] = None,
+                     order_effects: Optional[Dict[str, float]] = None,
+                     distribution: str = 'normal',
+                     seed: Optional[int] = None,
+                     workers: Optional[int] = None) -> Dict[Tuple[str, str], Any]:
+        """
+        以 StatisticalAnalysisService 的各格結果為效果量，模擬配對 t 檢定的檢定力 (結果記錄在資料模型上)
+        
+        Args:
+            experiment_data: 實驗資料模型
+            sample_sizes: 候選樣本數，預設 AnalysisConfig.POWER_SAMPLE_SIZES
+            replicates: 每個樣本數的模擬次數，預設 AnalysisConfig.POWER_REPLICATES
+            alpha: 顯著水準，預設 AnalysisConfig.SIGNIFICANCE_LEVEL
+            order_effects: 各維度的播放順序效果 (第二首 - 第一首)，可由 estimate_order_effects 估計
+            distribution: 'normal' 或 'empirical' (重抽觀察到的置中差異)
+            seed: 亂數種子，預設 AnalysisConfig.RESAMPLING_SEED
+            workers: 平行計算的執行緒數，預設為 CPU 核心數
+            
+        Returns:
+            Dict[(genre, dimension), PowerResult 或 錯誤訊息字串]
+        """
+        if distribution not in ('normal', 'empirical'):
+            raise ValueError(f"未知的誤差分布: {distribution}")
+        sample_sizes, replicates, alpha = PowerAnalysisService._settings(sample_sizes, replicates, alpha)
+        order_effects = dict(order_effects or {})
+        seed = AnalysisConfig.RESAMPLING_SEED if seed is None else seed
+        key = ('power_paired', tuple(sample_sizes), replicates, alpha,
+               tuple(sorted(order_effects.items())), distribution, seed)
+        return experiment_data.cached_result(key, lambda: PowerAnalysisService._compute_paired(
+            experiment_data, sample_sizes, replicates, alpha, order_effects, distribution, seed, workers))
+    
+    @staticmethod
+    def _compute_paired(experiment_data: ExperimentDataModel, sample_sizes: np.ndarray, replicates: int,
+                        alpha: float, order_effects: Dict[str, float], distribution: str,
+                        seed: Optional[int], workers: Optional[int]) -> Dict[Tuple[str, str], Any]:
+        cells = StatisticalAnalysisService.analyze_all_cells(
+            experiment_data, AnalysisConfig.MULTIPLE_COMPARISON_CORRECTION)
+        results: Dict[Tuple[str, str], Any] = {}
+        specs = []
+        for (genre, dimension), cell in cells.items():
+            if isinstance(cell, str):
+                results[(genre, dimension)] = cell
+                continue
+            flat_values, eq_values = experiment_data.paired_values(dimension, genre)
+            differences = eq_values - flat_values
+            order_effect = float(order_effects.get(dimension, 0.0))
+            # 觀察到的差異已含 A/B 兩組順序效果造成的變異 (兩組各半時樣本變異多出 c² n/(n-1))；
+            # 扣除後才是組內變異，模擬時再由 paired_rejections 加回順序效果，避免重複計入
+            n_observed = len(differences)
+            observed_variance = float(differences.var(ddof=1))
+            within_variance = observed_variance - order_effect ** 2 * n_observed / (n_observed - 1)
+            if within_variance <= 0:
+                results[(genre, dimension)] = "順序效果大於觀察到的差異變異，無法模擬"
+                continue
+            sd_difference = float(np.sqrt(within_variance))
+            residuals = None
+            if distribution == 'empirical':
+                # 置中差異縮放到組內變異
+                residuals = (differences - differences.mean()) * (sd_difference / np.sqrt(observed_variance))
+            specs.append(((genre, dimension), cell.mean_difference, sd_difference, order_effect, residuals))
+        
+        def kernel(mean_difference, sd_difference, order_effect, residuals):
+            return lambda n, count, rng: PowerAnalysisService.paired_rejections(
+                n, count, mean_difference, sd_difference, order_effect, alpha, rng, residuals)
+        
+        power = PowerAnalysisService.simulate(
+            [kernel(*spec[1:]) for spec in specs], sample_sizes, replicates, seed, workers)
+        for row, ((genre, dimension), mean_difference, sd_difference, order_effect, _) in enumerate(specs):
+            results[(genre, dimension)] = PowerResult(
+                analysis='paired',
+                outcome=dimension,
+                genre=genre,
+                effect_size=mean_difference / sd_difference if sd_difference > 0 else np.nan,
+                order_effect=order_effect,
+                sample_sizes=sample_sizes,
+                power=power[row],
+                replicates=replicates,
+                alpha=alpha
+            )
+        # 維持與統計結果相同的格順序
+        return {cell: results[cell] for cell in cells}
+    
+    @staticmethod
+    def estimate_order_effects(frame: pd.DataFrame, outcomes: Optional[List[str]] = None,
+                               first_phase: str = 'music1', second_phase: str = 'music2') -> pd.Series:
+        """
+        由多場次資料估計播放順序效果 (第二首 - 第一首的平均)
+        
+        A/B 兩組的曲目順序相反，兩組人數相近時曲目差異互相抵銷，剩下的是播放位置的效果。
+        
+        Args:
+            frame: DataLoaderService.load_session_results 的結果
+            outcomes: 結果變項，預設為所有非鍵值的數值欄位
+            
+        Returns:
+            pd.Series: 結果變項 -> 順序效果
+        """
+        if outcomes is None:
+            keys = set(AnalysisConfig.SESSION_KEY_COLUMNS)
+            outcomes = [column for column in frame.select_dtypes(include='number').columns if column not in keys]
+        phases = frame[frame['phase'].isin([first_phase, second_phase])]
+        by_phase = phases.groupby(['session', 'phase'])[outcomes].mean().unstack('phase')
+        if by_phase.empty or first_phase not in by_phase.columns.get_level_values('phase') \
+                or second_phase not in by_phase.columns.get_level_values('phase'):
+            return pd.Series(np.nan, index=outcomes)
+        differences = by_phase.xs(second_phase, axis=1, level='phase') - by_phase.xs(first_phase, axis=1, level='phase')
+        return differences.mean().reindex(outcomes)
+    
+    @staticmethod
+    def repeated_measures_power(frame: pd.DataFrame, outcomes: Optional[List[str]] = None,
+                                factor: Optional[str] = None, subject: Optional[str] = None,
+                                sample_sizes: Optional[List[int]] = None,
+                                replicates: Optional[int] = None,
+                                alpha: Optional[float] = None,
+                                distribution: str = 'normal',
+                                sphericity_correction: bool = True,
+                                seed: Optional[int] = None,
+                                workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        以多場次資料中各水準的平均與殘差變異為效果設定，模擬重複量數 ANOVA 的檢定力
+        
+        每個結果變項在預設設定下約需數秒 (單核心約 4 秒)，生理特徵約 60 欄，全部模擬需數分鐘；
+        預設只模擬問卷各維度，生理特徵請以 outcomes 指定。
+        
+        Args:
+            frame: 長格式資料 (問卷各維度與各階段生理特徵)
+            outcomes: 結果變項，預設為 frame.attrs['questionnaire_columns'] (load_session_results 記錄的
+                      問卷維度)，沒有時為所有非鍵值的數值欄位
+            factor: 受試者內因子，預設 AnalysisConfig.SESSION_COLUMN
+            subject: 受試者欄位，預設 AnalysisConfig.SESSION_SUBJECT_COLUMN
+            distribution: 'normal' 或 'empirical' (整列重抽觀察到的殘差)
+            sphericity_correction: 是否以 Greenhouse-Geisser 校正後的 p 值判斷顯著
+            其餘參數同 paired_power
+            
+        Returns:
+            Dict[outcome, PowerResult 或 錯誤訊息字串]
+        """
+        if distribution not in ('normal', 'empirical'):
+            raise ValueError(f"未知的誤差分布: {distribution}")
+        sample_sizes, replicates, alpha = PowerAnalysisService._settings(sample_sizes, replicates, alpha)
+        factor = factor or AnalysisConfig.SESSION_COLUMN
+        subject = subject or AnalysisConfig.SESSION_SUBJECT_COLUMN
+        seed = AnalysisConfig.RESAMPLING_SEED if seed is None else seed
+        if outcomes is None:
+            outcomes = frame.attrs.get('questionnaire_columns')
+        if outcomes is None:
+            keys = set(AnalysisConfig.SESSION_KEY_COLUMNS) | {factor, subject}
+            outcomes = [column for column in frame.select_dtypes(include='number').columns
+                        if column not in keys]
+        values, _, levels = RepeatedMeasuresService.build_array(frame, outcomes, factor, subject)
+        if len(levels) < 2:
+            raise ValueError(f"因子 '{factor}' 至少需要兩個水準")
+        if len(levels) != AnalysisConfig.PLANNED_SESSIONS:
+            print(f"注意：資料中 '{factor}' 有 {len(levels)} 個水準，規劃設計為 "
+                  f"{AnalysisConfig.PLANNED_SESSIONS} 個；以資料中的水準模擬")
+        
+        results: Dict[str, Any] = {}
+        specs = []
+        for o, outcome in enumerate(outcomes):
+            observed = values[:, :, o]
+            observed = observed[~np.isnan(observed).any(axis=1)]
+            if len(observed) < 2:
+                results[outcome] = "資料量不足，無法進行統計分析"
+                continue
+            level_means = observed.mean(axis=0)
+            # 去除受試者與水準平均後的殘差；誤差變異為 ANOVA 的 MS_error
+            residuals = observed - observed.mean(axis=1, keepdims=True) - level_means + level_means.mean()
+            error_sd = float(np.sqrt((residuals ** 2).sum() / ((len(observed) - 1) * (len(levels) - 1))))
+            if error_sd == 0:
+                results[outcome] = "誤差變異為 0，無法模擬"
+                continue
+            effects = level_means - level_means.mean()
+            # 殘差列重抽前放大到與 MS_error 相同的變異
+            scaled = residuals * np.sqrt(len(observed) / (len(observed) - 1.0))
+            specs.append((outcome, effects, error_sd, scaled if distribution == 'empirical' else None))
+        
+        def kernel(effects, error_sd, residuals):
+            return lambda n, count, rng: PowerAnalysisService.anova_rejections(
+                n, count, effects, error_sd, alpha, rng, residuals, sphericity_correction)
+        
+        power = PowerAnalysisService.simulate(
+            [kernel(*spec[1:]) for spec in specs], sample_sizes, replicates, seed, workers)
+        for row, (outcome, effects, error_sd, _) in enumerate(specs):
+            results[outcome] = PowerResult(
+                analysis='repeated_measures',
+                outcome=outcome,
+                genre=None,
+                effect_size=float(np.sqrt((effects ** 2).mean()) / error_sd),
+                order_effect=0.0,
+                sample_sizes=sample_sizes,
+                power=power[row],
+                replicates=replicates,
+                alpha=alpha
+            )
+        return {outcome: results[outcome] for outcome in outcomes}
+    
+    @staticmethod
+    def to_frame(results: Dict[Any, Any]) -> pd.DataFrame:
+        """檢定力結果轉為長格式表 (每個效果設定 × 樣本數一列，略過錯誤訊息)"""
+        rows = [
+            {'analysis': result.analysis, 'genre': result.genre, 'outcome': result.outcome,
+             'effect_size': result.effect_size, 'order_effect': result.order_effect, 'n': int(n),
+             'power': float(power), 'standard_error': float(se)}
+            for result in results.values() if isinstance(result, PowerResult)
+            for n, power, se in zip(result.sample_sizes, result.power, result.standard_error)
+        ]
+        return pd.DataFrame(rows, columns=['analysis', 'genre', 'outcome', 'effect_size', 'order_effect',
+                                           'n', 'power', 'standard_error'])
 
 class ReportGeneratorService:
     """報告生成服務"""
@@ -348,7 +1427,7 @@ class ReportGeneratorService:
         # 計算每種音樂類型的樣本數
         genre_counts = {}
         for genre in experiment_data.get_unique_genres():
-            genre_counts[genre] = len(experiment_data.get_subjects_by_genre(genre))
+            genre_counts[genre] = len(experiment_data.genre_rows(genre))
         
         report_lines.append("- 各音樂類型樣本數:")
         for genre, count in genre_counts.items():
@@ -391,10 +1470,13 @@ class ReportGeneratorService:
                     flat_mean = round(result.flat_mean, AnalysisConfig.DECIMAL_PLACES)
                     eq_mean = round(result.eq_mean, AnalysisConfig.DECIMAL_PLACES)
                     p_value = round(result.p_value, AnalysisConfig.P_VALUE_DECIMAL_PLACES)
+                    p_text = f"p = {p_value}"
+                    if result.p_adjusted is not None:
+                        p_text += f"，校正後 p = {round(result.p_adjusted, AnalysisConfig.P_VALUE_DECIMAL_PLACES)}"
                     
                     report_lines.append(
                         f"   * {dimension_name}：Flat 平均 {flat_mean}，EQ 平均 {eq_mean}，"
-                        f"{direction}，{significance_text} (p = {p_value})"
+                        f"{direction}，{significance_text} ({p_text})"
                     )
                     
                 except Exception as e:
@@ -443,6 +1525,10 @@ class ReportGeneratorService:
                         'is_significant': result.is_significant(),
                         'significance_level': result.get_significance_level()
                     }
+                    if result.p_adjusted is not None:
+                        summary['results'][genre][dimension_key]['p_adjusted'] = round(
+                            result.p_adjusted, AnalysisConfig.P_VALUE_DECIMAL_PLACES)
+                        summary['results'][genre][dimension_key]['correction'] = result.correction
                     
                 except Exception as e:
                     summary['results'][genre][dimension_key] = {
@@ -495,6 +1581,139 @@ class MusicExperimentAnalyzer:
         
         return ReportGeneratorService.generate_statistical_summary(self.experiment_data)
     
+    def get_resampling_summary(self, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        取得各音樂類型 × 維度的重抽樣推論結果 (字典格式)
+        
+        Args:
+            seed: 亂數種子，預設 AnalysisConfig.RESAMPLING_SEED
+            
+        Returns:
+            Dict[str, Any]: {genre: {dimension: 結果}}
+        """
+        if self.experiment_data is None:
+            raise ValueError("請先載入資料")
+        
+        cells = ResamplingAnalysisService.analyze_all_cells(self.experiment_data, seed=seed)
+        summary: Dict[str, Any] = {}
+        for (genre, dimension), result in cells.items():
+            if isinstance(result, str):
+                summary.setdefault(genre, {})[dimension] = {'error': result}
+                continue
+            places = AnalysisConfig.DECIMAL_PLACES
+            summary.setdefault(genre, {})[dimension] = {
+                'dimension_name': AnalysisConfig.ANALYSIS_DIMENSIONS[dimension]['name'],
+                'sample_size': result.sample_size,
+                'mean_difference': round(result.mean_difference, places),
+                'mean_difference_ci': [round(value, places) for value in result.mean_difference_ci],
+                'effect_size': round(result.effect_size, places),
+                'effect_size_ci': [round(value, places) for value in result.effect_size_ci],
+                'permutation_p': round(result.permutation_p, AnalysisConfig.P_VALUE_DECIMAL_PLACES),
+                'exact_permutation': result.exact_permutation,
+                'bootstrap_resamples': result.bootstrap_resamples,
+                'permutation_resamples': result.permutation_resamples,
+                'confidence': result.confidence
+            }
+        return summary
+    
+    def analyze_repeated_measures(self, results_path: Optional[str] = None,
+                                  features_path: Optional[str] = None,
+                                  factor: Optional[str] = None, method: str = 'anova',
+                                  outcomes: Optional[List[str]] = None) -> RepeatedMeasuresResult:
+        """
+        多場次設計的重複量數分析 (問卷各維度與生理特徵一次計算)
+        
+        Args:
+            results_path: 場次目錄所在位置，預設 AnalysisConfig.SESSION_RESULTS_PATH
+            features_path: bio_analysis.batch 的生理特徵表，可選
+            factor: 受試者內因子 ('session_number' 或 'category')
+            method: 'anova' 或 'friedman'
+            outcomes: 結果變項，預設為所有數值欄位
+            
+        Returns:
+            RepeatedMeasuresResult
+        """
+        session_data = DataLoaderService.load_session_results(results_path, features_path)
+        if session_data.empty:
+            raise ValueError("找不到任何場次的問卷結果")
+        return RepeatedMeasuresService.analyze(session_data, outcomes=outcomes, factor=factor, method=method)
+    
+    def get_power_summary(self, order_effects: Optional[Dict[str, float]] = None,
+                          distribution: str = 'normal', seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        取得各音樂類型 × 維度在規劃設計下的檢定力 (字典格式)
+        
+        Args:
+            order_effects: 各維度的播放順序效果，可由 PowerAnalysisService.estimate_order_effects 估計
+            distribution: 'normal' 或 'empirical'
+            seed: 亂數種子，預設 AnalysisConfig.RESAMPLING_SEED
+            
+        Returns:
+            Dict[str, Any]: {genre: {dimension: 結果}}
+        """
+        if self.experiment_data is None:
+            raise ValueError("請先載入資料")
+        
+        cells = PowerAnalysisService.paired_power(
+            self.experiment_data, order_effects=order_effects, distribution=distribution, seed=seed)
+        summary: Dict[str, Any] = {}
+        for (genre, dimension), result in cells.items():
+            if isinstance(result, str):
+                summary.setdefault(genre, {})[dimension] = {'error': result}
+                continue
+            summary.setdefault(genre, {})[dimension] = {
+                'dimension_name': AnalysisConfig.ANALYSIS_DIMENSIONS[dimension]['name'],
+                'effect_size': round(result.effect_size, AnalysisConfig.DECIMAL_PLACES),
+                'order_effect': result.order_effect,
+                'planned_subjects': AnalysisConfig.PLANNED_SUBJECTS,
+                'power_at_planned': round(result.power_at(AnalysisConfig.PLANNED_SUBJECTS), 3),
+                'target_power': AnalysisConfig.POWER_TARGET,
+                'required_n': result.required_n(),
+                'sample_sizes': result.sample_sizes.tolist(),
+                'power': [round(float(value), 3) for value in result.power],
+                'replicates': result.replicates,
+                'alpha': result.alpha
+            }
+        return summary
+    
+    def analyze_repeated_measures_power(self, results_path: Optional[str] = None,
+                                        features_path: Optional[str] = None,
+                                        factor: Optional[str] = None,
+                                        outcomes: Optional[List[str]] = None,
+                                        distribution: str = 'normal',
+                                        seed: Optional[int] = None) -> pd.DataFrame:
+        """
+        以多場次資料 (問卷各維度與各階段生理特徵) 估計規劃設計下重複量數 ANOVA 的檢定力
+        
+        Args:
+            results_path: 場次目錄所在位置，預設 AnalysisConfig.SESSION_RESULTS_PATH
+            features_path: bio_analysis.batch 的生理特徵表，可選
+            factor: 受試者內因子 ('session_number' 或 'category')
+            outcomes: 結果變項，預設為問卷各維度 (生理特徵每欄約需數秒，需要時明確指定)
+            distribution: 'normal' 或 'empirical'
+            seed: 亂數種子，預設 AnalysisConfig.RESAMPLING_SEED
+            
+        Returns:
+            pd.DataFrame: 每個結果變項一列 (效果量、規劃樣本數的檢定力、達目標檢定力所需樣本數)
+        """
+        session_data = DataLoaderService.load_session_results(results_path, features_path)
+        if session_data.empty:
+            raise ValueError("找不到任何場次的問卷結果")
+        results = PowerAnalysisService.repeated_measures_power(
+            session_data, outcomes=outcomes, factor=factor, distribution=distribution, seed=seed)
+        rows = []
+        for outcome, result in results.items():
+            if isinstance(result, str):
+                rows.append({'outcome': outcome, 'error': result})
+                continue
+            rows.append({
+                'outcome': outcome,
+                'effect_size_f': result.effect_size,
+                'power_at_planned': result.power_at(AnalysisConfig.PLANNED_SUBJECTS),
+                'required_n': result.required_n(),
+            })
+        return pd.DataFrame(rows)
+    
     def analyze_by_genre(self, genre: str) -> str:
         """
         分析特定音樂類型
@@ -525,7 +1744,8 @@ class MusicExperimentAnalyzer:
                     f"EQ M={result.eq_mean:.2f} (SD={result.eq_std:.2f}), "
                     f"t({result.degrees_freedom})={result.t_statistic:.2f}, "
                     f"p={result.p_value:.3f}, "
-                    f"d={result.effect_size:.2f}"
+                    + (f"p_adj={result.p_adjusted:.3f}, " if result.p_adjusted is not None else "")
+                    + f"d={result.effect_size:.2f}"
                 )
                 
             except Exception as e:
@@ -556,10 +1776,10 @@ class MusicExperimentAnalyzer:
             report_lines.append(f"Round {data.round_number} - {data.genre}音樂:")
             
             for dimension_key, dimension_config in AnalysisConfig.ANALYSIS_DIMENSIONS.items():
-                flat_val = data.get_response(dimension, 'Flat')
-                eq_val = data.get_response(dimension, 'EQ')
+                flat_val = data.get_response(dimension_key, 'Flat')
+                eq_val = data.get_response(dimension_key, 'EQ')
                 
-                if flat_val is not None and eq_val is not None:
+                if pd.notna(flat_val) and pd.notna(eq_val):
                     diff = eq_val - flat_val
                     report_lines.append(
                         f"  {dimension_config['name']}: Flat={flat_val}, EQ={eq_val}, 差異={diff:+.1f}"
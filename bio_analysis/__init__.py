@@ -0,0 +1,7 @@
+# bio_analysis/__init__.py
+"""
+生理訊號離線分析模組
+讀取 bio_signal 記錄的場次資料，不需載入實驗介面（PySide6）。
+
+    from bio_analysis.query import query
+"""
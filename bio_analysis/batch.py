@@ -0,0 +1,270 @@
+# bio_analysis/batch.py
+"""
+整批處理 test_result 下的所有場次
+每個場次目錄（P###_S#_G{A|B}[_BIO]_時間戳）依序執行 載入 → 排除品質不佳區段 → 依階段切分 → 特徵計算，
+以多個行程平行處理，結果彙整為一張「場次 × 時間窗」特徵表：
+
+    python -m bio_analysis.batch --root ./test_result --output study_features.csv
+    python -m bio_analysis.batch --window music1:last:60 --window music2:last:60 --workers 8
+
+單一場次失敗（檔案損毀、缺少記錄）只記錄錯誤，不中斷整批；錯誤寫在 <輸出檔>.errors.json。
+成功的場次結果存入 <root>/.analysis_cache（見 cache.py），輸入檔與參數未改變的場次直接沿用，
+每晚重新分析時只計算新增或修改過的場次。
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .cache import CACHE_DIR_NAME, ResultCache
+from .epochs import epoch_session, load_phase_table
+from .features import FEATURES_VERSION, epoch_features, feature_names
+from .loader import LOADER_VERSION, SIGNALS, load_session
+from .quality import EXCLUDED_STATUSES, exclude_bad_segments, read_quality_log
+
+DEFAULT_ROOT = "./test_result"
+DEFAULT_OUTPUT = "study_features.csv"
+SESSION_PATTERN = re.compile(r"^P(\d{3})_S(\d+)_G([AB])(_BIO)?_(\d{8}_\d{6})$")
+INFO_FILE = "experiment_info.json"
+SESSION_COLUMNS = ["session", "subject_id", "session_number", "group", "bio", "folder_time",
+                   "category", "category_code", "song_order"]
+WINDOW_COLUMNS = ["window", "phase", "start", "end", "duration_s", "music_id"]
+ANALYSIS_VERSION = f"features{FEATURES_VERSION}-loader{LOADER_VERSION}"
+
+
+def parse_session_name(name):
+    """
+    解析場次目錄名稱
+
+    Returns:
+        dict；名稱不符合格式時為 None
+    """
+    match = SESSION_PATTERN.match(name)
+    if match is None:
+        return None
+    subject, session, group, bio, folder_time = match.groups()
+    return {
+        "session": name,
+        "subject_id": int(subject),
+        "session_number": int(session),
+        "group": group,
+        "bio": bio is not None,
+        "folder_time": folder_time,
+    }
+
+
+def discover_sessions(root=DEFAULT_ROOT):
+    """
+    找出 root 下所有符合命名格式的場次目錄，依名稱排序
+
+    Returns:
+        List[str]: 場次目錄路徑
+    """
+    if not os.path.isdir(root):
+        return []
+    return [
+        os.path.join(root, name)
+        for name in sorted(os.listdir(root))
+        if parse_session_name(name) is not None and os.path.isdir(os.path.join(root, name))
+    ]
+
+
+def read_session_info(session_dir):
+    """目錄名稱與 experiment_info.json 合併的場次資訊（json 以目錄名稱補齊缺少的欄位）"""
+    info = parse_session_name(os.path.basename(os.path.normpath(session_dir))) or {}
+    path = os.path.join(session_dir, INFO_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for key in ("subject_id", "session_number", "group"):
+            if key in data:
+                info[key] = data[key]
+        info["category"] = data.get("category", "")
+        info["category_code"] = data.get("category_code", "")
+        info["song_order"] = "|".join(str(item) for item in data.get("song_order", []))
+    return info
+
+
+def parse_window(spec):
+    """
+    解析子時間窗設定 "階段:first|last:秒數"，例如 "music1:last:60"
+
+    Returns:
+        (階段, "first" 或 "last", 秒數)
+    """
+    parts = spec.split(":")
+    if len(parts) != 3 or parts[1] not in ("first", "last"):
+        raise ValueError(f"時間窗格式應為 階段:first|last:秒數，收到 {spec}")
+    return parts[0], parts[1], float(parts[2])
+
+
+def build_windows(table, windows=()):
+    """階段表加上子時間窗（不存在的階段略過）"""
+    extra = []
+    for phase, kind, seconds in windows:
+        if phase in table:
+            extra.append(table.window(phase, first_s=seconds) if kind == "first"
+                         else table.window(phase, last_s=seconds))
+    return table.concat(*extra) if extra else table
+
+
+def process_session(session_dir, windows=(), signals=SIGNALS, use_cache=True, exclude_statuses=EXCLUDED_STATUSES):
+    """
+    處理單一場次（在工作行程中執行）
+
+    exclude_statuses 為 bio_quality_log.csv 中要排除的區段狀態，空值表示不排除。
+
+    Returns:
+        dict: {"session", "rows", "error", "seconds"}；失敗時 rows 為空、error 為錯誤訊息
+    """
+    start = time.time()
+    name = os.path.basename(os.path.normpath(session_dir))
+    try:
+        info = read_session_info(session_dir)
+        table = build_windows(load_phase_table(session_dir), windows)
+        data = load_session(session_dir, signals, use_cache)
+        if exclude_statuses:
+            data = exclude_bad_segments(data, read_quality_log(session_dir, exclude_statuses))
+        features = epoch_features(epoch_session(data, table))
+        rows = []
+        for window in table.rows():
+            row = {key: info.get(key, "") for key in SESSION_COLUMNS}
+            row.update({
+                "window": window["name"],
+                "phase": window["phase"],
+                "start": window["start"],
+                "end": window["end"],
+                "duration_s": window["duration_s"],
+                "music_id": window["music_id"],
+            })
+            row.update(features.get(window["name"], {}))
+            rows.append(row)
+        return {"session": name, "rows": rows, "error": None, "seconds": time.time() - start}
+    except Exception as e:
+        return {"session": name, "rows": [], "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(), "seconds": time.time() - start}
+
+
+def _compute(pending, workers, windows, signals, use_cache, exclude_statuses):
+    """計算未命中快取的場次，逐一產生 (快取鍵, 結果)"""
+    if workers == 1:
+        for session_dir, key in pending:
+            yield key, process_session(session_dir, windows, signals, use_cache, exclude_statuses)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_session, session_dir, windows, signals, use_cache, exclude_statuses):
+                   (session_dir, key)
+                   for session_dir, key in pending}
+        for future in as_completed(futures):
+            session_dir, key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 工作行程異常結束（例如記憶體不足被終止）
+                result = {"session": os.path.basename(session_dir), "rows": [],
+                          "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+            yield key, result
+
+
+def run_batch(root=DEFAULT_ROOT, output=DEFAULT_OUTPUT, workers=None, windows=(),
+              signals=SIGNALS, use_cache=True, reuse_results=True, cache_dir=None,
+              exclude_statuses=EXCLUDED_STATUSES):
+    """
+    平行處理所有場次並寫出彙整特徵表
+
+    Args:
+        workers: 行程數，預設為 CPU 核心數；1 時在目前行程依序處理（方便除錯）
+        use_cache: 載入訊號時使用 .bio_cache 陣列快取
+        reuse_results: 沿用結果快取中輸入未改變的場次
+        cache_dir: 結果快取目錄，預設為 <root>/.analysis_cache
+        exclude_statuses: 排除 bio_quality_log.csv 中這些狀態的區段，空值表示不排除
+
+    Returns:
+        dict: {"sessions", "computed", "cached", "rows", "errors", "seconds", "output"}
+    """
+    start = time.time()
+    sessions = discover_sessions(root)
+    print(f"[批次分析] {root} 共 {len(sessions)} 個場次")
+    cache = ResultCache(cache_dir or os.path.join(root, CACHE_DIR_NAME)) if reuse_results else None
+    params = {"windows": [list(window) for window in windows], "signals": list(signals),
+              "exclude_statuses": list(exclude_statuses or ())}
+
+    results = []
+    pending = []
+    for session_dir in sessions:
+        key = None
+        if cache is not None:
+            try:
+                key = cache.session_key(session_dir, ANALYSIS_VERSION, params)
+            except OSError as e:
+                print(f"[批次分析] 無法計算 {os.path.basename(session_dir)} 的快取鍵: {e}")
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                results.append(cached)
+                continue
+        pending.append((session_dir, key))
+    if cache is not None:
+        print(f"[批次分析] 沿用快取 {len(sessions) - len(pending)} 個，需計算 {len(pending)} 個")
+
+    for key, result in _compute(pending, workers, windows, signals, use_cache, exclude_statuses):
+        if cache is not None and key is not None and not result["error"]:
+            cache.put(key, result["session"], result)
+        results.append(result)
+    if cache is not None:
+        cache.save()
+
+    results.sort(key=lambda result: result["session"])
+    errors = {result["session"]: result["error"] for result in results if result["error"]}
+    for session, error in errors.items():
+        print(f"[批次分析] {session} 失敗: {error}")
+    rows = [row for result in results for row in result["rows"]]
+    write_feature_table(output, rows, signals)
+    with open(output + ".errors.json", "w", encoding="utf-8") as f:
+        json.dump({result["session"]: {"error": result["error"], "traceback": result.get("traceback")}
+                   for result in results if result["error"]}, f, ensure_ascii=False, indent=2)
+
+    summary = {
+        "sessions": len(sessions),
+        "computed": len(pending),
+        "cached": len(sessions) - len(pending),
+        "rows": len(rows),
+        "errors": len(errors),
+        "seconds": round(time.time() - start, 2),
+        "output": output,
+    }
+    print(f"[批次分析] 完成 {len(sessions) - len(errors)}/{len(sessions)} 個場次，"
+          f"{len(rows)} 列，耗時 {summary['seconds']} 秒 → {output}")
+    return summary
+
+
+def write_feature_table(path, rows, signals=SIGNALS):
+    """寫出特徵表；表頭固定為場次欄位、時間窗欄位、各訊號特徵"""
+    columns = SESSION_COLUMNS + WINDOW_COLUMNS
+    for signal in signals:
+        columns += feature_names(signal.lower())
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="整批計算 test_result 各場次、各階段的生理訊號特徵")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="場次目錄所在位置（預設 ./test_result）")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="彙整特徵表 CSV")
+    parser.add_argument("--workers", type=int, default=None, help="平行行程數（預設為 CPU 核心數）")
+    parser.add_argument("--window", action="append", default=[],
+                        help="額外的子時間窗，格式 階段:first|last:秒數，可重複指定")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 .bio_cache 快取")
+    parser.add_argument("--recompute", action="store_true", help="忽略結果快取，所有場次重新計算")
+    parser.add_argument("--cache-dir", default=None, help="結果快取目錄（預設 <root>/.analysis_cache）")
+    parser.add_argument("--keep-bad-segments", action="store_true",
+                        help="不排除 bio_quality_log.csv 記錄的飽和 / 平線區段")
+    args = parser.parse_args()
+    run_batch(args.root, args.output, args.workers, [parse_window(spec) for spec in args.window],
+              use_cache=not args.no_cache, reuse_results=not args.recompute, cache_dir=args.cache_dir,
+              exclude_statuses=() if args.keep_bad_segments else EXCLUDED_STATUSES)
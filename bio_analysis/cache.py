@@ -0,0 +1,221 @@
+# bio_analysis/cache.py
+"""
+場次分析結果快取
+以場次輸入檔（生理訊號 CSV、event_log.csv、問卷 CSV、experiment_info.json ...）的內容雜湊
+加上特徵演算法版本與分析參數作為鍵，保存每個場次的衍生結果；重新分析整個研究時，
+只有新增或內容改變的場次需要重新計算。
+
+- 檔案雜湊（BLAKE2b）依 (大小, 修改時間) 記錄在 file_hashes.json，未改變的檔案不重新讀取
+- 結果存成 <鍵>.json，index.json 記錄每筆的場次、大小與最後使用時間
+- 超過容量或筆數上限時依最後使用時間（LRU）淘汰
+- 只由單一行程讀寫（batch 由主行程查詢與寫入，工作行程只負責計算）
+
+    python -m bio_analysis.cache stats --dir ./test_result/.analysis_cache
+    python -m bio_analysis.cache invalidate --session P001_S1_GA_BIO_20251112_162030
+    python -m bio_analysis.cache invalidate --all
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR_NAME = ".analysis_cache"
+INDEX_FILE = "index.json"
+HASHES_FILE = "file_hashes.json"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# 影響分析結果的場次輸入檔
+INPUT_PATTERNS = (
+    "bio_result_*",
+    "bio_session_manifest.json",
+    "event_log.csv",
+    "bio_event_log.csv",
+    "bio_quality_log.csv",
+    "*_evaluation_*.csv",
+    "experiment_info.json",
+)
+IGNORED_SUFFIXES = (".idx.npz", ".tmp")
+
+
+def session_inputs(session_dir):
+    """場次目錄中影響分析結果的檔案（依名稱排序）"""
+    names = []
+    for name in sorted(os.listdir(session_dir)):
+        if name.startswith(".") or name.endswith(IGNORED_SUFFIXES):
+            continue
+        if any(fnmatch.fnmatch(name, pattern) for pattern in INPUT_PATTERNS):
+            if os.path.isfile(os.path.join(session_dir, name)):
+                names.append(name)
+    return names
+
+
+def hash_file(path):
+    """檔案內容的 BLAKE2b 雜湊（串流讀取）"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class ResultCache:
+    """以內容雜湊為鍵的場次結果快取"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, max_entries=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self.index = _read_json(os.path.join(directory, INDEX_FILE), {})
+        self.hashes = _read_json(os.path.join(directory, HASHES_FILE), {})
+        self.hits = 0
+        self.misses = 0
+        self.hashed_files = 0
+
+    def file_hash(self, path):
+        """檔案內容雜湊；大小與修改時間未變時沿用記錄的雜湊"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.hashes.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hash_file(path)
+        self.hashes[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        self.hashed_files += 1
+        return digest
+
+    def session_key(self, session_dir, version, params=None):
+        """
+        場次的快取鍵：場次目錄名稱、輸入檔名稱與內容雜湊、演算法版本、分析參數
+
+        目錄名稱也納入鍵中：結果含有場次資訊，複製而內容相同的場次不可共用結果。
+
+        Args:
+            version: 演算法版本（任何改變結果的程式修改都應更新）
+            params: 分析參數（可 JSON 序列化，例如子時間窗設定）
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        session = os.path.basename(os.path.normpath(session_dir))
+        digest.update(json.dumps({"session": session, "version": version, "params": params},
+                                 sort_keys=True).encode("utf-8"))
+        for name in session_inputs(session_dir):
+            digest.update(name.encode("utf-8"))
+            digest.update(self.file_hash(os.path.join(session_dir, name)).encode("ascii"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """取得快取結果；不存在時為 None"""
+        entry = self.index.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value = _read_json(self._entry_path(key), None)
+        if value is None:
+            # 結果檔遺失或損毀
+            del self.index[key]
+            self.misses += 1
+            return None
+        entry["last_access"] = time.time()
+        self.hits += 1
+        return value
+
+    def put(self, key, session, value):
+        """寫入結果（輸入已改變的舊結果不再被使用，隨 LRU 淘汰）"""
+        path = self._entry_path(key)
+        _write_json(path, value)
+        now = time.time()
+        self.index[key] = {"session": session, "bytes": os.path.getsize(path), "created": now, "last_access": now}
+        self.evict()
+
+    def _remove(self, key):
+        self.index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """依最後使用時間淘汰，直到容量與筆數都在上限內；回傳淘汰筆數"""
+        removed = 0
+        by_age = sorted(self.index, key=lambda k: self.index[k]["last_access"])
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for key in by_age:
+            over_size = self.max_bytes is not None and total > self.max_bytes
+            over_count = self.max_entries is not None and len(self.index) > self.max_entries
+            if not (over_size or over_count):
+                break
+            total -= self.index[key]["bytes"]
+            self._remove(key)
+            removed += 1
+        return removed
+
+    def invalidate(self, session=None):
+        """
+        移除指定場次（名稱）的結果；session 為 None 時清除全部
+
+        Returns:
+            int: 移除筆數
+        """
+        keys = [k for k, entry in self.index.items() if session is None or entry["session"] == session]
+        for key in keys:
+            self._remove(key)
+        if session is None:
+            self.hashes = {}
+        return len(keys)
+
+    def stats(self):
+        return {
+            "entries": len(self.index),
+            "bytes": sum(entry["bytes"] for entry in self.index.values()),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hashed_files": self.hashed_files,
+        }
+
+    def save(self):
+        """保存索引與檔案雜湊記錄（不存在的檔案一併移除）"""
+        self.hashes = {path: known for path, known in self.hashes.items() if os.path.exists(path)}
+        _write_json(os.path.join(self.directory, INDEX_FILE), self.index)
+        _write_json(os.path.join(self.directory, HASHES_FILE), self.hashes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="場次分析結果快取管理")
+    parser.add_argument("command", choices=["stats", "invalidate", "prune"])
+    parser.add_argument("--dir", default=os.path.join("./test_result", CACHE_DIR_NAME), help="快取目錄")
+    parser.add_argument("--session", help="invalidate：只移除此場次（目錄名稱）")
+    parser.add_argument("--all", action="store_true", help="invalidate：清除全部")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024, help="prune：容量上限 (MB)")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.dir, max_bytes=int(args.max_mb * 1024 * 1024))
+    if args.command == "invalidate":
+        if not args.session and not args.all:
+            parser.error("invalidate 需要 --session 或 --all")
+        print(f"已移除 {cache.invalidate(None if args.all else args.session)} 筆快取")
+    elif args.command == "prune":
+        print(f"已淘汰 {cache.evict()} 筆快取")
+    cache.save()
+    print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,342 @@
+# bio_analysis/epochs.py
+"""
+依實驗階段切分訊號
+場次目錄有兩份階段記錄：
+
+- event_log.csv（EventLogger）：phase_start / phase_end，時間為本地時間字串（毫秒）
+- bio_event_log.csv（BioSignalManager.mark_label_event）：LABEL_CHANGE，時間為 unix 秒數，
+  只有切換點，階段結束即下一個標籤開始
+
+load_phase_table 以 event_log.csv 為準合併兩者成一張階段表，event_log.csv 缺少的階段
+以 bio_event_log.csv 補上。unix 秒數依分析電腦的時區轉為本地時間，與錄製電腦時區不同時
+兩者會差整數個時區，因此先以各階段開始時間差的中位數（取最接近的 15 分鐘）校正。
+
+切分時每個訊號對所有邊界只做一次 searchsorted，各階段取得的是原陣列的 view：
+
+    table = load_phase_table(session_dir)
+    epochs = epoch_session(load_session(session_dir), table.window("music1", last_s=60))
+    epochs["music1"]["gsr"].values
+"""
+import csv
+import os
+
+import numpy as np
+
+from .timestamps import format_ms, to_ms, unix_to_ms
+
+EVENT_LOG = "event_log.csv"
+BIO_EVENT_LOG = "bio_event_log.csv"
+END_MARKERS = ("complete",)       # 只標示實驗結束，不是階段
+TIMEZONE_STEP_MS = 15 * 60 * 1000
+RECONCILE_TOLERANCE_MS = 1000     # 兩份記錄的開始時間差超過此值時提出警告
+
+
+class PhaseTable:
+    """
+    階段表：每列一個時間窗 [start, end)（毫秒）
+
+    names 為時間窗名稱；一般即階段名稱，子時間窗為 "music1_last60s"、"music1_w0" 等，
+    phases 為所屬階段。end 為 None 的階段（缺少結束記錄）以 end_ms = INT64 最大值表示。
+    """
+
+    OPEN_END = np.iinfo(np.int64).max
+
+    def __init__(self, names, phases, starts, ends, music_ids=None, sources=None, offsets=None, info=None):
+        self.names = list(names)
+        self.phases = list(phases)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.music_ids = list(music_ids) if music_ids is not None else [""] * len(self.names)
+        self.sources = list(sources) if sources is not None else [""] * len(self.names)
+        self.offsets = list(offsets) if offsets is not None else [None] * len(self.names)
+        self.info = info or {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def bounds(self, name):
+        """時間窗的 (start_ms, end_ms)"""
+        i = self.index(name)
+        return int(self.starts[i]), int(self.ends[i])
+
+    def durations(self):
+        """各時間窗長度（秒）；無結束時間者為 NaN"""
+        durations = (self.ends - self.starts) / 1000.0
+        durations[self.ends == self.OPEN_END] = np.nan
+        return durations
+
+    def select(self, names):
+        """只保留指定的時間窗（依給定順序，不存在者略過）"""
+        rows = [self.index(name) for name in names if name in self.names]
+        return self._take(rows)
+
+    def _take(self, rows, names=None, starts=None, ends=None):
+        return PhaseTable(
+            names if names is not None else [self.names[i] for i in rows],
+            [self.phases[i] for i in rows],
+            starts if starts is not None else self.starts[rows],
+            ends if ends is not None else self.ends[rows],
+            [self.music_ids[i] for i in rows],
+            [self.sources[i] for i in rows],
+            [self.offsets[i] for i in rows],
+            self.info,
+        )
+
+    def window(self, phase, first_s=None, last_s=None, offset_s=0.0, name=None):
+        """
+        階段內的固定時間窗（裁切在階段範圍內）
+
+        Args:
+            phase: 階段名稱
+            first_s: 取開頭 first_s 秒（從 offset_s 起算）
+            last_s: 取結尾 last_s 秒（到結束前 offset_s 為止）
+            offset_s: 略過開頭（first_s 或皆未指定時）或結尾（last_s 時）的秒數
+            name: 時間窗名稱，預設為 "<phase>_first60s" / "<phase>_last60s"
+
+        Returns:
+            PhaseTable（一列）；階段不存在時為空表
+        """
+        if phase not in self.names:
+            return self._take([])
+        i = self.index(phase)
+        start, end = int(self.starts[i]), int(self.ends[i])
+        offset = int(round(offset_s * 1000))
+        if last_s is not None:
+            if end == self.OPEN_END:
+                raise ValueError(f"階段 {phase} 沒有結束時間，無法取結尾時間窗")
+            end -= offset
+            start = max(start, end - int(round(last_s * 1000)))
+            label = name or f"{phase}_last{last_s:g}s"
+        else:
+            start += offset
+            if first_s is not None:
+                end = min(end, start + int(round(first_s * 1000)))
+            label = name or (f"{phase}_first{first_s:g}s" if first_s is not None else f"{phase}_from{offset_s:g}s")
+        return self._take([i], names=[label], starts=[start], ends=[max(start, end)])
+
+    def split(self, phase, length_s, step_s=None, drop_partial=True):
+        """
+        將階段切成連續的固定長度時間窗，名稱為 "<phase>_w0"、"<phase>_w1" ...
+
+        Args:
+            length_s: 時間窗長度（秒）
+            step_s: 間隔（秒），預設等於 length_s（不重疊）
+            drop_partial: 捨棄結尾不足 length_s 的時間窗
+        """
+        if phase not in self.names:
+            return self._take([])
+        i = self.index(phase)
+        start, end = int(self.starts[i]), int(self.ends[i])
+        if end == self.OPEN_END:
+            raise ValueError(f"階段 {phase} 沒有結束時間，無法切分")
+        length = int(round(length_s * 1000))
+        step = int(round((step_s or length_s) * 1000))
+        starts = np.arange(start, end, step, dtype=np.int64)
+        ends = np.minimum(starts + length, end)
+        if drop_partial:
+            keep = ends - starts == length
+            starts, ends = starts[keep], ends[keep]
+        names = [f"{phase}_w{k}" for k in range(len(starts))]
+        return self._take([i] * len(starts), names=names, starts=starts, ends=ends)
+
+    def concat(self, *tables):
+        """串接多個階段表（例如多個子時間窗）"""
+        tables = (self,) + tables
+        return PhaseTable(
+            [n for t in tables for n in t.names],
+            [p for t in tables for p in t.phases],
+            np.concatenate([t.starts for t in tables]),
+            np.concatenate([t.ends for t in tables]),
+            [m for t in tables for m in t.music_ids],
+            [s for t in tables for s in t.sources],
+            [o for t in tables for o in t.offsets],
+            self.info,
+        )
+
+    def rows(self):
+        """轉為 dict 清單（時間以字串表示，方便輸出 CSV / JSON）"""
+        return [
+            {
+                "name": name,
+                "phase": phase,
+                "start": format_ms(start),
+                "end": format_ms(end) if end != self.OPEN_END else "",
+                "duration_s": (end - start) / 1000.0 if end != self.OPEN_END else None,
+                "music_id": music_id,
+                "source": source,
+                "bio_offset_ms": offset,
+            }
+            for name, phase, start, end, music_id, source, offset in zip(
+                self.names, self.phases, self.starts.tolist(), self.ends.tolist(),
+                self.music_ids, self.sources, self.offsets)
+        ]
+
+
+def read_event_log(path):
+    """
+    解析 event_log.csv
+
+    Returns:
+        List[dict]: {"phase", "start", "end", "music_id"}（毫秒；缺少 phase_end 時 end 為 None），依開始時間排序
+    """
+    phases = {}
+    order = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            phase = (row.get("phase") or "").strip()
+            event_type = (row.get("event_type") or "").strip()
+            if not phase or event_type not in ("phase_start", "phase_end"):
+                continue
+            try:
+                timestamp = to_ms(row["timestamp"])
+            except ValueError:
+                print(f"略過無法解析的事件時間: {row.get('timestamp')}")
+                continue
+            if event_type == "phase_start":
+                # 同一階段重複開始（例如重新開始實驗）時以最後一次為準
+                if phase not in phases:
+                    order.append(phase)
+                phases[phase] = {"phase": phase, "start": timestamp, "end": None,
+                                 "music_id": row.get("music_id") or ""}
+            elif phase in phases and phases[phase]["end"] is None:
+                phases[phase]["end"] = timestamp
+    entries = sorted((phases[phase] for phase in order), key=lambda entry: entry["start"])
+    # 缺少結束記錄的階段以下一個階段開始為結束
+    for current, following in zip(entries, entries[1:]):
+        if current["end"] is None:
+            current["end"] = following["start"]
+    return entries
+
+
+def read_bio_event_log(path):
+    """
+    解析 bio_event_log.csv（LABEL_CHANGE，unix 秒數），每個標籤持續到下一個標籤開始
+
+    Returns:
+        List[dict]: {"phase", "start", "end"}（毫秒，本機時區），依時間排序
+    """
+    changes = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[1].strip() != "LABEL_CHANGE":
+                continue
+            try:
+                changes.append((unix_to_ms(row[0]), row[2].strip()))
+            except ValueError:
+                print(f"略過無法解析的標籤時間: {row[0]}")
+    changes.sort()
+    entries = []
+    for k, (timestamp, label) in enumerate(changes):
+        end = changes[k + 1][0] if k + 1 < len(changes) else None
+        entries.append({"phase": label, "start": timestamp, "end": end})
+    return entries
+
+
+def _timezone_shift(event_entries, bio_entries):
+    """兩份記錄同名階段開始時間差的中位數，取最接近的 15 分鐘（時區差）"""
+    bio_starts = {entry["phase"]: entry["start"] for entry in bio_entries}
+    differences = [entry["start"] - bio_starts[entry["phase"]]
+                   for entry in event_entries if entry["phase"] in bio_starts]
+    if not differences:
+        return 0
+    return int(round(np.median(differences) / TIMEZONE_STEP_MS)) * TIMEZONE_STEP_MS
+
+
+def reconcile(event_entries, bio_entries, tolerance_ms=RECONCILE_TOLERANCE_MS):
+    """
+    合併兩份階段記錄
+
+    Returns:
+        PhaseTable；info 含 "timezone_shift_ms" 與 "max_offset_ms"
+    """
+    shift = _timezone_shift(event_entries, bio_entries)
+    bio = {}
+    for entry in bio_entries:
+        bio[entry["phase"]] = {**entry, "start": entry["start"] + shift,
+                               "end": entry["end"] + shift if entry["end"] is not None else None}
+
+    merged = []
+    for entry in event_entries:
+        offset = entry["start"] - bio[entry["phase"]]["start"] if entry["phase"] in bio else None
+        merged.append({**entry, "source": EVENT_LOG, "offset": offset})
+    known = {entry["phase"] for entry in event_entries}
+    for phase, entry in bio.items():
+        if phase not in known:
+            merged.append({**entry, "music_id": "", "source": BIO_EVENT_LOG, "offset": None})
+
+    merged = [entry for entry in merged if entry["phase"] not in END_MARKERS]
+    merged.sort(key=lambda entry: entry["start"])
+    offsets = [abs(entry["offset"]) for entry in merged if entry["offset"] is not None]
+    max_offset = max(offsets) if offsets else None
+    if max_offset is not None and max_offset > tolerance_ms:
+        print(f"[階段表] event_log 與 bio_event_log 的階段開始時間最多相差 {max_offset} ms")
+
+    return PhaseTable(
+        names=[entry["phase"] for entry in merged],
+        phases=[entry["phase"] for entry in merged],
+        starts=[entry["start"] for entry in merged],
+        ends=[entry["end"] if entry["end"] is not None else PhaseTable.OPEN_END for entry in merged],
+        music_ids=[entry.get("music_id", "") for entry in merged],
+        sources=[entry["source"] for entry in merged],
+        offsets=[entry["offset"] for entry in merged],
+        info={"timezone_shift_ms": shift, "max_offset_ms": max_offset},
+    )
+
+
+def load_phase_table(session_dir, tolerance_ms=RECONCILE_TOLERANCE_MS):
+    """
+    讀取場次目錄的 event_log.csv 與 bio_event_log.csv 並合併為階段表
+
+    Returns:
+        PhaseTable；兩份記錄都不存在時為空表
+    """
+    event_path = os.path.join(session_dir, EVENT_LOG)
+    bio_path = os.path.join(session_dir, BIO_EVENT_LOG)
+    event_entries = read_event_log(event_path) if os.path.exists(event_path) else []
+    bio_entries = read_bio_event_log(bio_path) if os.path.exists(bio_path) else []
+    return reconcile(event_entries, bio_entries, tolerance_ms)
+
+
+def epoch_bounds(times, table):
+    """
+    各時間窗在遞增時間陣列中的列範圍 [first, stop)
+
+    Returns:
+        (first 陣列, stop 陣列)
+    """
+    return np.searchsorted(times, table.starts, side="left"), np.searchsorted(times, table.ends, side="left")
+
+
+def epoch_signal(data, table):
+    """
+    將單一訊號依時間窗切分
+
+    Returns:
+        dict: 時間窗名稱 -> SignalData（原陣列的 view）
+    """
+    first, stop = epoch_bounds(data.times, table)
+    return {name: data.slice(i, j) for name, i, j in zip(table.names, first.tolist(), stop.tolist())}
+
+
+def epoch_session(signals, table):
+    """
+    將場次的所有訊號依時間窗切分
+
+    Args:
+        signals: 訊號名稱 -> SignalData（loader.load_session 的結果）
+        table: PhaseTable（load_phase_table 的結果，或其 window / split 子時間窗）
+
+    Returns:
+        dict: 時間窗名稱 -> {訊號名稱: SignalData}
+    """
+    epochs = {name: {} for name in table.names}
+    for signal, data in signals.items():
+        for name, part in epoch_signal(data, table).items():
+            epochs[name][signal] = part
+    return epochs
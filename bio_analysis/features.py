@@ -0,0 +1,130 @@
+# bio_analysis/features.py
+"""
+時間窗特徵
+對 epochs.epoch_session 切出的每個時間窗計算各訊號的摘要特徵，欄位名稱為 "<訊號>_<特徵>"：
+
+- 一般訊號：n、mean、std、min、max、slope（每秒變化量，最小平方法）
+- ppgbeat：beats、good_ratio，以及只用 good 心跳計算的 ibi_mean、sdnn、rmssd（毫秒）
+- ppi：另外計算 sdnn、rmssd（裝置回傳的心跳間期，毫秒）
+
+ppi 的所有特徵只使用生理範圍內的間期：裝置在偵測不到心跳時回傳 0.0，這些列不是間期。
+裝置約每秒回傳一次最近的間期，沒有新心跳時會重送同一個值；sdnn / rmssd 以合併連續重複值後的序列
+計算，近似逐拍序列。限制：兩拍間期剛好相同（裝置解析度 8 ms）時也會被合併，rmssd 可能略為高估。
+"""
+import numpy as np
+
+FEATURES_VERSION = 2  # 特徵計算方式改變時遞增（結果快取依此失效）
+SIGNAL_FEATURES = ("n", "mean", "std", "min", "max", "slope")
+HRV_FEATURES = ("sdnn", "rmssd")
+BEAT_FEATURES = ("beats", "good_ratio", "ibi_mean", "sdnn", "rmssd")
+GOOD_QUALITY = "good"
+PPI_RANGE_MS = (270.0, 2000.0)  # 與 bio_signal.signal_quality 的 PPI 限值一致（約 220 ~ 30 bpm）
+
+
+def _hrv(ibi):
+    """心跳間期序列的 SDNN 與 RMSSD"""
+    if len(ibi) < 2:
+        return np.nan, np.nan
+    return float(np.std(ibi, ddof=1)), float(np.sqrt(np.mean(np.diff(ibi) ** 2)))
+
+
+def valid_intervals(values):
+    """生理範圍內的間期（排除 NaN 與裝置的 0.0「無心跳」值）"""
+    with np.errstate(invalid="ignore"):
+        return (values >= PPI_RANGE_MS[0]) & (values <= PPI_RANGE_MS[1])
+
+
+def collapse_repeats(values):
+    """合併連續重複的值（裝置重送的同一個間期只算一次）"""
+    if len(values) == 0:
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def summary_features(times, values):
+    """一般訊號的摘要特徵（NaN 不計入）"""
+    keep = ~np.isnan(values)
+    times, values = times[keep], values[keep]
+    n = len(values)
+    if n == 0:
+        return {"n": 0, "mean": np.nan, "std": np.nan, "min": np.nan, "max": np.nan, "slope": np.nan}
+    slope = np.nan
+    if n >= 2:
+        seconds = (times - times[0]) / 1000.0
+        spread = seconds - seconds.mean()
+        denominator = np.dot(spread, spread)
+        if denominator > 0:
+            slope = float(np.dot(spread, values - values.mean()) / denominator)
+    return {
+        "n": n,
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if n >= 2 else np.nan,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "slope": slope,
+    }
+
+
+def beat_features(data):
+    """ppgbeat 時間窗的心跳特徵"""
+    beats = len(data)
+    ibi = data.columns["IBI"]
+    good = ~np.isnan(ibi)
+    if "Quality" in data.codes:
+        good &= data.codes["Quality"] == data.code_of("Quality", GOOD_QUALITY)
+    good_ibi = ibi[good]
+    sdnn, rmssd = _hrv(good_ibi)
+    return {
+        "beats": beats,
+        "good_ratio": float(good.sum() / beats) if beats else np.nan,
+        "ibi_mean": float(good_ibi.mean()) if len(good_ibi) else np.nan,
+        "sdnn": sdnn,
+        "rmssd": rmssd,
+    }
+
+
+def signal_features(signal, data):
+    """
+    單一訊號在單一時間窗的特徵
+
+    Returns:
+        dict: "<訊號>_<特徵>" -> 數值
+    """
+    if signal == "ppgbeat":
+        features = beat_features(data)
+    elif signal == "ppi":
+        keep = valid_intervals(data.values)
+        features = summary_features(data.times[keep], data.values[keep])
+        features["sdnn"], features["rmssd"] = _hrv(collapse_repeats(data.values[keep]))
+    else:
+        features = summary_features(data.times, data.values)
+    return {f"{signal}_{name}": value for name, value in features.items()}
+
+
+def feature_names(signal):
+    """訊號的特徵欄位名稱（固定順序，方便輸出一致的表頭）"""
+    if signal == "ppgbeat":
+        names = BEAT_FEATURES
+    elif signal == "ppi":
+        names = SIGNAL_FEATURES + HRV_FEATURES
+    else:
+        names = SIGNAL_FEATURES
+    return [f"{signal}_{name}" for name in names]
+
+
+def epoch_features(epochs):
+    """
+    所有時間窗的特徵
+
+    Args:
+        epochs: epochs.epoch_session 的結果（時間窗名稱 -> {訊號名稱: SignalData}）
+
+    Returns:
+        dict: 時間窗名稱 -> {特徵名稱: 數值}
+    """
+    return {
+        name: {key: value
+               for signal, data in signals.items()
+               for key, value in signal_features(signal, data).items()}
+        for name, signals in epochs.items()
+    }
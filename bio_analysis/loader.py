@@ -0,0 +1,272 @@
+# bio_analysis/loader.py
+"""
+整檔批次載入
+將場次的 bio_result_<訊號>.csv 解析為型別化的 NumPy 陣列：
+
+- Time：int64 毫秒（固定寬度向量化解析，不逐列 strptime）
+- 數值欄（Data / IBI）：float64，空值為 NaN
+- 文字欄（Condition / Current / Label / Quality）：int32 類別代碼 + 類別清單
+
+解析方式：以 NumPy 找出所有換行與逗號位置，各欄位依位元組範圍一次取出轉型。
+結果快取在場次目錄的 .bio_cache/ 下（每欄一個 .npy，另有 .meta.json），
+原始檔大小或修改時間改變時自動重新解析；之後載入只需讀取 .npy，速度取決於磁碟。
+"""
+import json
+import os
+
+import numpy as np
+
+from bio_signal.compressed_sink import iter_decompressed, codec_for_path
+from .query import signal_files
+from .timestamps import TIMESTAMP_LENGTH, parse_fixed_width
+
+CACHE_DIR = ".bio_cache"
+LOADER_VERSION = 1
+PARSE_CHUNK_LINES = 100000
+SIGNALS = ["gsr", "hr", "skt", "ppgraw", "ppi", "act", "imux", "imuy", "imuz", "ppgbeat"]
+
+
+class SignalData:
+    """單一訊號的型別化陣列"""
+
+    def __init__(self, signal, times, columns, codes, categories):
+        self.signal = signal
+        self.times = times            # int64 毫秒
+        self.columns = columns        # 數值欄名稱 -> float64 陣列
+        self.codes = codes            # 文字欄名稱 -> int32 類別代碼
+        self.categories = categories  # 文字欄名稱 -> 類別清單（代碼即索引）
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def values(self):
+        """第一個數值欄（一般訊號為 Data，ppgbeat 為 IBI）"""
+        return next(iter(self.columns.values()))
+
+    def labels(self, column="Current"):
+        """文字欄還原為字串陣列"""
+        return np.asarray(self.categories[column], dtype=str)[self.codes[column]]
+
+    def code_of(self, column, value):
+        """類別值對應的代碼，不存在時為 -1（可直接與 codes 比較做篩選）"""
+        categories = self.categories[column]
+        return categories.index(value) if value in categories else -1
+
+    def slice(self, start, stop):
+        """第 start ~ stop 列（陣列為原資料的 view，不複製）"""
+        return SignalData(
+            self.signal,
+            self.times[start:stop],
+            {name: values[start:stop] for name, values in self.columns.items()},
+            {name: values[start:stop] for name, values in self.codes.items()},
+            self.categories,
+        )
+
+
+def _read_bytes(path):
+    if codec_for_path(path) is not None:
+        return np.frombuffer(b"".join(iter_decompressed(path)), dtype=np.uint8)
+    return np.fromfile(path, dtype=np.uint8)
+
+
+def _gather(buffer, starts, ends):
+    """依 (起點, 終點) 位元組範圍取出各欄位，回傳定長位元組字串陣列"""
+    if len(starts) == 0:
+        return np.zeros(0, dtype="S1")
+    width = max(int((ends - starts).max()), 1)
+    positions = starts[:, None] + np.arange(width)
+    inside = positions < ends[:, None]
+    chars = np.where(inside, buffer[np.minimum(positions, len(buffer) - 1)], 0).astype(np.uint8)
+    return chars.view(f"S{width}").ravel()
+
+
+def parse_csv_bytes(buffer):
+    """
+    解析整個訊號檔的位元組內容
+
+    Returns:
+        (欄位名稱清單, Time 毫秒陣列, {欄位名稱: 位元組字串陣列})；格式不符的列（例如中斷時寫一半）略過
+    """
+    newlines = np.flatnonzero(buffer == ord("\n"))
+    if len(newlines) == 0:
+        return [], np.zeros(0, dtype=np.int64), {}
+    columns = bytes(buffer[:newlines[0]]).decode("utf-8").strip().split(",")
+    starts = newlines[:-1] + 1
+    ends = newlines[1:].copy()
+    ends[(ends > starts) & (buffer[np.maximum(ends - 1, 0)] == ord("\r"))] -= 1
+    commas = np.flatnonzero(buffer == ord(","))
+    first_comma = np.searchsorted(commas, starts)
+    valid = (np.searchsorted(commas, ends) - first_comma == len(columns) - 1) & (ends - starts >= TIMESTAMP_LENGTH)
+    starts, ends, first_comma = starts[valid], ends[valid], first_comma[valid]
+
+    times = []
+    fields = {name: [] for name in columns[1:]}
+    span = np.arange(TIMESTAMP_LENGTH)
+    for begin in range(0, len(starts), PARSE_CHUNK_LINES):
+        chunk = slice(begin, begin + PARSE_CHUNK_LINES)
+        line_starts, line_ends = starts[chunk], ends[chunk]
+        chunk_times, chunk_valid = parse_fixed_width(buffer[line_starts[:, None] + span])
+        positions = commas[first_comma[chunk][:, None] + np.arange(len(columns) - 1)]
+        field_starts = np.column_stack([line_starts, positions + 1])
+        field_ends = np.column_stack([positions, line_ends])
+        times.append(chunk_times[chunk_valid])
+        for j, name in enumerate(columns[1:], start=1):
+            fields[name].append(_gather(buffer, field_starts[chunk_valid, j], field_ends[chunk_valid, j]))
+    times = np.concatenate(times) if times else np.zeros(0, dtype=np.int64)
+    fields = {name: np.concatenate(parts) if parts else np.zeros(0, dtype="S1") for name, parts in fields.items()}
+    return columns, times, fields
+
+
+def _convert(fields):
+    """位元組欄位轉為數值欄（float64）或類別欄（代碼 + 類別）"""
+    numeric, codes, categories = {}, {}, {}
+    for name, raw in fields.items():
+        values = raw.copy()
+        values[values == b""] = b"nan"
+        try:
+            numeric[name] = values.astype(np.float64)
+            continue
+        except ValueError:
+            pass
+        # 標籤只在階段切換時改變，只對每段連續相同值的第一筆分類，再依段長展開
+        heads = np.flatnonzero(np.concatenate(([True], raw[1:] != raw[:-1])))
+        unique, head_codes = np.unique(raw[heads], return_inverse=True)
+        codes[name] = np.repeat(head_codes.astype(np.int32).ravel(), np.diff(np.append(heads, len(raw))))
+        categories[name] = [value.decode("utf-8") for value in unique]
+    return numeric, codes, categories
+
+
+def parse_signal_file(path, signal):
+    """解析單一訊號檔（不使用快取），依時間穩定排序"""
+    _, times, fields = parse_csv_bytes(_read_bytes(path))
+    numeric, codes, categories = _convert(fields)
+    if np.any(np.diff(times) < 0):
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        numeric = {name: values[order] for name, values in numeric.items()}
+        codes = {name: values[order] for name, values in codes.items()}
+    return SignalData(signal, times, numeric, codes, categories)
+
+
+def _cache_paths(path):
+    directory = os.path.join(os.path.dirname(path), CACHE_DIR)
+    return directory, os.path.join(directory, os.path.basename(path))
+
+
+def _load_cached(path):
+    directory, base = _cache_paths(path)
+    meta_path = base + ".meta.json"
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        stat = os.stat(path)
+        if (meta["version"] != LOADER_VERSION or meta["size"] != stat.st_size
+                or meta["mtime_ns"] != stat.st_mtime_ns):
+            return None
+        times = np.load(base + ".Time.npy")
+        numeric = {name: np.load(f"{base}.{name}.npy") for name in meta["numeric"]}
+        codes = {name: np.load(f"{base}.{name}.codes.npy") for name in meta["categories"]}
+        return SignalData(meta["signal"], times, numeric, codes, meta["categories"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_array(path, array):
+    temp_path = path + ".tmp.npy"
+    np.save(temp_path, array)
+    os.replace(temp_path, path)
+
+
+def _save_cached(path, data):
+    """寫入快取；.meta.json 最後寫入，存在即表示所有陣列已完整"""
+    directory, base = _cache_paths(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        stat = os.stat(path)
+        _save_array(base + ".Time.npy", data.times)
+        for name, values in data.columns.items():
+            _save_array(f"{base}.{name}.npy", values)
+        for name, values in data.codes.items():
+            _save_array(f"{base}.{name}.codes.npy", values)
+        meta = {
+            "version": LOADER_VERSION,
+            "signal": data.signal,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "rows": len(data),
+            "numeric": list(data.columns),
+            "categories": data.categories,
+        }
+        temp_path = base + ".meta.json.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, base + ".meta.json")
+    except OSError as e:
+        print(f"無法寫入快取 {directory}: {e}")
+
+
+def load_signal_file(path, signal, use_cache=True):
+    """載入單一訊號檔，優先使用快取"""
+    if use_cache:
+        data = _load_cached(path)
+        if data is not None:
+            return data
+    data = parse_signal_file(path, signal)
+    if use_cache:
+        _save_cached(path, data)
+    return data
+
+
+def _merge_categories(parts, column):
+    """合併多個分段的類別欄：建立共同類別清單並重新對應代碼"""
+    categories = sorted(set().union(*(part.categories[column] for part in parts)))
+    lookup = {value: code for code, value in enumerate(categories)}
+    codes = [np.array([lookup[value] for value in part.categories[column]], dtype=np.int32)[part.codes[column]]
+             for part in parts]
+    return np.concatenate(codes), categories
+
+
+def load_signal(session_dir, signal, use_cache=True):
+    """
+    載入場次中單一訊號（整場檔案或依階段分段的多個檔案）
+
+    Returns:
+        SignalData；找不到檔案時為 None
+    """
+    signal = signal.lower()
+    parts = [load_signal_file(path, signal, use_cache) for path in signal_files(session_dir, signal)]
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    times = np.concatenate([part.times for part in parts])
+    numeric = {name: np.concatenate([part.columns[name] for part in parts]) for name in parts[0].columns}
+    codes, categories = {}, {}
+    for name in parts[0].categories:
+        codes[name], categories[name] = _merge_categories(parts, name)
+    # 分段之間可能因延遲封包而時間重疊
+    if np.any(np.diff(times) < 0):
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        numeric = {name: values[order] for name, values in numeric.items()}
+        codes = {name: values[order] for name, values in codes.items()}
+    return SignalData(signal, times, numeric, codes, categories)
+
+
+def load_session(session_dir, signals=SIGNALS, use_cache=True):
+    """
+    載入場次的所有訊號
+
+    Returns:
+        dict: 訊號名稱 -> SignalData（不存在的訊號略過）
+    """
+    result = {}
+    for signal in signals:
+        data = load_signal(session_dir, signal, use_cache)
+        if data is not None:
+            result[signal.lower()] = data
+    return result
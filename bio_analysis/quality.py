@@ -0,0 +1,109 @@
+# bio_analysis/quality.py
+"""
+排除品質不佳的區段
+錄製時 bio_signal.signal_quality 將不良區段寫入場次目錄的 bio_quality_log.csv
+（signal, status, start, end, duration）。start / end 與訊號檔 Time 欄同一時間軸與格式；
+舊版紀錄為 unix 秒數（伺服器接收時間），讀取時一併轉為本地時間毫秒。
+
+預設只排除數值本身不可信的狀態（飽和、平線）；缺口、取樣率偏低、stale 時的樣本仍是有效量測。
+ppgbeat 由 PPGRAW 偵測而來，依 PPGRAW 的區段排除。
+
+    segments = read_quality_log(session_dir)
+    signals = exclude_bad_segments(load_session(session_dir), segments)
+"""
+import csv
+import os
+
+import numpy as np
+
+from .loader import SignalData
+from .timestamps import to_ms, unix_to_ms
+
+QUALITY_LOG = "bio_quality_log.csv"
+EXCLUDED_STATUSES = ("saturated", "flatline")
+# 衍生訊號依來源訊號的品質區段排除
+SOURCE_SIGNALS = {"ppgbeat": "ppgraw"}
+
+
+def _parse_time(text):
+    """訊號檔格式的時間字串，或舊版紀錄的 unix 秒數"""
+    text = text.strip()
+    try:
+        return unix_to_ms(float(text))
+    except ValueError:
+        return to_ms(text)
+
+
+def read_quality_log(session_dir, statuses=EXCLUDED_STATUSES):
+    """
+    讀取場次的品質區段紀錄
+
+    Args:
+        statuses: 要保留的狀態，None 表示全部
+
+    Returns:
+        dict: 訊號名稱（小寫）-> (起點毫秒陣列, 終點毫秒陣列)；沒有紀錄檔時為空 dict
+    """
+    path = os.path.join(session_dir, QUALITY_LOG)
+    if not os.path.exists(path):
+        return {}
+    segments = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            status = (row.get("status") or "").strip()
+            if statuses is not None and status not in statuses:
+                continue
+            try:
+                start, end = _parse_time(row["start"]), _parse_time(row["end"])
+            except (KeyError, TypeError, ValueError):
+                print(f"略過無法解析的品質區段: {row}")
+                continue
+            segments.setdefault((row.get("signal") or "").strip().lower(), []).append((start, end))
+    return {
+        signal: (np.array([start for start, _ in spans], dtype=np.int64),
+                 np.array([end for _, end in spans], dtype=np.int64))
+        for signal, spans in segments.items()
+    }
+
+
+def segment_mask(times, starts, ends):
+    """落在任一區段 [start, end] 內的列"""
+    if len(starts) == 0:
+        return np.zeros(len(times), dtype=bool)
+    # 區段可能重疊：差分累加後 > 0 即在區段內
+    events = np.zeros(len(times) + 1, dtype=np.int64)
+    np.add.at(events, np.searchsorted(times, starts, side="left"), 1)
+    np.add.at(events, np.searchsorted(times, ends, side="right"), -1)
+    return np.cumsum(events[:-1]) > 0
+
+
+def exclude_segments(data, starts, ends):
+    """移除落在區段內的列（times 須遞增，loader 載入時已排序）"""
+    keep = ~segment_mask(data.times, starts, ends)
+    if keep.all():
+        return data
+    return SignalData(
+        data.signal,
+        data.times[keep],
+        {name: values[keep] for name, values in data.columns.items()},
+        {name: values[keep] for name, values in data.codes.items()},
+        data.categories,
+    )
+
+
+def exclude_bad_segments(signals, segments):
+    """
+    各訊號移除品質不佳區段內的樣本
+
+    Args:
+        signals: 訊號名稱 -> SignalData（loader.load_session 的結果）
+        segments: read_quality_log 的結果
+
+    Returns:
+        dict: 訊號名稱 -> SignalData（沒有區段的訊號原樣保留）
+    """
+    result = {}
+    for signal, data in signals.items():
+        spans = segments.get(SOURCE_SIGNALS.get(signal, signal))
+        result[signal] = exclude_segments(data, *spans) if spans is not None else data
+    return result
@@ -0,0 +1,268 @@
+# bio_analysis/query.py
+"""
+時間範圍查詢
+只讀取需要的時間窗，不必整檔載入：
+
+    query(session_dir, "ppgraw", t0, t1, label="music1")
+
+- 以 mmap 開啟 CSV，第一次查詢時建立稀疏索引（每 INDEX_STRIDE 列記錄一次時間與位元組位置），
+  存成旁邊的 <檔名>.idx.npz，檔案大小或修改時間改變時自動重建
+- 已排序的檔案以二分搜尋定位時間窗的位元組範圍，只解析該範圍內的列
+- 未排序的檔案（未經 sort_pass）或壓縮檔（無法 mmap）退回整檔解析後篩選
+- 依階段分段輸出的場次依 bio_session_manifest.json 只讀取時間範圍重疊的分段
+"""
+import mmap
+import os
+
+import numpy as np
+
+from bio_signal.compressed_sink import iter_decompressed, codec_for_path, resolve_signal_path
+from bio_signal.segment_writer import find_segments
+from .timestamps import TIMESTAMP_LENGTH, parse_fixed_width, parse_timestamps, to_ms
+
+INDEX_STRIDE = 256
+INDEX_SUFFIX = ".idx.npz"
+INDEX_VERSION = 1
+PARSE_CHUNK_LINES = 100000  # 建索引時每次解析的列數（限制暫存陣列大小）
+LABEL_COLUMNS = ("Condition", "Current", "Label")
+FILE_PREFIX = "bio_result"
+
+_index_cache = {}  # 路徑 -> SparseIndex（同一行程內重複查詢不再讀取索引檔）
+
+
+class SparseIndex:
+    """單一訊號檔的稀疏時間索引"""
+
+    def __init__(self, columns, times, offsets, data_start, data_end, rows, is_sorted, size, mtime_ns):
+        self.columns = columns          # 標題列欄位
+        self.times = times              # 取樣列的時間（毫秒）
+        self.offsets = offsets          # 取樣列的起始位元組位置
+        self.data_start = data_start    # 第一筆資料列的位置
+        self.data_end = data_end        # 最後一個完整資料列的結尾（之後為中斷時寫一半的列）
+        self.rows = rows
+        self.sorted = is_sorted
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def matches(self, stat):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def byte_range(self, t0, t1):
+        """時間窗 [t0, t1) 所在的位元組範圍；未排序時為整個資料區"""
+        if not self.sorted or len(self.times) == 0:
+            return self.data_start, self.data_end
+        # 起點：最後一個時間 < t0 的取樣列（其後的列才可能 >= t0）
+        i = np.searchsorted(self.times, t0, side="left") - 1
+        start = self.offsets[i] if i >= 0 else self.data_start
+        # 終點：第一個時間 >= t1 的取樣列，其後不會再有時間窗內的資料
+        j = np.searchsorted(self.times, t1, side="left")
+        end = self.offsets[j] if j < len(self.offsets) else self.data_end
+        return int(start), int(end)
+
+
+def _line_times(buffer, starts, ends):
+    """以固定寬度解析各列開頭的時間戳，回傳 (毫秒, 是否有效)"""
+    times = np.zeros(len(starts), dtype=np.int64)
+    valid = np.zeros(len(starts), dtype=bool)
+    span = np.arange(TIMESTAMP_LENGTH)
+    for begin in range(0, len(starts), PARSE_CHUNK_LINES):
+        chunk = starts[begin:begin + PARSE_CHUNK_LINES]
+        long_enough = ends[begin:begin + PARSE_CHUNK_LINES] - chunk >= TIMESTAMP_LENGTH
+        positions = np.minimum(chunk[:, None] + span, len(buffer) - 1)
+        chunk_times, chunk_valid = parse_fixed_width(buffer[positions])
+        times[begin:begin + len(chunk)] = chunk_times
+        valid[begin:begin + len(chunk)] = chunk_valid & long_enough
+    return times, valid
+
+
+def build_index(path, stride=INDEX_STRIDE):
+    """掃描檔案建立稀疏索引（以 NumPy 找出所有換行位置並解析各列時間）"""
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        if stat.st_size == 0:
+            return SparseIndex([], np.zeros(0, np.int64), np.zeros(0, np.int64), 0, 0, 0, True,
+                               stat.st_size, stat.st_mtime_ns)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            buffer = np.frombuffer(mm, dtype=np.uint8)
+            newlines = np.flatnonzero(buffer == ord("\n"))
+            if len(newlines) == 0:
+                columns, data_start = [], 0
+            else:
+                data_start = int(newlines[0]) + 1
+                columns = bytes(mm[:newlines[0]]).decode("utf-8").strip().split(",")
+            starts = newlines[:-1] + 1
+            ends = newlines[1:]
+            times, valid = _line_times(buffer, starts, ends)
+            del buffer
+    data_end = int(newlines[-1]) + 1 if len(newlines) else 0
+    starts, times = starts[valid], times[valid]
+    return SparseIndex(
+        columns=columns,
+        times=times[::stride].copy(),
+        offsets=starts[::stride].copy(),
+        data_start=data_start,
+        data_end=data_end,
+        rows=len(times),
+        is_sorted=bool(np.all(np.diff(times) >= 0)),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+    )
+
+
+def _save_index(path, index):
+    try:
+        np.savez(
+            path + INDEX_SUFFIX,
+            times=index.times,
+            offsets=index.offsets,
+            columns=np.array(index.columns),
+            meta=np.array([INDEX_VERSION, index.data_start, index.data_end, index.rows,
+                           int(index.sorted), index.size, index.mtime_ns], dtype=np.int64),
+        )
+    except OSError as e:
+        print(f"無法寫入索引檔 {path + INDEX_SUFFIX}: {e}")
+
+
+def _read_index(path):
+    sidecar = path + INDEX_SUFFIX
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        with np.load(sidecar) as data:
+            version, data_start, data_end, rows, is_sorted, size, mtime_ns = data["meta"].tolist()
+            if version != INDEX_VERSION:
+                return None
+            return SparseIndex(data["columns"].tolist(), data["times"], data["offsets"],
+                               data_start, data_end, rows, bool(is_sorted), size, mtime_ns)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_index(path):
+    """取得檔案的稀疏索引：行程內快取 → 索引檔 → 重新建立"""
+    stat = os.stat(path)
+    index = _index_cache.get(path)
+    if index is None or not index.matches(stat):
+        index = _read_index(path)
+        if index is None or not index.matches(stat):
+            index = build_index(path)
+            _save_index(path, index)
+        _index_cache[path] = index
+    return index
+
+
+def _decode(values):
+    if not values:
+        return np.array([], dtype=str)
+    return np.char.decode(np.array(values, dtype="S"), "utf-8").astype(str)
+
+
+def _to_float(values):
+    """位元組字串轉浮點數，空字串（如缺少的 IBI）為 NaN；非數值欄（如 Quality）保留為字串"""
+    array = np.array(values, dtype="S")
+    array[array == b""] = b"nan"
+    try:
+        return array.astype(np.float64)
+    except ValueError:
+        return _decode(values)
+
+
+def parse_rows(data, columns):
+    """
+    解析一段 CSV 資料列（不含標題列）
+
+    Returns:
+        dict: 欄位名稱 -> 陣列；Time 為 int64 毫秒，標籤欄為字串，數值欄為浮點數
+    """
+    rows = [line.split(b",") for line in data.replace(b"\r", b"").split(b"\n")]
+    rows = [row for row in rows if len(row) == len(columns)]
+    result = {}
+    fields = list(zip(*rows)) if rows else [()] * len(columns)
+    for name, values in zip(columns, fields):
+        if name == "Time":
+            result[name] = parse_timestamps(np.array(values, dtype="S"))
+        elif name in LABEL_COLUMNS:
+            result[name] = _decode(values)
+        else:
+            result[name] = _to_float(values)
+    return result
+
+
+def read_window(path, t0, t1):
+    """讀取單一檔案中 [t0, t1) 毫秒範圍內的資料列"""
+    if codec_for_path(path) is not None:
+        # 壓縮檔無法 mmap，串流解壓後整檔篩選
+        data = b"".join(iter_decompressed(path))
+        header, _, body = data.partition(b"\n")
+        columns = header.decode("utf-8").strip().split(",")
+        body = body[:body.rfind(b"\n") + 1]
+    else:
+        index = load_index(path)
+        columns = index.columns
+        start, end = index.byte_range(t0, t1)
+        with open(path, "rb") as f:
+            if end <= start:
+                body = b""
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    body = mm[start:end]
+    result = parse_rows(body, columns)
+    if "Time" in result:
+        mask = (result["Time"] >= t0) & (result["Time"] < t1)
+        result = {name: values[mask] for name, values in result.items()}
+    return result
+
+
+def signal_files(session_dir, signal, t0=None, t1=None):
+    """
+    找出訊號的輸出檔：整場一個檔，或依階段分段的檔案（只取與時間範圍重疊者）
+
+    Returns:
+        List[str]: 檔案路徑
+    """
+    name = signal.lower()
+    path = resolve_signal_path(os.path.join(session_dir, f"{FILE_PREFIX}_{name}.csv"))
+    if path is not None:
+        return [path]
+    paths = []
+    for segment in find_segments(session_dir, name):
+        if t0 is not None and segment.get("last_time") and to_ms(segment["last_time"]) < t0:
+            continue
+        if t1 is not None and segment.get("first_time") and to_ms(segment["first_time"]) >= t1:
+            continue
+        if os.path.exists(segment["path"]):
+            paths.append(segment["path"])
+    return paths
+
+
+def query(session_dir, signal, t0, t1, label=None, label_column="Current"):
+    """
+    取出單一訊號在 [t0, t1) 時間窗內的資料
+
+    Args:
+        session_dir: 場次目錄
+        signal: 訊號名稱（"gsr"、"PPGRAW"、"ppgbeat" ...）
+        t0, t1: 時間字串、datetime 或毫秒
+        label: 只保留 label_column 等於此值的列（預設比對 Current，即實驗階段）
+        label_column: "Condition"、"Current" 或 "Label"
+
+    Returns:
+        dict: 欄位名稱 -> NumPy 陣列（Time 為 int64 毫秒）；找不到檔案時為空 dict
+    """
+    t0, t1 = to_ms(t0), to_ms(t1)
+    parts = [read_window(path, t0, t1) for path in signal_files(session_dir, signal, t0, t1)]
+    parts = [part for part in parts if part]
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        result = parts[0]
+    else:
+        result = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    # 未排序的檔案或分段之間因延遲封包而時間重疊時，穩定排序維持同時間戳的原順序
+    if np.any(np.diff(result["Time"]) < 0):
+        order = np.argsort(result["Time"], kind="stable")
+        result = {name: values[order] for name, values in result.items()}
+    if label is not None:
+        mask = result[label_column] == label
+        result = {name: values[mask] for name, values in result.items()}
+    return result
@@ -0,0 +1,195 @@
+# bio_analysis/resample.py
+"""
+多訊號重取樣
+各訊號取樣率不同且不規則（GSR 約 14Hz、SKT 約 7Hz、HR/PPI/ACT 約 1Hz、IMU 約 1.5Hz），
+重取樣到共同時間格點後才能並排分析：
+
+    frame = resample_session(load_session(session_dir), rate_hz=4)
+    frame.matrix[:, frame.column("gsr")]
+
+- 每個訊號依規則取值："linear"（線性內插）、"hold"（沿用前一筆，適合 HR 等階梯狀數值）、
+  "nearest"（最近一筆）
+- 前後樣本間隔超過 max_gap_ms 的格點視為缺值（值為 NaN，valid 為 False）
+- 以 searchsorted 找出每個格點的前後樣本後整批計算，不逐點迴圈
+- iter_resampled 依時間分段產生結果，長時間場次不必一次配置整個輸出矩陣
+"""
+import numpy as np
+
+DEFAULT_RULES = {
+    "gsr": ("linear", 2000),
+    "skt": ("linear", 2000),
+    "ppgraw": ("linear", 2000),
+    "imux": ("linear", 3000),
+    "imuy": ("linear", 3000),
+    "imuz": ("linear", 3000),
+    "hr": ("hold", 3000),
+    "ppi": ("hold", 3000),
+    "act": ("hold", 3000),
+    "ppgbeat": ("hold", 3000),
+}
+FALLBACK_RULE = ("linear", 2000)
+RULES = ("linear", "hold", "nearest")
+DEFAULT_CHUNK_SECONDS = 600
+
+
+class ResampledFrame:
+    """重取樣結果：共同時間格點上的數值矩陣與有效遮罩"""
+
+    def __init__(self, times, names, matrix, valid, codes=None, categories=None):
+        self.times = times            # int64 毫秒，長度 n
+        self.names = names            # 欄位名稱（訊號名稱），長度 k
+        self.matrix = matrix          # float64 (n, k)，缺值為 NaN
+        self.valid = valid            # bool (n, k)
+        self.codes = codes or {}      # 文字欄名稱 -> int32 類別代碼（沿用前一筆，無資料為 -1）
+        self.categories = categories or {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def column(self, name):
+        return self.names.index(name)
+
+    def labels(self, column="Current"):
+        """文字欄還原為字串陣列，無資料的格點為空字串"""
+        lookup = np.asarray(list(self.categories[column]) + [""], dtype=str)
+        return lookup[self.codes[column]]
+
+
+def make_grid(t0, t1, rate_hz):
+    """[t0, t1) 毫秒範圍內的等間隔格點（非整數毫秒間隔四捨五入，不累積誤差）"""
+    count = int(np.ceil((t1 - t0) * rate_hz / 1000.0))
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    return t0 + np.round(np.arange(count) * (1000.0 / rate_hz)).astype(np.int64)
+
+
+def _source(data, column=None):
+    """取出訊號的時間與數值，去除 NaN（例如 ppgbeat 的缺值 IBI）"""
+    values = data.columns[column] if column else data.values
+    keep = ~np.isnan(values)
+    if keep.all():
+        return data.times, values
+    return data.times[keep], values[keep]
+
+
+def resample_values(times, values, grid, rule="linear", max_gap_ms=2000):
+    """
+    將單一訊號（times 需遞增）重取樣到格點
+
+    Returns:
+        (float64 數值陣列, bool 有效遮罩)
+    """
+    if rule not in RULES:
+        raise ValueError(f"不支援的重取樣規則: {rule}")
+    result = np.full(len(grid), np.nan)
+    valid = np.zeros(len(grid), dtype=bool)
+    n = len(times)
+    if n == 0 or len(grid) == 0:
+        return result, valid
+    # right：第一個時間 > 格點的樣本；left：最後一個時間 <= 格點的樣本
+    right = np.searchsorted(times, grid, side="right")
+    left = right - 1
+    has_left = left >= 0
+    has_right = right < n
+    left_c = np.clip(left, 0, n - 1)
+    right_c = np.clip(right, 0, n - 1)
+    left_gap = grid - times[left_c]
+    right_gap = times[right_c] - grid
+
+    if rule == "hold":
+        valid = has_left & (left_gap <= max_gap_ms)
+        result[valid] = values[left_c[valid]]
+    elif rule == "nearest":
+        use_right = has_right & (~has_left | (right_gap < left_gap))
+        nearest = np.where(use_right, right_c, left_c)
+        gap = np.where(use_right, right_gap, left_gap)
+        valid = gap <= max_gap_ms
+        result[valid] = values[nearest[valid]]
+    else:
+        exact = has_left & (left_gap == 0)
+        between = has_left & has_right & ~exact & (times[right_c] - times[left_c] <= max_gap_ms)
+        result[exact] = values[left_c[exact]]
+        l, r = left_c[between], right_c[between]
+        weight = (grid[between] - times[l]) / (times[r] - times[l])
+        result[between] = values[l] + weight * (values[r] - values[l])
+        valid = exact | between
+    return result, valid
+
+
+def _hold_codes(times, codes, grid):
+    """類別代碼以沿用前一筆取值，第一筆資料之前為 -1"""
+    left = np.searchsorted(times, grid, side="right") - 1
+    return np.where(left >= 0, codes[np.clip(left, 0, None)], -1).astype(np.int32)
+
+
+def session_range(signals):
+    """所有訊號涵蓋的時間範圍 (t0, t1)；t1 為最後一筆之後 1 毫秒"""
+    firsts = [data.times[0] for data in signals.values() if len(data)]
+    lasts = [data.times[-1] for data in signals.values() if len(data)]
+    if not firsts:
+        return 0, 0
+    return int(min(firsts)), int(max(lasts)) + 1
+
+
+def resample_grid(signals, grid, rules=None, label_signal=None):
+    """
+    將多個訊號重取樣到指定格點
+
+    Args:
+        signals: 訊號名稱 -> SignalData（loader.load_session 的結果）
+        grid: int64 毫秒格點
+        rules: 訊號名稱 -> (規則, 最大間隔毫秒)，未指定者使用 DEFAULT_RULES
+        label_signal: 提供標籤欄（Condition / Current / Label）的訊號，預設為第一個有標籤的訊號
+
+    Returns:
+        ResampledFrame
+    """
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    names = list(signals)
+    matrix = np.full((len(grid), len(names)), np.nan)
+    valid = np.zeros((len(grid), len(names)), dtype=bool)
+    for k, name in enumerate(names):
+        rule, max_gap_ms = rules.get(name, FALLBACK_RULE)
+        times, values = _source(signals[name])
+        matrix[:, k], valid[:, k] = resample_values(times, values, grid, rule, max_gap_ms)
+
+    codes, categories = {}, {}
+    if label_signal is None:
+        label_signal = next((name for name in names if signals[name].codes), None)
+    if label_signal is not None:
+        data = signals[label_signal]
+        for column, column_codes in data.codes.items():
+            codes[column] = _hold_codes(data.times, column_codes, grid)
+            categories[column] = data.categories[column]
+    return ResampledFrame(grid, names, matrix, valid, codes, categories)
+
+
+def iter_resampled(signals, rate_hz, t0=None, t1=None, rules=None, label_signal=None,
+                   chunk_seconds=DEFAULT_CHUNK_SECONDS):
+    """
+    依時間分段重取樣，每段產生一個 ResampledFrame
+
+    分段邊界對齊整個時間範圍的格點，各段串接後與一次重取樣的結果相同。
+    """
+    start, end = session_range(signals)
+    t0 = start if t0 is None else int(t0)
+    t1 = end if t1 is None else int(t1)
+    points_per_chunk = max(int(chunk_seconds * rate_hz), 1)
+    total = int(np.ceil((t1 - t0) * rate_hz / 1000.0))
+    for first in range(0, max(total, 0), points_per_chunk):
+        index = np.arange(first, min(first + points_per_chunk, total))
+        grid = t0 + np.round(index * (1000.0 / rate_hz)).astype(np.int64)
+        yield resample_grid(signals, grid, rules, label_signal)
+
+
+def resample_session(signals, rate_hz, t0=None, t1=None, rules=None, label_signal=None):
+    """
+    將整個場次（或 [t0, t1) 毫秒範圍）重取樣為 rate_hz 的對齊矩陣
+
+    Returns:
+        ResampledFrame
+    """
+    start, end = session_range(signals)
+    t0 = start if t0 is None else int(t0)
+    t1 = end if t1 is None else int(t1)
+    return resample_grid(signals, make_grid(t0, t1, rate_hz), rules, label_signal)
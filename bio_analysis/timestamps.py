@@ -0,0 +1,109 @@
+# bio_analysis/timestamps.py
+"""
+時間戳轉換
+生理訊號檔與 event_log.csv 的時間皆為本地時間字串 "YYYY-mm-dd HH:MM:SS.fff"（固定 23 字元），
+分析時統一轉為 int64 毫秒（本地時間，不做時區換算，與檔案內字串一一對應）。
+
+固定寬度格式可直接以 NumPy 逐欄取出數字計算，不需逐列 strptime。
+"""
+import datetime
+
+import numpy as np
+
+TIMESTAMP_LENGTH = 23
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+_DIGIT_POSITIONS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 22]
+_SEPARATORS = {4: b"-", 7: b"-", 10: b" ", 13: b":", 16: b":", 19: b"."}
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _days_from_civil(year, month, day):
+    """西元日期轉 1970-01-01 起算的天數（向量化）"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def parse_fixed_width(chars):
+    """
+    解析 (n, 23) 的 uint8 陣列（每列為一個時間戳的位元組）
+
+    Returns:
+        (int64 毫秒陣列, 格式正確的布林遮罩)
+    """
+    chars = np.asarray(chars, dtype=np.uint8).reshape(-1, TIMESTAMP_LENGTH)
+    # uint8 相減會環繞，小於 "0" 的字元也會大於 9
+    digits = chars - np.uint8(ord("0"))
+    valid = np.all(digits[:, _DIGIT_POSITIONS] <= 9, axis=1)
+    for position, separator in _SEPARATORS.items():
+        valid &= chars[:, position] == ord(separator)
+
+    def number(start, end):
+        value = np.zeros(len(digits), dtype=np.int64)
+        for position in range(start, end):
+            value = value * 10 + digits[:, position]
+        return value
+
+    days = _days_from_civil(number(0, 4), number(5, 7), number(8, 10))
+    seconds = ((days * 24 + number(11, 13)) * 60 + number(14, 16)) * 60 + number(17, 19)
+    return seconds * 1000 + number(20, 23), valid
+
+
+def parse_timestamp(text):
+    """單一時間字串轉毫秒（接受不同位數的小數秒）"""
+    dt = datetime.datetime.strptime(text.strip(), TIMESTAMP_FORMAT)
+    return (dt - _EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def parse_timestamps(values):
+    """
+    時間字串陣列轉 int64 毫秒
+
+    固定寬度的列以向量化解析，其餘（例如小數位數不同）逐列以 strptime 解析。
+
+    Raises:
+        ValueError: 無法解析的時間字串
+    """
+    array = np.asarray(values)
+    if array.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    if array.dtype.kind == "U":
+        lengths = np.char.str_len(array)
+        array = np.char.encode(array, "ascii")
+    else:
+        lengths = np.char.str_len(array.astype("S"))
+    fixed = array.astype(f"S{TIMESTAMP_LENGTH}")
+    chars = np.frombuffer(fixed.tobytes(), dtype=np.uint8).reshape(-1, TIMESTAMP_LENGTH)
+    result, valid = parse_fixed_width(chars)
+    valid &= lengths.reshape(-1) == TIMESTAMP_LENGTH
+    for i in np.flatnonzero(~valid):
+        result[i] = parse_timestamp(array.reshape(-1)[i].decode("ascii"))
+    return result
+
+
+def to_ms(value):
+    """
+    將查詢用的時間轉為毫秒：時間字串、datetime，或已是毫秒的整數
+
+    unix 秒數（如 bio_event_log.csv）請改用 unix_to_ms。
+    """
+    if isinstance(value, str):
+        return parse_timestamp(value)
+    if isinstance(value, datetime.datetime):
+        return (value.replace(tzinfo=None) - _EPOCH) // datetime.timedelta(milliseconds=1)
+    return int(value)
+
+
+def unix_to_ms(seconds):
+    """unix 秒數轉為本地時間毫秒（與 datetime.fromtimestamp 寫出的字串一致）"""
+    return to_ms(datetime.datetime.fromtimestamp(float(seconds)))
+
+
+def format_ms(ms):
+    """毫秒轉回檔案使用的時間字串"""
+    dt = _EPOCH + datetime.timedelta(milliseconds=int(ms))
+    return dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt.microsecond // 1000:03d}"
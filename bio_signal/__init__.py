@@ -2,6 +2,13 @@
 """
 生理訊號收集模組
 """
-from .bio_signal_manager import BioSignalManager
 
 __all__ = ['BioSignalManager']
+
+
+def __getattr__(name):
+    # 延後載入：分析端只用到檔案讀取工具時，不需載入 PySide6 / matplotlib
+    if name == 'BioSignalManager':
+        from .bio_signal_manager import BioSignalManager
+        return BioSignalManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,47 +1,113 @@
 import socket
+import select
 import datetime
-from time import sleep
+import os
 import threading
 import json
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import matplotlib
 import numpy as np
-import time
 from PySide6.QtCore import QObject, Signal
 from collections import deque
 import queue
+import bisect
+
+try:
+    from .ppg_beat_detector import PPGBeatDetector
+except ImportError as e:  # scipy 未安裝時僅停用心跳偵測
+    print(f"PPG 心跳偵測不可用: {e}")
+    PPGBeatDetector = None
+from .signal_quality import SignalQualityMonitor, STATUS_OK
+from .ingest_metrics import IngestMetrics
+from .udp_ingest import UDPIngestServer
+from .sequence_tracker import SequenceTracker
+from .bounded_queue import BoundedSignalBuffer
+from .framing import LineFramer, parse_message
+from .wire_capture import WireCaptureWriter, WireCapturePlayer, read_capture
+from .wire_capture import KIND_SESSION, KIND_CONNECT, KIND_DATA, KIND_DISCONNECT
+from .clock import SystemClock, VirtualClock
+from .compressed_sink import CompressionWorker
+from .segment_writer import SessionManifest, SegmentedSignalWriter, MANIFEST_FILE
+from .sort_pass import sort_session_files
 
 connection_lock = threading.Lock()
+
+# 所有取時間與等待都經由此時鐘，測試時可用 set_clock 換成 VirtualClock
+clock = SystemClock()
 matplotlib.use('Agg')
 
+# 支援的信號類型
+SIGNAL_TYPES = ["GSR", "HR", "SKT", "PPGRAW", "PPI", "ACT", "IMUX", "IMUY", "IMUZ"]
+
 # 原有數據列表
-skt_data = []
-gsr_data = []
-hr_data = []
-ppi_data = []
-act_data = []
-imux_data = []
-imuy_data = []
-imuz_data = []
-ppgraw_data = []
+PLOT_HISTORY = 1000  # 每種訊號保留的最近數據點（供即時圖表，長時間場次不無限成長）
+skt_data = deque(maxlen=PLOT_HISTORY)
+gsr_data = deque(maxlen=PLOT_HISTORY)
+hr_data = deque(maxlen=PLOT_HISTORY)
+ppi_data = deque(maxlen=PLOT_HISTORY)
+act_data = deque(maxlen=PLOT_HISTORY)
+imux_data = deque(maxlen=PLOT_HISTORY)
+imuy_data = deque(maxlen=PLOT_HISTORY)
+imuz_data = deque(maxlen=PLOT_HISTORY)
+ppgraw_data = deque(maxlen=PLOT_HISTORY)
 
 # 修改：使用實際時間戳排序
 server_timestamp_start = None
 server_sequence_counter = 0
 timestamp_lock = threading.Lock()
 
-# 數據緩衝佇列用於排序
-data_buffer_queue = queue.PriorityQueue()
+# 數據緩衝排序與寫檔執行緒
 buffer_processing_thread = None
+writer_thread = None
 buffer_lock = threading.Lock()
 
 # 廣播發現機制相關變數
 broadcast_thread = None
 broadcast_flag = False
 broadcast_port = 9999  # 廣播專用端口
+ANNOUNCE_INTERVAL = 10  # 定期廣播間隔（秒），客戶端可送探測封包立即取得回覆
+local_ip_cache = None
+network_fingerprint = None
+discovery_probe_times = {}  # 客戶端IP -> 最近一次探測時間
+discovery_lock = threading.Lock()
+server_start_time = None
 tcp_port = 8000  # TCP服務端口
 
+# UDP 資料接收（高頻訊號可選用，客戶端自行選擇 TCP 或 UDP）
+udp_ingest_enabled = False
+udp_ingest_port = 10000
+udp_ingest_server = None
+
+# TCP 原始資料擷取（可選）：逐次 recv 附加寫入場次目錄，供事後重播
+wire_capture_enabled = False
+wire_capture = None
+read_thread = None
+
+# 壓縮輸出（可選，None 表示寫純文字 CSV）
+output_compression = None   # "gzip" / "zstd"
+compression_level = None    # None 使用各格式預設等級
+compression_worker = None
+compression_stats = None    # 最近一次關檔時的壓縮統計
+
+# 依實驗階段分段輸出（可選，Current 標籤改變時換檔）
+segment_output = False
+segment_manifest = None
+
+# 關檔後檢查各訊號檔是否依時間排序，亂序時以外部合併排序重寫
+sort_on_close = True
+
+# 接收延遲與遺失統計
+ingest_metrics = IngestMetrics()
+
+# 客戶端序號（可選）：重連續傳與去重，跨連線保留
+sequence_tracker = SequenceTracker()
+
+# 接收 → 排序 → 寫檔 之間的有界階段（逐訊號溢位策略見 bounded_queue.py）
+signal_buffer = BoundedSignalBuffer(metrics=ingest_metrics)
+WRITE_QUEUE_BATCHES = 100  # 排序後等待寫檔的批次上限（每批約 300ms）
+write_queue = queue.Queue(maxsize=WRITE_QUEUE_BATCHES)
+
 # 原有全局變量
 plot_window_open = False
 fig, axs = None, None
@@ -63,6 +129,11 @@ fimux = None
 fimuy = None
 fimuz = None
 fppgraw = None 
+fppgbeat = None  # 伺服器端 PPG 心跳偵測輸出
+
+# PPGRAW 心跳偵測
+ppg_beat_detection = True
+ppg_beat_detector = None
 
 startFlag = True
 startWriteFlag = False
@@ -71,6 +142,11 @@ gsr_status = False
 hr_status = False
 SKT_status = False
 
+# 逐訊號品質監控
+signal_quality_monitor = None
+session_file_prefix = None  # setFileName 設定的輸出檔名前綴
+_client_time_cache = {}     # 同一批次共用時間戳，快取最近一次解析結果
+
 latest_gsr = None
 latest_hr = None
 latest_skt = None
@@ -85,6 +161,15 @@ last_output_time = 0
 client_connection = None
 last_data_time = 0
 SIGNAL_TIMEOUT = 5
+
+# 失效連線偵測
+KEEPALIVE_IDLE = 1            # 閒置多久開始送 TCP keepalive（秒）
+KEEPALIVE_INTERVAL = 1        # keepalive 間隔（秒）
+KEEPALIVE_COUNT = 3           # 連續幾次未回應即斷線
+TCP_USER_TIMEOUT_MS = 3000    # 送出的資料多久未被確認即斷線（Linux）
+HEARTBEAT_INTERVAL = 0.5      # 應用層心跳間隔（秒），僅對送過 hello 的客戶端
+HEARTBEAT_TIMEOUT = 1.5       # 心跳客戶端多久沒有任何資料即視為失效
+DEAD_PEER_TIMEOUT = 10        # 不支援心跳的客戶端多久沒有任何資料即視為失效
 is_client_connected = False
 data_lock = threading.Lock()
 plot_flag = False
@@ -95,10 +180,24 @@ class BioSignals(QObject):
 
 bio_signals = BioSignals()
 
-def get_local_ip():
-    """取得本機在當前網路中的IP地址"""
+def _network_fingerprint():
+    """網路介面與路由表的簡易指紋，用於判斷網路是否變更"""
+    parts = []
+    try:
+        parts.append(repr(socket.if_nameindex()))
+    except (OSError, AttributeError):
+        pass
+    try:
+        # Linux：切換 Wi-Fi 或 DHCP 重新配置時預設路由會改變
+        with open("/proc/net/route", "r") as f:
+            parts.append(f.read())
+    except OSError:
+        pass
+    return "|".join(parts)
+
+def _lookup_local_ip():
+    """建立一個暫時的socket連線來判斷本機IP"""
     try:
-        # 建立一個暫時的socket連線來判斷本機IP
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
         local_ip = s.getsockname()[0]
@@ -108,6 +207,20 @@ def get_local_ip():
         print(f"無法取得本機IP: {e}")
         return "127.0.0.1"
 
+def get_local_ip():
+    """取得本機在當前網路中的IP地址（快取，網路變更時才重新查詢）"""
+    global local_ip_cache, network_fingerprint
+    fingerprint = _network_fingerprint()
+    if local_ip_cache is None or fingerprint != network_fingerprint:
+        local_ip_cache = _lookup_local_ip()
+        network_fingerprint = fingerprint
+    return local_ip_cache
+
+def invalidate_local_ip():
+    """清除本機IP快取（發送失敗時呼叫）"""
+    global local_ip_cache
+    local_ip_cache = None
+
 def start_broadcast_service():
     """啟動UDP廣播服務"""
     global broadcast_thread, broadcast_flag
@@ -125,30 +238,87 @@ def stop_broadcast_service():
     """停止UDP廣播服務"""
     global broadcast_flag
     broadcast_flag = False
+    # 等待舊線程結束，否則下一個場次的 start_broadcast_service 會誤判為仍在運行
+    if broadcast_thread is not None and broadcast_thread is not threading.current_thread():
+        broadcast_thread.join(timeout=2.0)
     print("廣播服務已停止")
 
+def build_announce_message():
+    """伺服器資訊（廣播與探測回覆共用）"""
+    local_ip = get_local_ip()
+    broadcast_data = {
+        "service": "bio_signal_server",
+        "ip": local_ip,
+        "tcp_port": tcp_port,
+        "udp_port": udp_ingest_port if udp_ingest_enabled else None,
+        "timestamp": clock.time(),
+        "status": "online"
+    }
+    return local_ip, json.dumps(broadcast_data).encode('utf-8')
+
+def handle_discovery_probe(sock, data, addr):
+    """回覆客戶端的探測封包 {"type": "discover"}"""
+    try:
+        probe = json.loads(data.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return
+    # 略過自己送出的廣播
+    if not isinstance(probe, dict) or probe.get("type") != "discover":
+        return
+    _, message = build_announce_message()
+    sock.sendto(message, addr)
+    with discovery_lock:
+        discovery_probe_times[addr[0]] = clock.time()
+    ingest_metrics.increment("discovery", "probes_answered")
+    print(f"回覆探測封包: {addr[0]}:{addr[1]}")
+
+def record_pairing_time(client_ip, accept_time):
+    """記錄從探測到 TCP 連線建立的耗時"""
+    with discovery_lock:
+        probe_time = discovery_probe_times.pop(client_ip, None)
+    if probe_time is not None:
+        elapsed = accept_time - probe_time
+        ingest_metrics.record_latency("pairing", elapsed)
+        print(f"配對耗時（探測 → 連線）: {elapsed * 1000:.0f} ms")
+    elif server_start_time is not None:
+        # 客戶端未送探測（使用廣播或固定IP），記錄自伺服器啟動的時間
+        ingest_metrics.record_latency("connect_since_start", accept_time - server_start_time)
+
 def broadcast_worker():
-    """廣播工作線程"""
+    """廣播工作線程：即時回覆探測封包，並以低頻率定期廣播作為備援"""
     global broadcast_flag, tcp_port, is_client_connected
     
     # 建立UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        sock.bind(("", broadcast_port))
+        print(f"探測回應服務監聽於 UDP {broadcast_port}")
+    except OSError as e:
+        print(f"無法綁定探測端口 {broadcast_port}，僅使用定期廣播: {e}")
+    sock.settimeout(0.1)  # 方便快速停止
     
+    last_announce_time = 0
     try:
         while broadcast_flag and startFlag:
+            try:
+                data, addr = sock.recvfrom(2048)
+                handle_discovery_probe(sock, data, addr)
+            except socket.timeout:
+                pass
+            except OSError as e:
+                print(f"探測接收錯誤: {e}")
+                clock.sleep(0.1)
+            
+            if clock.time() - last_announce_time < ANNOUNCE_INTERVAL:
+                continue
+            last_announce_time = clock.time()
             try:
                 # 準備廣播數據
-                local_ip = get_local_ip()
-                broadcast_data = {
-                    "service": "bio_signal_server",
-                    "ip": local_ip,
-                    "tcp_port": tcp_port,
-                    "timestamp": time.time(),
-                    "status": "online"
-                }
-                
-                message = json.dumps(broadcast_data).encode('utf-8')
+                local_ip, message = build_announce_message()
                 
                 # 發送廣播到255.255.255.255
                 sock.sendto(message, ('255.255.255.255', broadcast_port))
@@ -165,12 +335,7 @@ def broadcast_worker():
                 
             except Exception as e:
                 print(f"廣播發送錯誤: {e}")
-            
-            # 每3秒廣播一次
-            for _ in range(30):  # 分成30個0.1秒，方便快速停止
-                if not broadcast_flag or not startFlag:
-                    break
-                sleep(0.1)
+                invalidate_local_ip()
                 
     except Exception as e:
         print(f"廣播服務錯誤: {e}")
@@ -180,18 +345,21 @@ def broadcast_worker():
 
 def generate_server_timestamp():
     """伺服器端生成實際接收時間戳"""
-    current_time = time.time()
+    current_time = clock.time()
     dt = datetime.datetime.fromtimestamp(current_time)
     return dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt.microsecond // 1000:03d}"
 
 class DataPoint:
     """使用客戶端時間戳排序"""
-    def __init__(self, signal_type, value, original_timestamp, server_timestamp, sequence):
+    def __init__(self, signal_type, value, original_timestamp, server_timestamp, sequence, labels=None):
         self.signal_type = signal_type
         self.value = value
         self.original_timestamp = original_timestamp
         self.server_timestamp = server_timestamp
         self.sequence = sequence
+        self.receive_time = clock.time()  # 用於統計寫檔延遲
+        # 接收當下的 (Condition, Current, Label)；寫檔可能因積壓延後，標籤不可跟著延後
+        self.labels = labels
         
         # 將客戶端時間戳轉換為可排序的浮點數
         self.client_time_float = self._parse_timestamp(original_timestamp)
@@ -205,57 +373,151 @@ class DataPoint:
                 return dt.timestamp()
             else:
                 # 如果沒有客戶端時間戳，使用當前時間
-                return time.time()
+                return clock.time()
         except (ValueError, TypeError):
             # 解析失敗則使用當前時間
             print(f"時間戳解析失敗: {timestamp_str}，使用當前時間")
-            return time.time()
+            return clock.time()
     
     def __lt__(self, other):
         # 使用客戶端時間戳排序
         return self.client_time_float < other.client_time_float
 
+def enqueue_write_batch(batch):
+    """
+    將排序後的一批數據交給寫檔執行緒；佇列滿時阻塞（接收緩衝隨之填滿，依策略背壓或捨棄）
+
+    Returns:
+        bool: 是否已放入
+    """
+    stalled = False
+    while True:
+        try:
+            write_queue.put(batch, timeout=0.2)
+            return True
+        except queue.Full:
+            if not stalled:
+                ingest_metrics.increment("queue", "write_stalls")
+                stalled = True
+            if not startFlag:
+                # 已停止且寫檔仍卡住：放棄此批並記錄
+                ingest_metrics.increment("queue", "dropped_on_shutdown", len(batch[0]))
+                return False
+
+REORDER_WINDOW_SECONDS = 0.3  # 300ms間隔給予足夠時間讓延遲封包到達
+
+def take_sorted_batch():
+    """排序階段的單一步驟：取出接收緩衝中所有數據並依客戶端時間戳排序"""
+    # 取出前記錄各裝置已入佇列的序號，寫入後即為已落地
+    queued_snapshot = sequence_tracker.snapshot_queued()
+    temp_buffer, dropped = signal_buffer.drain()
+    temp_buffer.sort(key=lambda x: x.client_time_float)
+    return temp_buffer, dropped, queued_snapshot
+
+def write_batch(batch):
+    """寫檔階段的單一步驟：寫入一批已排序數據並進行 PPG 心跳偵測"""
+    temp_buffer, dropped, queued_snapshot = batch
+    for data_point in temp_buffer:
+        process_sorted_data(data_point)
+    if temp_buffer:
+        write_time = clock.time()
+        ingest_metrics.record_latencies("write", [write_time - p.receive_time for p in temp_buffer])
+    
+    # 以同一批已排序數據進行 PPG 心跳偵測；PPGRAW 被捨棄過即視為缺口
+    if ppg_beat_detector is not None:
+        if dropped.get("PPGRAW"):
+            ppg_beat_detector.mark_gap()
+        if temp_buffer:
+            process_ppg_beats(temp_buffer)
+    
+    sequence_tracker.mark_durable(queued_snapshot)
+
 def start_buffer_processing():
-    """啟動緩衝處理線程"""
-    global buffer_processing_thread
+    """啟動緩衝排序線程與寫檔線程"""
+    global buffer_processing_thread, writer_thread
     
     def process_buffer():
-        last_process_time = time.time()
+        last_process_time = clock.time()
         
         while startFlag:
             try:
                 # 使用較短間隔處理緩衝，確保延遲封包能正確排序
-                current_time = time.time()
-                if current_time - last_process_time >= 0.3:  # 300ms間隔給予足夠時間讓延遲封包到達
-                    
-                    # 從優先佇列中取出數據點
-                    temp_buffer = []
-                    while not data_buffer_queue.empty():
-                        try:
-                            data_point = data_buffer_queue.get_nowait()
-                            temp_buffer.append(data_point)
-                        except queue.Empty:
-                            break
-                    
-                    # 按客戶端時間戳排序並處理
-                    temp_buffer.sort(key=lambda x: x.client_time_float)
-                    
-                    for data_point in temp_buffer:
-                        process_sorted_data(data_point)
+                current_time = clock.time()
+                if current_time - last_process_time >= REORDER_WINDOW_SECONDS:
+                    enqueue_write_batch(take_sorted_batch())
                     
+                    # 無新數據時也需更新 stale / 平線狀態
+                    if signal_quality_monitor is not None:
+                        signal_quality_monitor.check(current_time)
                     
                     last_process_time = current_time
                 
-                sleep(0.05)  # 減少CPU使用率
+                clock.sleep(0.05)  # 減少CPU使用率
                 
             except Exception as e:
                 print(f"緩衝處理錯誤: {e}")
-                sleep(1)
+                clock.sleep(1)
+        
+        # 停止時送出剩餘數據，並通知寫檔線程結束
+        enqueue_write_batch(take_sorted_batch())
+        try:
+            write_queue.put(None, timeout=2.0)
+        except queue.Full:
+            print("寫檔佇列已滿，寫檔線程未收到結束通知")
+    
+    def write_worker():
+        while True:
+            batch = write_queue.get()
+            if batch is None:
+                break
+            try:
+                write_batch(batch)
+            except Exception as e:
+                print(f"寫檔錯誤: {e}")
+    
+    signal_buffer.reopen()
+    # 上一次場次殘留的批次不再寫入
+    while True:
+        try:
+            write_queue.get_nowait()
+        except queue.Empty:
+            break
     
+    writer_thread = threading.Thread(target=write_worker, daemon=True)
+    writer_thread.start()
     buffer_processing_thread = threading.Thread(target=process_buffer, daemon=True)
     buffer_processing_thread.start()
     print("緩衝處理線程已啟動")
 
+def stop_buffer_processing(timeout=5.0):
+    """等待排序與寫檔線程寫完剩餘數據（需先將 startFlag 設為 False）"""
+    signal_buffer.close()
+    if buffer_processing_thread is not None:
+        buffer_processing_thread.join(timeout=timeout)
+    if writer_thread is not None:
+        writer_thread.join(timeout=timeout)
+        if writer_thread.is_alive():
+            print("寫檔線程未在時限內結束")
+
+def setQueuePolicy(signal_type, policy, capacity=None):
+    """
+    設定單一訊號的接收緩衝策略
+
+    Args:
+        signal_type: 訊號類型，例如 "PPGRAW"
+        policy: "drop_oldest" / "drop_newest" / "block"
+        capacity: 緩衝容量（樣本數），None 則維持原設定
+    """
+    signal_buffer.set_policy(signal_type, policy, capacity)
+
+def get_queue_stats():
+    """取得各訊號接收緩衝使用量與寫檔佇列積壓批次數"""
+    return {
+        "signals": signal_buffer.get_stats(),
+        "write_queue": write_queue.qsize(),
+        "write_queue_capacity": WRITE_QUEUE_BATCHES,
+    }
+
 def process_sorted_data(data_point):
     """處理已排序的數據點 - 使用客戶端原始時間戳"""
     global skt_data, gsr_data, hr_data, ppi_data, act_data
@@ -267,67 +529,174 @@ def process_sorted_data(data_point):
     value = data_point.value
     # 使用客戶端原始時間戳寫入檔案，保持生理訊號的真實時序
     timestamp = data_point.original_timestamp if data_point.original_timestamp else data_point.server_timestamp
+    if data_point.labels is not None:
+        status, current, label = data_point.labels
+    else:
+        status, current, label = now_status, current_status, now_label
     
     with data_lock:
+        # 分段輸出：依數據接收當下的 Current 標籤選擇分段檔
+        if segment_manifest is not None:
+            output = _signal_output(signal_type)
+            if output is not None:
+                output.select(current, timestamp)
+        
         # 根據信號類型儲存數據
         if signal_type == "GSR":
             gsr_data.append(value)
             if fgsr:
-                fgsr.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fgsr.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fgsr.flush()
                 
         elif signal_type == "HR":
             hr_data.append(value)
             if fhr:
-                fhr.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fhr.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fhr.flush()
                 
         elif signal_type == "SKT":
             skt_data.append(value)
             if fskt:
                 formatted_value = round(value, 1)
-                fskt.write(f"{timestamp},{formatted_value},{now_status},{current_status},{now_label}\n")
+                fskt.write(f"{timestamp},{formatted_value},{status},{current},{label}\n")
                 fskt.flush()
                 
         elif signal_type == "PPGRAW":
             ppgraw_data.append(value)
             if fppgraw:
-                fppgraw.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fppgraw.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fppgraw.flush()
                 
         elif signal_type == "PPI":
             ppi_data.append(value)
             if fppi:
-                fppi.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fppi.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fppi.flush()
                 
         elif signal_type == "ACT":
             act_data.append(value)
             if fact:
-                fact.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fact.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fact.flush()
                 
         elif signal_type == "IMUX":
             imux_data.append(value)
             if fimux:
-                fimux.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fimux.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fimux.flush()
                 
         elif signal_type == "IMUY":
             imuy_data.append(value)
             if fimuy:
-                fimuy.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fimuy.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fimuy.flush()
                 
         elif signal_type == "IMUZ":
             imuz_data.append(value)
             if fimuz:
-                fimuz.write(f"{timestamp},{value},{now_status},{current_status},{now_label}\n")
+                fimuz.write(f"{timestamp},{value},{status},{current},{label}\n")
                 fimuz.flush()
 
+def process_ppg_beats(sorted_points):
+    """從一批已排序數據取出 PPGRAW 進行心跳偵測，並寫入 IBI 檔案"""
+    ppg_points = [p for p in sorted_points if p.signal_type == "PPGRAW"]
+    if not ppg_points:
+        return
+
+    try:
+        beats = ppg_beat_detector.process(
+            [p.value for p in ppg_points],
+            [p.client_time_float for p in ppg_points]
+        )
+    except Exception as e:
+        print(f"PPG 心跳偵測錯誤: {e}")
+        ppg_beat_detector.mark_gap()
+        return
+
+    if not beats:
+        return
+
+    # 每個心跳沿用其時間點前最後一個 PPGRAW 樣本接收時的標籤
+    point_times = [p.client_time_float for p in ppg_points]
+    with data_lock:
+        if fppgbeat:
+            for beat in beats:
+                dt = datetime.datetime.fromtimestamp(beat.beat_time)
+                timestamp = dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt.microsecond // 1000:03d}"
+                ibi = "" if beat.ibi_ms is None else beat.ibi_ms
+                point = ppg_points[max(bisect.bisect_right(point_times, beat.beat_time) - 1, 0)]
+                status, current, label = point.labels or (now_status, current_status, now_label)
+                if segment_manifest is not None:
+                    fppgbeat.select(current, timestamp)
+                fppgbeat.write(f"{timestamp},{ibi},{beat.quality},{status},{current},{label}\n")
+            fppgbeat.flush()
+
+def setPPGBeatDetection(enabled):
+    """開啟/關閉伺服器端 PPG 心跳偵測（需在 startSerial 前設定）"""
+    global ppg_beat_detection
+    ppg_beat_detection = enabled
+
+def get_ppg_beat_stats():
+    """取得 PPG 心跳偵測統計"""
+    if ppg_beat_detector is None:
+        return None
+    return ppg_beat_detector.get_stats()
+
+def _parse_client_time(signal_type, timestamp_str):
+    """解析客戶端時間戳，失敗回傳 None（同訊號連續相同字串直接使用快取）"""
+    if not timestamp_str:
+        return None
+    cached = _client_time_cache.get(signal_type)
+    if cached and cached[0] == timestamp_str:
+        return cached[1]
+    try:
+        value = datetime.datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    except (ValueError, TypeError):
+        return None
+    _client_time_cache[signal_type] = (timestamp_str, value)
+    return value
+
+def update_signal_quality(parsed_data):
+    """以收到的訊息更新各訊號品質狀態（不論是否正在寫檔）"""
+    if signal_quality_monitor is None:
+        return
+    receive_time = clock.time()
+    for signal_type in SIGNAL_TYPES:
+        if signal_type in parsed_data:
+            try:
+                value = float(parsed_data[signal_type])
+            except (ValueError, TypeError):
+                continue
+            client_time = _parse_client_time(signal_type, parsed_data.get(f"{signal_type}_Timestamp", ""))
+            signal_quality_monitor.update(signal_type, value, client_time, receive_time)
+
+def get_signal_quality():
+    """取得逐訊號品質狀態，例如 {"GSR": {"status": "ok", "rate": 14.1, ...}, ...}"""
+    if signal_quality_monitor is None:
+        return {}
+    return signal_quality_monitor.get_status(clock.time())
+
+def wait_for_signal_quality(signal_types=("GSR", "HR", "SKT"), timeout=30.0, poll_interval=0.2):
+    """阻塞直到指定訊號皆為 ok 或逾時，供設備配戴階段使用"""
+    deadline = clock.time() + timeout
+    while startFlag and clock.time() < deadline:
+        if signal_quality_monitor is not None and signal_quality_monitor.is_ready(signal_types, clock.time()):
+            return True
+        clock.sleep(poll_interval)
+    return False
+
+def _refresh_bio_status():
+    """依品質監控結果更新 gsr_status / hr_status / SKT_status"""
+    global gsr_status, hr_status, SKT_status
+    status = get_signal_quality()
+    gsr_status = status.get("GSR", {}).get("status") == STATUS_OK
+    hr_status = status.get("HR", {}).get("status") == STATUS_OK
+    SKT_status = status.get("SKT", {}).get("status") == STATUS_OK
+
 # 其餘函數保持不變...
 def getBioStatus():
     global SKT_status, gsr_status, hr_status
+    _refresh_bio_status()
     if not gsr_status:
         return {"statusCode": 100, "message": "gsrError"}
     if not SKT_status:
@@ -348,119 +717,284 @@ def setCurrent(current):
     global current_status
     current_status = current
 
+def _open_output(path):
+    """開啟單一訊號輸出檔（有設定壓縮時寫入 .gz / .zst）"""
+    if compression_worker is not None:
+        return compression_worker.open(path)
+    return open(path, "a")
+
+CSV_HEADER = "Time,Data,Condition,Current,Label\n"
+PPGBEAT_CSV_HEADER = "Time,IBI,Quality,Condition,Current,Label\n"
+
+def _open_signal_output(fileName, name, header):
+    """開啟單一訊號的輸出（整個場次一個檔，或依階段分段）"""
+    if segment_manifest is not None:
+        return SegmentedSignalWriter(os.path.basename(fileName), name, header, _open_output, segment_manifest)
+    f = _open_output(f"{fileName}_{name}.csv")
+    f.write(header)
+    return f
+
+def _signal_output(signal_type):
+    """訊號類型對應的輸出檔"""
+    return {
+        "GSR": fgsr, "HR": fhr, "SKT": fskt, "PPI": fppi, "ACT": fact,
+        "IMUX": fimux, "IMUY": fimuy, "IMUZ": fimuz, "PPGRAW": fppgraw,
+    }.get(signal_type)
+
 def setFileName(fileName):
-    global fgsr, fhr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw
+    global fgsr, fhr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw, fppgbeat
+    global session_file_prefix, compression_worker, segment_manifest
     
-    fgsr = open(fileName + "_gsr.csv", "a")
-    fgsr.write("Time,Data,Condition,Current,Label\n")
-    fhr = open(fileName + "_hr.csv", "a")
-    fhr.write("Time,Data,Condition,Current,Label\n")
-    fskt = open(fileName + "_skt.csv", "a")
-    fskt.write("Time,Data,Condition,Current,Label\n")
-    fppi = open(fileName + "_ppi.csv", "a")
-    fppi.write("Time,Data,Condition,Current,Label\n")
-    fact = open(fileName + "_act.csv", "a")
-    fact.write("Time,Data,Condition,Current,Label\n")
-    fimux = open(fileName + "_imux.csv", "a")
-    fimux.write("Time,Data,Condition,Current,Label\n")
-    fimuy = open(fileName + "_imuy.csv", "a")
-    fimuy.write("Time,Data,Condition,Current,Label\n")
-    fimuz = open(fileName + "_imuz.csv", "a")
-    fimuz.write("Time,Data,Condition,Current,Label\n")
-    fppgraw = open(fileName + "_ppgraw.csv", "a")
-    fppgraw.write("Time,Data,Condition,Current,Label\n")
+    # 上一個場次未關閉的檔案先關閉
+    if any(f is not None for f in (fgsr, fhr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw, fppgbeat)):
+        closeFile()
+    
+    session_file_prefix = fileName
+    if output_compression:
+        compression_worker = CompressionWorker(output_compression, compression_level)
+    if segment_output:
+        segment_manifest = SessionManifest(
+            os.path.join(os.path.dirname(fileName) or ".", MANIFEST_FILE), os.path.basename(fileName))
+    fgsr = _open_signal_output(fileName, "gsr", CSV_HEADER)
+    fhr = _open_signal_output(fileName, "hr", CSV_HEADER)
+    fskt = _open_signal_output(fileName, "skt", CSV_HEADER)
+    fppi = _open_signal_output(fileName, "ppi", CSV_HEADER)
+    fact = _open_signal_output(fileName, "act", CSV_HEADER)
+    fimux = _open_signal_output(fileName, "imux", CSV_HEADER)
+    fimuy = _open_signal_output(fileName, "imuy", CSV_HEADER)
+    fimuz = _open_signal_output(fileName, "imuz", CSV_HEADER)
+    fppgraw = _open_signal_output(fileName, "ppgraw", CSV_HEADER)
+    if ppg_beat_detection and PPGBeatDetector is not None:
+        fppgbeat = _open_signal_output(fileName, "ppgbeat", PPGBEAT_CSV_HEADER)
 
-def read_wireless(host="0.0.0.0", port=8000):
-    global client_connection, latest_gsr, latest_hr, latest_skt, latest_ppi, latest_act
+def handle_message(parsed_data, transport="tcp"):
+    """處理一則已解析的訊息（TCP 與 UDP 共用）"""
+    global latest_gsr, latest_hr, latest_skt, latest_ppi, latest_act
     global latest_imux, latest_imuy, latest_imuz, latest_ppgraw
-    global last_output_time, last_data_time, is_client_connected, tcp_port
+    global last_output_time, last_data_time
+
+    # 更新最新值用於顯示
+    latest_gsr = parsed_data.get("GSR", latest_gsr)
+    latest_hr = parsed_data.get("HR", latest_hr)
+    latest_skt = parsed_data.get("SKT", latest_skt)
+    latest_ppi = parsed_data.get("PPI", latest_ppi)
+    latest_act = parsed_data.get("ACT", latest_act)
+    latest_imux = parsed_data.get("IMUX", latest_imux)
+    latest_imuy = parsed_data.get("IMUY", latest_imuy)
+    latest_imuz = parsed_data.get("IMUZ", latest_imuz)
+    latest_ppgraw = parsed_data.get("PPGRAW", latest_ppgraw)
+
+    last_data_time = clock.time()
+    update_signal_quality(parsed_data)
+    record_ingest_latency(parsed_data, transport, last_data_time)
+    current_time = clock.time()
+    if current_time - last_output_time >= 1:
+        output = []
+        if latest_gsr is not None:
+            output.append(f"GSR: {latest_gsr}")
+        if latest_hr is not None:
+            output.append(f"HR: {latest_hr}")
+        if latest_skt is not None:
+            output.append(f"SKT: {latest_skt:.1f}")
+        if latest_ppi is not None:
+            output.append(f"PPI: {latest_ppi}")
+        if latest_act is not None:
+            output.append(f"ACT: {latest_act}")
+        if latest_imux is not None:
+            output.append(f"IMUX: {latest_imux}")
+        if latest_imuy is not None:
+            output.append(f"IMUY: {latest_imuy}")
+        if latest_imuz is not None:
+            output.append(f"IMUZ: {latest_imuz}")
+        if latest_ppgraw is not None:
+            output.append(f"PPGRAW: {latest_ppgraw}")
+
+        print(", ".join(output))
+        last_output_time = current_time
+
+    if startWriteFlag:
+        process_data_with_server_timestamp(parsed_data)
+
+def handle_sequenced_message(parsed_data, default_device_id, transport="tcp"):
+    """依訊息中的 seq 去重後再處理；未帶 seq 的訊息直接處理"""
+    seq = parsed_data.get("seq")
+    if seq is None:
+        handle_message(parsed_data, transport)
+        return
+
+    device_id = str(parsed_data.get("device_id") or default_device_id)
+    try:
+        seq = int(seq)
+    except (ValueError, TypeError):
+        print(f"無效的序號: {seq}，略過序號檢查")
+        handle_message(parsed_data, transport)
+        return
+
+    if not sequence_tracker.accept(device_id, seq):
+        ingest_metrics.increment(transport, "duplicates")
+        return
+    handle_message(parsed_data, transport)
+    sequence_tracker.mark_queued(device_id)
+
+def send_resume(conn, device_id):
+    """回覆客戶端此裝置最後已寫入的序號，客戶端只需補傳之後的資料"""
+    last_seq = sequence_tracker.last_durable(device_id)
+    reply = {"type": "resume", "device_id": device_id, "last_seq": last_seq}
+    conn.sendall((json.dumps(reply) + "\n").encode("utf-8"))
+    ingest_metrics.increment("tcp", "resumes")
+    print(f"裝置 {device_id} 續傳，最後已寫入序號: {last_seq}")
+
+def record_ingest_latency(parsed_data, transport, receive_time):
+    """以訊息中第一個客戶端時間戳記錄接收延遲"""
+    ingest_metrics.increment(transport, "messages")
+    for signal_type in SIGNAL_TYPES:
+        client_time = _parse_client_time(signal_type, parsed_data.get(f"{signal_type}_Timestamp", ""))
+        if client_time is not None:
+            ingest_metrics.record_latency(transport, receive_time - client_time)
+            return
+
+def configure_client_socket(conn):
+    """啟用 TCP keepalive 與 user timeout，讓作業系統盡快發現半開連線"""
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # 以下選項依平台提供與否設定
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+    elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, KEEPALIVE_IDLE)
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL)
+    if hasattr(socket, "TCP_KEEPCNT"):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_COUNT)
+    if hasattr(socket, "TCP_USER_TIMEOUT"):  # Linux：未確認的資料超過此時間即斷線
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, TCP_USER_TIMEOUT_MS)
+
+def send_heartbeat(conn):
+    """送出應用層心跳，客戶端應回覆 {"type": "pong", "t": <原值>}"""
+    ping = {"type": "ping", "t": clock.time()}
+    conn.sendall((json.dumps(ping) + "\n").encode("utf-8"))
+
+def create_server_socket(host, port):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((host, port))
+    # 保留 backlog，連線中也能讓重連的客戶端排隊
+    server_socket.listen(4)
+    print(f"TCP伺服器監聽於 {host}:{port}...")
+    print(f"本機IP: {get_local_ip()}")
+    return server_socket
+
+def check_peer_timeout(now, last_receive_time, heartbeat_enabled):
+    """
+    依最後收到資料的時間判斷連線是否失效
+
+    Returns:
+        str | None: 失效原因，None 表示連線正常
+    """
+    silence = now - last_receive_time
+    if heartbeat_enabled:
+        if silence > HEARTBEAT_TIMEOUT:
+            return "Heartbeat timeout"
+    elif silence > DEAD_PEER_TIMEOUT:
+        return "Dead peer timeout"
+    return None
+
+def check_signal_timeout(now):
+    """是否已超過 SIGNAL_TIMEOUT 未收到生理訊號"""
+    return now - last_data_time > SIGNAL_TIMEOUT
+
+def read_wireless(host="0.0.0.0", port=8000):
+    global client_connection, last_data_time, is_client_connected, tcp_port
     
     # 更新TCP端口變數
     tcp_port = port
 
-    buffer = ""
+    capture = wire_capture
+    server_socket = None
+    disconnect_time = None  # 上一次連線中斷的時間，用於計算重連耗時
+    last_receive_time = None
     while startFlag:
         try:
-            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server_socket.bind((host, port))
-            server_socket.listen(1)
-            print(f"TCP伺服器監聽於 {host}:{port}...")
-            print(f"本機IP: {get_local_ip()}")
+            if server_socket is None:
+                server_socket = create_server_socket(host, port)
 
+            # 以 select 等待連線，才能在 stopSerial 後結束
+            readable, _, _ = select.select([server_socket], [], [], 0.2)
+            if not readable:
+                continue
             conn, addr = server_socket.accept()
+            accept_time = clock.time()
             print(f"客戶端已連接: {addr}")
+            record_pairing_time(addr[0], accept_time)
+            configure_client_socket(conn)
+            device_id = addr[0]  # 未送 hello 時以來源 IP 區分裝置
+            heartbeat_enabled = False
+            framer = LineFramer()
+            if capture is not None:
+                capture.write_connect(addr)
+
+            if disconnect_time is not None:
+                ingest_metrics.record_reconnect(last_receive_time, disconnect_time, accept_time)
+                print(f"重新連線耗時: {(accept_time - disconnect_time) * 1000:.0f} ms，"
+                      f"資料中斷: {(accept_time - last_receive_time) * 1000:.0f} ms")
+                disconnect_time = None
 
             with connection_lock:
                 client_connection = conn
                 is_client_connected = True
-                last_data_time = time.time()
+                last_data_time = clock.time()
+            last_receive_time = accept_time
+            last_heartbeat_time = accept_time
+            signal_lost = False  # 只在進入訊號中斷狀態時通知一次，資料恢復後重新計算
 
             while startFlag:
                 try:
-                    conn.settimeout(1.0)
-                    data = conn.recv(1024)
-                    if not data:
-                        print("客戶端斷線，等待重新連接...")
-                        bio_signals.disconnect_signal.emit("Client disconnected gracefully")
+                    readable, _, _ = select.select([conn, server_socket], [], [], 0.2)
+                    now = clock.time()
+
+                    if server_socket in readable:
+                        # 有新的連線在排隊：同一時間只服務一支手機，舊連線視為失效
+                        print("偵測到新連線，關閉舊連線")
+                        ingest_metrics.increment("tcp", "superseded_connections")
+                        bio_signals.disconnect_signal.emit("Connection superseded by a new client")
                         break
 
-                    buffer += data.decode('utf-8')
-                    while "\n" in buffer:
-                        message, buffer = buffer.split("\n", 1)
-                        message = message.strip()
-                        if not message:
-                            continue
-                        try:
-                            parsed_data = json.loads(message)
-
-                            # 更新最新值用於顯示
-                            latest_gsr = parsed_data.get("GSR", latest_gsr)
-                            latest_hr = parsed_data.get("HR", latest_hr)
-                            latest_skt = parsed_data.get("SKT", latest_skt)
-                            latest_ppi = parsed_data.get("PPI", latest_ppi)
-                            latest_act = parsed_data.get("ACT", latest_act)
-                            latest_imux = parsed_data.get("IMUX", latest_imux)
-                            latest_imuy = parsed_data.get("IMUY", latest_imuy)
-                            latest_imuz = parsed_data.get("IMUZ", latest_imuz)
-                            latest_ppgraw = parsed_data.get("PPGRAW", latest_ppgraw)
-
-                            last_data_time = time.time()
-                            current_time = time.time()
-                            if current_time - last_output_time >= 1:
-                                output = []
-                                if latest_gsr is not None:
-                                    output.append(f"GSR: {latest_gsr}")
-                                if latest_hr is not None:
-                                    output.append(f"HR: {latest_hr}")
-                                if latest_skt is not None:
-                                    output.append(f"SKT: {latest_skt:.1f}")
-                                if latest_ppi is not None:
-                                    output.append(f"PPI: {latest_ppi}")
-                                if latest_act is not None:
-                                    output.append(f"ACT: {latest_act}")
-                                if latest_imux is not None:
-                                    output.append(f"IMUX: {latest_imux}")
-                                if latest_imuy is not None:
-                                    output.append(f"IMUY: {latest_imuy}")
-                                if latest_imuz is not None:
-                                    output.append(f"IMUZ: {latest_imuz}")
-                                if latest_ppgraw is not None:
-                                    output.append(f"PPGRAW: {latest_ppgraw}")
-
-                                print(", ".join(output))
-                                last_output_time = current_time
-
-                            if startWriteFlag:
-                                process_data_with_server_timestamp(parsed_data)
-
-                        except json.JSONDecodeError:
-                            print(f"無效的JSON格式: {message}. 跳過此訊息.")
-                    if is_client_connected and time.time() - last_data_time > SIGNAL_TIMEOUT:
-                        bio_signals.signal_lost_signal.emit("No physiological signals received for too long")
-                except socket.timeout:
-                    if is_client_connected and time.time() - last_data_time > SIGNAL_TIMEOUT:
+                    if conn in readable:
+                        data = conn.recv(4096)
+                        if not data:
+                            print("客戶端斷線，等待重新連接...")
+                            bio_signals.disconnect_signal.emit("Client disconnected gracefully")
+                            break
+                        last_receive_time = now
+                        if capture is not None:
+                            capture.write_data(data)
+
+                        for message in framer.feed(data):
+                            parsed_data = parse_message(message)
+                            if parsed_data is None:
+                                continue
+                            device_id, said_hello = handle_tcp_message(parsed_data, device_id, conn, now)
+                            # 會處理 resume 的客戶端也會回覆心跳
+                            heartbeat_enabled = heartbeat_enabled or said_hello
+                        # 背壓時處理訊息可能阻塞，阻塞期間不算客戶端靜默
+                        now = clock.time()
+                        last_receive_time = now
+
+                    # 應用層心跳與失效偵測
+                    if heartbeat_enabled and now - last_heartbeat_time >= HEARTBEAT_INTERVAL:
+                        send_heartbeat(conn)
+                        last_heartbeat_time = now
+                    timeout_reason = check_peer_timeout(now, last_receive_time, heartbeat_enabled)
+                    if timeout_reason is not None:
+                        print(f"連線失效: {timeout_reason}（{now - last_receive_time:.1f}s 未收到任何資料），關閉連線")
+                        ingest_metrics.increment("tcp", "dead_peer_timeouts")
+                        bio_signals.disconnect_signal.emit(timeout_reason)
+                        break
+
+                    lost = is_client_connected and check_signal_timeout(clock.time())
+                    if lost and not signal_lost:
                         bio_signals.signal_lost_signal.emit("No physiological signals received for too long")
+                    signal_lost = lost
                 except Exception as e:
                     print(f"通訊錯誤: {e}")
                     bio_signals.disconnect_signal.emit(f"Connection error: {e}")
@@ -470,39 +1004,195 @@ def read_wireless(host="0.0.0.0", port=8000):
                 client_connection = None
                 is_client_connected = False
             conn.close()
-            print("連線已關閉，重新啟動伺服器...")
+            if capture is not None:
+                capture.write_disconnect()
+            disconnect_time = clock.time()
+            print("連線已關閉，等待重新連接...")
         except Exception as e:
             print(f"伺服器設定錯誤: {e}")
             bio_signals.disconnect_signal.emit(f"Server setup error: {e}")
-            sleep(1)
-        finally:
-            server_socket.close()
+            if server_socket is not None:
+                server_socket.close()
+                server_socket = None
+            clock.sleep(1)
+
+    if server_socket is not None:
+        server_socket.close()
+    if capture is not None:
+        capture.close()
+
+def handle_tcp_message(parsed_data, device_id, conn=None, now=None, transport="tcp"):
+    """
+    處理 TCP 串流中的一則訊息（含 hello / pong 控制訊息）
+
+    Returns:
+        Tuple[str, bool]: (此連線的裝置 ID, 是否為 hello 訊息)
+    """
+    message_type = parsed_data.get("type")
+    if message_type == "hello":
+        device_id = str(parsed_data.get("device_id") or device_id)
+        if conn is not None:
+            send_resume(conn, device_id)
+        return device_id, True
+    if message_type == "pong":
+        if "t" in parsed_data and now is not None:
+            ingest_metrics.record_latency("heartbeat_rtt", now - float(parsed_data["t"]))
+        return device_id, False
+    handle_sequenced_message(parsed_data, device_id, transport)
+    return device_id, False
+
+def _new_replay_state(device_id="replay"):
+    return {"framer": LineFramer(), "device_id": device_id, "heartbeat_enabled": False}
+
+def _feed_replay_data(state, data):
+    """重播：一段擷取的位元組經分幀、解析後交給與現場相同的處理流程"""
+    for message in state["framer"].feed(data):
+        parsed_data = parse_message(message)
+        if parsed_data is None:
+            continue
+        state["device_id"], said_hello = handle_tcp_message(parsed_data, state["device_id"], transport="replay")
+        state["heartbeat_enabled"] = state["heartbeat_enabled"] or said_hello
+
+def replay_wire_capture(path, speed=None):
+    """
+    將擷取檔經由相同的分幀與解析流程重播（需先 startSerial / startWrite）
+
+    Args:
+        path: bio_wire_capture.bin 路徑
+        speed: None 表示盡快重播；1.0 為原速
+
+    Returns:
+        dict: 重播的連線數、區塊數與位元組數
+    """
+    state = _new_replay_state()
+
+    def on_connect(addr, monotonic):
+        state.update(_new_replay_state(addr.rsplit(":", 1)[0]))
+
+    def on_data(data, monotonic):
+        _feed_replay_data(state, data)
+
+    def on_disconnect(monotonic):
+        state["framer"].reset()
+
+    return WireCapturePlayer(path).play(on_connect, on_data, on_disconnect, speed, sleep=clock.sleep)
+
+def simulate_wire_capture(path, virtual_clock=None):
+    """
+    在模擬時間上同步重播擷取檔，不啟動任何執行緒
+
+    依擷取時的接收時間推進時鐘，每 REORDER_WINDOW_SECONDS 執行一次排序與寫檔，
+    並在每一步做與 read_wireless 相同的連線與訊號逾時判斷，整個場次不需實際等待。
+    需先 setFileName / startWrite，且不可同時執行 startSerial。
+
+    Args:
+        path: bio_wire_capture.bin 路徑
+        virtual_clock: VirtualClock，None 則以擷取檔的開始時間建立
+
+    Returns:
+        dict: 重播統計，以及逾時判斷紀錄 timeouts / signal_lost（模擬時間）
+    """
+    global startFlag
+    stats = {"connections": 0, "chunks": 0, "bytes": 0, "steps": 0, "timeouts": [], "signal_lost": []}
+    # 同步模式沒有排序執行緒可以騰出空間，block 策略的訊號滿了只能捨棄並計數
+    previous_flag, startFlag = startFlag, False
+    previous_clock = clock
+    state = _new_replay_state()
+    connection = {"connected": False, "last_receive_time": None, "timed_out": False, "signal_lost": False}
+    mapping = {"wall_time": None, "monotonic": None, "next_step": None}
+
+    def run_step(now):
+        clock.set(now)
+        write_batch(take_sorted_batch())
+        if signal_quality_monitor is not None:
+            signal_quality_monitor.check(now)
+        stats["steps"] += 1
+        if not connection["connected"]:
+            return
+        reason = check_peer_timeout(now, connection["last_receive_time"], state["heartbeat_enabled"])
+        if reason is not None and not connection["timed_out"]:
+            connection["timed_out"] = True
+            stats["timeouts"].append((round(now, 3), reason))
+        lost = check_signal_timeout(now)
+        if lost and not connection["signal_lost"]:
+            stats["signal_lost"].append(round(now, 3))
+        connection["signal_lost"] = lost
+
+    def advance_to(monotonic):
+        now = mapping["wall_time"] + (monotonic - mapping["monotonic"])
+        if mapping["next_step"] is None:
+            mapping["next_step"] = now + REORDER_WINDOW_SECONDS
+        while mapping["next_step"] <= now:
+            run_step(mapping["next_step"])
+            mapping["next_step"] += REORDER_WINDOW_SECONDS
+        clock.set(now)
+        return now
+
+    try:
+        for record in read_capture(path):
+            if record.kind == KIND_SESSION:
+                session = json.loads(record.data.decode("utf-8"))
+                if mapping["wall_time"] is None:
+                    if virtual_clock is None:
+                        virtual_clock = VirtualClock(start=session["wall_time"])
+                    set_clock(virtual_clock)
+                    reset_session_state()
+                    signal_buffer.reopen()
+                mapping["wall_time"], mapping["monotonic"] = session["wall_time"], session["monotonic"]
+                continue
+            if mapping["wall_time"] is None:
+                raise ValueError(f"擷取檔缺少場次紀錄: {path}")
+            now = advance_to(record.monotonic)
+
+            if record.kind == KIND_CONNECT:
+                stats["connections"] += 1
+                state.update(_new_replay_state(record.data.decode("utf-8").rsplit(":", 1)[0]))
+                connection.update(connected=True, last_receive_time=now, timed_out=False, signal_lost=False)
+            elif record.kind == KIND_DATA:
+                stats["chunks"] += 1
+                stats["bytes"] += len(record.data)
+                connection["last_receive_time"] = now
+                _feed_replay_data(state, record.data)
+            elif record.kind == KIND_DISCONNECT:
+                connection["connected"] = False
+                state["framer"].reset()
+
+        # 最後一個視窗的數據
+        if mapping["next_step"] is not None:
+            run_step(mapping["next_step"])
+    finally:
+        startFlag = previous_flag
+        set_clock(previous_clock)
+    return stats
 
 def process_data_with_server_timestamp(parsed_data):
     """使用伺服器端時間戳處理數據"""
     global server_sequence_counter
     
-    # 支援的信號類型
-    signal_types = ["GSR", "HR", "SKT", "PPGRAW", "PPI", "ACT", "IMUX", "IMUY", "IMUZ"]
-    
-    for signal_type in signal_types:
+    # 標籤於接收時固定，之後積壓或捨棄都不影響標籤轉換的位置
+    labels = (now_status, current_status, now_label)
+    for signal_type in SIGNAL_TYPES:
         if signal_type in parsed_data:
             try:
                 value = float(parsed_data[signal_type])
                 original_timestamp = parsed_data.get(f"{signal_type}_Timestamp", "")
                 server_timestamp = generate_server_timestamp()
                 
-                # 創建數據點並加入緩衝佇列
+                # 創建數據點並加入緩衝佇列（TCP 與 UDP 執行緒共用序號）
+                with timestamp_lock:
+                    sequence = server_sequence_counter
+                    server_sequence_counter += 1
                 data_point = DataPoint(
                     signal_type=signal_type,
                     value=value,
                     original_timestamp=original_timestamp,
                     server_timestamp=server_timestamp,
-                    sequence=server_sequence_counter
+                    sequence=sequence,
+                    labels=labels
                 )
                 
-                data_buffer_queue.put(data_point)
-                server_sequence_counter += 1
+                # 依該訊號策略放入有界緩衝：block 會阻塞接收執行緒（TCP 背壓）
+                signal_buffer.put(data_point, signal_type, is_running=lambda: startFlag)
                 
             except (ValueError, TypeError) as e:
                 print(f"數據轉換錯誤 {signal_type}: {e}")
@@ -511,24 +1201,127 @@ def process_data(parsed_data):
     """保持向後兼容的原始函數"""
     process_data_with_server_timestamp(parsed_data)
 
-def startSerial(host="0.0.0.0", port=8000):
-    global startFlag, server_timestamp_start, server_sequence_counter
+def setUDPIngest(enabled, port=None):
+    """開啟/關閉 UDP 資料接收（需在 startSerial 前設定）"""
+    global udp_ingest_enabled, udp_ingest_port
+    udp_ingest_enabled = enabled
+    if port is not None:
+        udp_ingest_port = port
+
+def setCompression(codec, level=None):
+    """
+    設定輸出壓縮（需在 setFileName 前設定）
+
+    Args:
+        codec: None 表示純文字 CSV，"gzip" 或 "zstd"（需安裝 zstandard，否則改用 gzip）
+        level: 壓縮等級，None 使用預設（gzip 6 / zstd 3）
+    """
+    global output_compression, compression_level
+    output_compression = codec
+    compression_level = level
+
+def get_compression_stats():
+    """目前（或最近一次關檔時）的壓縮率與 CPU 成本，未壓縮時為 None"""
+    if compression_worker is not None:
+        return compression_worker.get_stats()
+    return compression_stats
+
+def setSegmentOutput(enabled):
+    """開啟/關閉依實驗階段分段輸出（需在 setFileName 前設定）"""
+    global segment_output
+    segment_output = enabled
+
+def setSortOnClose(enabled):
+    """開啟/關閉場次結束時的排序檢查（預設開啟）"""
+    global sort_on_close
+    sort_on_close = enabled
+
+def setWireCapture(enabled):
+    """開啟/關閉 TCP 原始資料擷取（需在 setFileName 之後、startSerial 前設定）"""
+    global wire_capture_enabled
+    wire_capture_enabled = enabled
+
+def get_ingest_metrics():
+    """取得各傳輸方式的延遲百分位數與計數器、各裝置序號缺口統計與緩衝使用量"""
+    return ingest_metrics.snapshot(extra={
+        "sequences": sequence_tracker.get_stats(),
+        "queues": get_queue_stats(),
+        "compression": get_compression_stats(),
+    })
+
+def set_clock(new_clock):
+    """
+    替換取時間與等待所用的時鐘（SystemClock / VirtualClock）
+
+    Returns:
+        原本的時鐘，方便測試結束後還原
+    """
+    global clock
+    previous_clock, clock = clock, new_clock
+    # 已建立的品質監控與 UDP 接收也改用新的時鐘
+    if signal_quality_monitor is not None:
+        signal_quality_monitor.clock = new_clock
+    if udp_ingest_server is not None:
+        udp_ingest_server.clock = new_clock
+    return previous_clock
+
+def reset_session_state():
+    """重置每個場次的狀態（時間戳、心跳偵測、品質監控、統計與序號）"""
+    global server_timestamp_start, server_sequence_counter, ppg_beat_detector
+    global signal_quality_monitor, server_start_time, last_data_time
     
     # 重置時間戳生成器
     with timestamp_lock:
         server_timestamp_start = None
         server_sequence_counter = 0
     
+    # 每次連線階段使用新的心跳偵測狀態
+    if ppg_beat_detection and PPGBeatDetector is not None:
+        ppg_beat_detector = PPGBeatDetector()
+    else:
+        ppg_beat_detector = None
+    
+    # 品質區段紀錄寫入與生理訊號相同的場次目錄
+    quality_log_path = None
+    if session_file_prefix:
+        quality_log_path = os.path.join(os.path.dirname(session_file_prefix) or ".", "bio_quality_log.csv")
+    signal_quality_monitor = SignalQualityMonitor(SIGNAL_TYPES, quality_log_path, clock)
+    ingest_metrics.reset()
+    sequence_tracker.reset()
+    server_start_time = clock.time()
+    last_data_time = server_start_time
+    with discovery_lock:
+        discovery_probe_times.clear()
+
+def startSerial(host="0.0.0.0", port=8000):
+    global startFlag, udp_ingest_server, wire_capture, read_thread
+    
+    reset_session_state()
+    
+    wire_capture = None
+    if wire_capture_enabled and session_file_prefix:
+        capture_path = os.path.join(os.path.dirname(session_file_prefix) or ".", "bio_wire_capture.bin")
+        try:
+            wire_capture = WireCaptureWriter(capture_path)
+        except OSError as e:
+            print(f"無法建立擷取檔 {capture_path}: {e}")
+    
+    startFlag = True
+    
     # 啟動緩衝處理
     start_buffer_processing()
     
     # 啟動廣播服務
     start_broadcast_service()
     
-    startFlag = True
-    thread = threading.Thread(target=read_wireless, args=(host, port))
-    thread.daemon = True
-    thread.start()
+    read_thread = threading.Thread(target=read_wireless, args=(host, port))
+    read_thread.daemon = True
+    read_thread.start()
+    
+    # 啟動 UDP 接收（與 TCP 共用後續處理流程）
+    if udp_ingest_enabled:
+        udp_ingest_server = UDPIngestServer(handle_message, ingest_metrics, host, udp_ingest_port, clock)
+        udp_ingest_server.start()
 
 def startWrite():
     global startWriteFlag
@@ -536,7 +1329,7 @@ def startWrite():
     startWriteFlag = True
 
 def stopWrite():
-    global startWriteFlag, fhr, fgsr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw
+    global startWriteFlag, fhr, fgsr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw, fppgbeat
     print("[stopWrite]")
     startWriteFlag = False
     if fhr:
@@ -557,28 +1350,71 @@ def stopWrite():
         fimuz.flush()
     if fppgraw:
         fppgraw.flush()
+    if fppgbeat:
+        fppgbeat.flush()
 
 def closeFile():
-    global fhr, fgsr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw
+    global fhr, fgsr, fskt, fppi, fact, fimux, fimuy, fimuz, fppgraw, fppgbeat
+    global startWriteFlag, compression_worker, compression_stats, segment_manifest
     print("[closeFile]")
     startWriteFlag = False
-    if fhr: fhr.close()
-    if fgsr: fgsr.close()
-    if fskt: fskt.close()
-    if fppi: fppi.close()
-    if fact: fact.close()
-    if fimux: fimux.close()
-    if fimuy: fimuy.close()
-    if fimuz: fimuz.close()
-    if fppgraw: fppgraw.close()
+    with data_lock:
+        if fhr: fhr.close()
+        if fgsr: fgsr.close()
+        if fskt: fskt.close()
+        if fppi: fppi.close()
+        if fact: fact.close()
+        if fimux: fimux.close()
+        if fimuy: fimuy.close()
+        if fimuz: fimuz.close()
+        if fppgraw: fppgraw.close()
+        if fppgbeat: fppgbeat.close()
+        # 清除檔案參照，避免之後的場次寫入已關閉的檔案或重複開檔
+        fhr = fgsr = fskt = fppi = fact = fimux = fimuy = fimuz = fppgraw = fppgbeat = None
+    if segment_manifest is not None:
+        segment_manifest.close()
+        segment_manifest = None
+    # 等背景執行緒壓縮並寫完最後的區塊
+    if compression_worker is not None:
+        compression_worker.stop()
+        compression_stats = compression_worker.get_stats()
+        compression_worker = None
+        print(f"[壓縮] {compression_stats['codec']} 等級 {compression_stats['level']}："
+              f"壓縮率 {compression_stats['ratio']}，CPU {compression_stats['cpu_ms']} ms")
 
 def stopSerial():
-    global startFlag
+    global startFlag, udp_ingest_server
     print("[stopSerial]")
     startFlag = False
     # 停止廣播服務
     stop_broadcast_service()
+    if udp_ingest_server is not None:
+        udp_ingest_server.stop()
+        udp_ingest_server = None
+    # 等待 TCP 接收執行緒結束（擷取檔由其關閉）
+    if read_thread is not None:
+        read_thread.join(timeout=2.0)
+    # 寫完緩衝中剩餘的數據再關檔
+    stop_buffer_processing()
+    if signal_quality_monitor is not None:
+        signal_quality_monitor.close(clock.time())
+    # 關檔後再存統計，壓縮統計才包含最後的區塊
     closeFile()
+    if sort_on_close and session_file_prefix:
+        sort_session_files(
+            os.path.dirname(session_file_prefix) or ".",
+            os.path.basename(session_file_prefix),
+            [signal_type.lower() for signal_type in SIGNAL_TYPES] + ["ppgbeat"]
+        )
+    if session_file_prefix:
+        ingest_metrics.save(
+            os.path.join(os.path.dirname(session_file_prefix) or ".", "bio_ingest_metrics.json"),
+            extra={
+                "sequences": sequence_tracker.get_stats(),
+                "queues": get_queue_stats(),
+                "compression": compression_stats if output_compression else None,
+            }
+        )
 
 def get_timestamp_stats():
     """取得時間戳生成統計信息"""
@@ -586,7 +1422,7 @@ def get_timestamp_stats():
         return {
             "sequence_counter": server_sequence_counter,
             "start_time": server_timestamp_start,
-            "current_time": time.time()
+            "current_time": clock.time()
         }
 
 def get_broadcast_info():
@@ -594,6 +1430,7 @@ def get_broadcast_info():
     return {
         "broadcast_port": broadcast_port,
         "tcp_port": tcp_port,
+        "udp_port": udp_ingest_port if udp_ingest_enabled else None,
         "local_ip": get_local_ip(),
         "broadcast_active": broadcast_flag
     }
\ No newline at end of file
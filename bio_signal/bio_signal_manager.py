@@ -2,6 +2,8 @@ import csv
 import os
 import time
 from .bioDataUtils import setStatus, startSerial, startWrite, stopWrite, stopSerial, setFileName, setLabel, setCurrent
+from .bioDataUtils import get_signal_quality, wait_for_signal_quality, setUDPIngest, get_ingest_metrics
+from .bioDataUtils import setQueuePolicy, setWireCapture, replay_wire_capture, setCompression, setSegmentOutput
 
 class BioSignalManager:
     def __init__(self, label_manager):
@@ -9,16 +11,26 @@ class BioSignalManager:
         self.is_collecting_data = False
         self.label_manager = label_manager
 
-    def start_reading(self, case_path, host="0.0.0.0", port=8000):
+    def start_reading(self, case_path, host="0.0.0.0", port=8000, udp_port=None, capture_wire=False,
+                      compression=None, compression_level=None, segment_by_phase=False):
         """
         開始讀取生理訊號，使用無線通訊。
         :param case_path: 生理數據存檔路徑
         :param host: 無線通訊的 IP 地址
         :param port: 無線通訊的端口
+        :param udp_port: UDP 資料接收端口，None 表示只使用 TCP
+        :param capture_wire: 是否將 TCP 原始資料寫入 bio_wire_capture.bin 供重播
+        :param compression: 輸出壓縮格式，None（純文字 CSV）、"gzip" 或 "zstd"
+        :param compression_level: 壓縮等級，None 使用預設
+        :param segment_by_phase: 是否依實驗階段（set_current）分段輸出，並寫入 bio_session_manifest.json
         """
         if not self.bio_data_initialized:
             self.case_path = case_path  # ✅ <--- 加上這一行
+            setCompression(compression, compression_level)
+            setSegmentOutput(segment_by_phase)
             setFileName(f"{case_path}/bio_result")
+            setUDPIngest(udp_port is not None, udp_port)
+            setWireCapture(capture_wire)
             startSerial(host, port)  # 無線傳輸，取代原來的串口方式
             self.bio_data_initialized = True
 
@@ -63,6 +75,43 @@ class BioSignalManager:
             stopWrite()
             self.is_collecting_data = False
 
+    def get_signal_quality(self):
+        """
+        取得逐訊號品質狀態。
+        :return: {訊號: {"status", "rate", "expected_rate", "age", "samples"}}
+        """
+        return get_signal_quality()
+
+    def wait_for_signals(self, signal_types=("GSR", "HR", "SKT"), timeout=30.0):
+        """
+        設備配戴階段使用：等待指定訊號品質皆正常。
+        :param signal_types: 必須就緒的訊號
+        :param timeout: 最長等待秒數
+        :return: 是否在逾時前就緒
+        """
+        if not self.bio_data_initialized:
+            return False
+        return wait_for_signal_quality(signal_types, timeout)
+
+    def get_ingest_metrics(self):
+        """
+        取得接收統計（TCP / UDP 延遲百分位數、遺失與亂序計數）。
+        """
+        return get_ingest_metrics()
+
+    def replay_capture(self, capture_path, speed=None):
+        """
+        將 bio_wire_capture.bin 重播進目前的處理流程（需先 start_reading）。
+        speed 為 None 時盡快重播，1.0 為原速。
+        """
+        return replay_wire_capture(capture_path, speed)
+
+    def set_queue_policy(self, signal_type, policy, capacity=None):
+        """
+        設定單一訊號緩衝滿時的處理方式："drop_oldest"、"drop_newest" 或 "block"（對手機端背壓）。
+        """
+        setQueuePolicy(signal_type, policy, capacity)
+
     def close(self):
         """
         關閉數據收集流程，包括停止寫入和關閉連接。
@@ -70,6 +119,7 @@ class BioSignalManager:
         if self.bio_data_initialized:
             self.stop_writing()
             stopSerial()
+            self.bio_data_initialized = False
 
 
     # ✅ 新增：標記當下的 label 切換 # Roger
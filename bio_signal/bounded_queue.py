@@ -0,0 +1,144 @@
+# bio_signal/bounded_queue.py
+"""
+有界的接收緩衝與逐訊號溢位策略
+接收 → 排序 → 寫檔 之間的每個階段都有上限，磁碟卡住或排序執行緒落後時
+記憶體不再無限制成長：
+
+- drop_oldest：丟棄該訊號最舊的樣本（高頻、可容忍缺漏的 PPGRAW / IMU）
+- drop_newest：丟棄新進來的樣本
+- block      ：阻塞接收執行緒，停止 recv 讓 TCP 視窗填滿，對客戶端形成背壓
+               （HR / PPI 等不可遺失的訊號）
+
+標籤不經過佇列：每個數據點在接收時即帶著當下的標籤，不會因積壓而被丟棄或錯置。
+"""
+import threading
+from collections import deque
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DROP_NEWEST = "drop_newest"
+POLICY_BLOCK = "block"
+
+# 各訊號預設容量（樣本數）與策略；PPGRAW 容量相對取樣率最小，最先被捨棄
+DEFAULT_QUEUE_CONFIG = {
+    "PPGRAW": (600, POLICY_DROP_OLDEST),   # 約 40 秒
+    "IMUX": (120, POLICY_DROP_OLDEST),
+    "IMUY": (120, POLICY_DROP_OLDEST),
+    "IMUZ": (120, POLICY_DROP_OLDEST),
+    "ACT": (120, POLICY_DROP_OLDEST),
+    "GSR": (1800, POLICY_BLOCK),           # 約 2 分鐘
+    "SKT": (900, POLICY_BLOCK),
+    "HR": (240, POLICY_BLOCK),
+    "PPI": (240, POLICY_BLOCK),
+}
+
+BLOCK_WAIT_SLICE = 0.1  # 阻塞時每次等待的秒數，期間檢查是否已停止
+
+
+class BoundedSignalBuffer:
+    """逐訊號有界緩衝（接收執行緒寫入，排序執行緒整批取出）"""
+
+    def __init__(self, config=None, metrics=None):
+        """
+        Args:
+            config: {訊號: (容量, 策略)}，未列出的訊號使用 drop_oldest / 240
+            metrics: IngestMetrics，記錄丟棄與阻塞次數
+        """
+        self.config = dict(DEFAULT_QUEUE_CONFIG)
+        if config:
+            self.config.update(config)
+        self.metrics = metrics
+        self.condition = threading.Condition()
+        self.buffers = {}
+        self.dropped = {}            # 上次取出後各訊號丟棄數
+        self.high_water = {}
+        self.closed = False
+
+    def set_policy(self, signal_type, policy, capacity=None):
+        """調整單一訊號的策略與容量"""
+        with self.condition:
+            old_capacity, _ = self.config.get(signal_type, (240, POLICY_DROP_OLDEST))
+            self.config[signal_type] = (capacity or old_capacity, policy)
+
+    def _count(self, name, count=1):
+        if self.metrics is not None:
+            self.metrics.increment("queue", name, count)
+
+    def put(self, item, signal_type, is_running=lambda: True):
+        """
+        放入一個數據點
+
+        Returns:
+            bool: 是否已放入（False 表示依策略丟棄）
+        """
+        capacity, policy = self.config.get(signal_type, (240, POLICY_DROP_OLDEST))
+        with self.condition:
+            buffer = self.buffers.get(signal_type)
+            if buffer is None:
+                buffer = self.buffers[signal_type] = deque()
+
+            if len(buffer) >= capacity:
+                if policy == POLICY_DROP_OLDEST:
+                    buffer.popleft()
+                    self._record_drop(signal_type)
+                elif policy == POLICY_DROP_NEWEST:
+                    self._record_drop(signal_type)
+                    return False
+                else:
+                    self._count(f"blocked_{signal_type}")
+                    while len(buffer) >= capacity and not self.closed and is_running():
+                        self.condition.wait(BLOCK_WAIT_SLICE)
+                    if len(buffer) >= capacity:
+                        # 已停止仍無空間：只能捨棄
+                        self._record_drop(signal_type)
+                        return False
+
+            buffer.append(item)
+            if len(buffer) > self.high_water.get(signal_type, 0):
+                self.high_water[signal_type] = len(buffer)
+            return True
+
+    def _record_drop(self, signal_type):
+        self.dropped[signal_type] = self.dropped.get(signal_type, 0) + 1
+        self._count(f"dropped_{signal_type}")
+
+    def drain(self):
+        """
+        取出所有數據點
+
+        Returns:
+            Tuple[list, dict]: (數據點, 上次取出後各訊號丟棄數)
+        """
+        with self.condition:
+            items = []
+            for buffer in self.buffers.values():
+                items.extend(buffer)
+                buffer.clear()
+            dropped, self.dropped = self.dropped, {}
+            self.condition.notify_all()
+        return items, dropped
+
+    def close(self):
+        """喚醒所有被阻塞的寫入者"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def reopen(self):
+        with self.condition:
+            self.closed = False
+            for buffer in self.buffers.values():
+                buffer.clear()
+            self.dropped = {}
+            self.high_water = {}
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                signal_type: {
+                    "queued": len(self.buffers.get(signal_type, ())),
+                    "capacity": capacity,
+                    "policy": policy,
+                    "high_water": self.high_water.get(signal_type, 0),
+                }
+                for signal_type, (capacity, policy) in self.config.items()
+            }
@@ -0,0 +1,59 @@
+# bio_signal/clock.py
+"""
+可替換的時鐘
+bioDataUtils 內的取時間與等待，以及 UDP 排序緩衝與訊號品質監控都經由目前的時鐘，
+測試時以 set_clock 換成 VirtualClock，重排視窗 (300ms)、UDP 遺漏等待 (200ms)、
+訊號逾時 (5s)、廣播間隔等時間相關行為即可在模擬時間上執行，
+40 分鐘的場次重播可在數秒內完成，排序與逾時判斷與實際時間相同。
+"""
+import threading
+import time
+
+
+class SystemClock:
+    """實際時間（預設）"""
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    模擬時間：只在 advance() / set() 時前進
+
+    單執行緒重播時由驅動端推進時間；若有其他執行緒呼叫 sleep()，
+    會阻塞到模擬時間超過其喚醒時間為止。
+    """
+
+    def __init__(self, start=1700000000.0):
+        self._start = start
+        self._now = start
+        self._condition = threading.Condition()
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now - self._start
+
+    def set(self, timestamp):
+        """將時間設為指定值（不會倒退）"""
+        with self._condition:
+            if timestamp > self._now:
+                self._now = timestamp
+                self._condition.notify_all()
+
+    def advance(self, seconds):
+        self.set(self._now + seconds)
+
+    def sleep(self, seconds):
+        deadline = self._now + seconds
+        with self._condition:
+            while self._now < deadline:
+                self._condition.wait()
@@ -0,0 +1,289 @@
+# bio_signal/compressed_sink.py
+"""
+壓縮輸出（可選）
+各訊號 CSV 以獨立壓縮區塊 (frame) 附加寫入 bio_result_<訊號>.csv.gz / .csv.zst，
+壓縮在背景執行緒進行，寫檔執行緒只負責累積文字。
+
+- gzip：每個區塊是完整的 gzip member，串接後仍是標準 gzip 檔（zcat / pandas 可直接讀）
+- zstd：每個區塊是完整的 zstd frame，需安裝 zstandard
+- 每累積 FRAME_BYTES 或經過 FRAME_INTERVAL 秒輸出一個區塊，程式中斷最多遺失最後一個區塊
+- iter_signal_lines / open_signal_file 串流解壓，檔尾不完整的區塊會被略過
+"""
+import gzip
+import io
+import os
+import queue
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # 未安裝時只提供 gzip
+    zstandard = None
+
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+EXTENSIONS = {CODEC_GZIP: ".gz", CODEC_ZSTD: ".zst"}
+DEFAULT_LEVELS = {CODEC_GZIP: 6, CODEC_ZSTD: 3}
+
+FRAME_BYTES = 256 * 1024   # 單一區塊未壓縮大小上限
+FRAME_INTERVAL = 1.0       # 最久多少秒輸出一個區塊（中斷時的最大遺失範圍）
+PENDING_FRAMES = 64        # 等待壓縮的區塊上限，滿時寫檔執行緒等待
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def available_codecs():
+    """目前環境可用的壓縮格式"""
+    codecs = [CODEC_GZIP]
+    if zstandard is not None:
+        codecs.append(CODEC_ZSTD)
+    return codecs
+
+
+def resolve_codec(codec):
+    """檢查壓縮格式；zstd 不可用時改用 gzip"""
+    if codec not in EXTENSIONS:
+        raise ValueError(f"不支援的壓縮格式: {codec}（可用: {', '.join(EXTENSIONS)}）")
+    if codec == CODEC_ZSTD and zstandard is None:
+        print("zstandard 未安裝，壓縮輸出改用 gzip")
+        return CODEC_GZIP
+    return codec
+
+
+def codec_for_path(path):
+    """依副檔名判斷壓縮格式，未壓縮回傳 None"""
+    for codec, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+def compress_frame(codec, data, level=None):
+    """將一段資料壓縮成獨立區塊（gzip member / zstd frame）"""
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class CompressionWorker:
+    """單一背景執行緒依序壓縮並寫入所有訊號檔的區塊"""
+
+    def __init__(self, codec=CODEC_GZIP, level=None):
+        self.codec = resolve_codec(codec)
+        self.level = DEFAULT_LEVELS[self.codec] if level is None else level
+        if self.codec == CODEC_ZSTD:
+            self._zstd = zstandard.ZstdCompressor(level=self.level)
+        self.queue = queue.Queue(maxsize=PENDING_FRAMES)
+        self.stats_lock = threading.Lock()
+        self.stats = {}  # 檔名 -> {"raw_bytes", "compressed_bytes", "frames", "cpu_seconds"}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def compress(self, data):
+        if self.codec == CODEC_ZSTD:
+            return self._zstd.compress(data)
+        return compress_frame(self.codec, data, self.level)
+
+    def open(self, path):
+        """開啟壓縮輸出檔，path 為未加副檔名的 CSV 路徑"""
+        return CompressedSignalWriter(path + EXTENSIONS[self.codec], self)
+
+    def submit(self, sink, data):
+        """交給背景執行緒壓縮；data 為 None 表示寫完後關閉檔案"""
+        self.queue.put((sink, data))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            sink, data = item
+            try:
+                if data is None:
+                    sink.file.close()
+                    continue
+                cpu_start = time.thread_time()
+                frame = self.compress(data)
+                sink.file.write(frame)
+                sink.file.flush()
+                cpu_seconds = time.thread_time() - cpu_start
+            except (OSError, ValueError) as e:
+                print(f"壓縮寫入失敗 {sink.path}: {e}")
+                continue
+            with self.stats_lock:
+                stats = self.stats.setdefault(os.path.basename(sink.path), {
+                    "raw_bytes": 0, "compressed_bytes": 0, "frames": 0, "cpu_seconds": 0.0})
+                stats["raw_bytes"] += len(data)
+                stats["compressed_bytes"] += len(frame)
+                stats["frames"] += 1
+                stats["cpu_seconds"] += cpu_seconds
+
+    def stop(self, timeout=10.0):
+        """寫完所有區塊後結束背景執行緒"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def get_stats(self):
+        """
+        各檔案與整體的壓縮率與 CPU 成本
+
+        Returns:
+            dict: {"codec", "level", "files": {...}, "raw_bytes", "compressed_bytes", "ratio", "cpu_ms"}
+        """
+        with self.stats_lock:
+            files = {name: dict(stats) for name, stats in self.stats.items()}
+        for stats in files.values():
+            stats["ratio"] = round(stats["raw_bytes"] / stats["compressed_bytes"], 2) if stats["compressed_bytes"] else None
+            stats["cpu_ms"] = round(stats.pop("cpu_seconds") * 1000.0, 1)
+        raw = sum(s["raw_bytes"] for s in files.values())
+        compressed = sum(s["compressed_bytes"] for s in files.values())
+        return {
+            "codec": self.codec,
+            "level": self.level,
+            "files": files,
+            "raw_bytes": raw,
+            "compressed_bytes": compressed,
+            "ratio": round(raw / compressed, 2) if compressed else None,
+            "cpu_ms": round(sum(s["cpu_ms"] for s in files.values()), 1),
+        }
+
+
+class CompressedSignalWriter:
+    """
+    與文字檔相同的 write() / flush() / close() 介面，供 process_sorted_data 直接替換
+
+    flush() 只在區塊累積足夠或超過 FRAME_INTERVAL 時才真正送出，
+    避免每筆數據都產生一個極小的壓縮區塊。
+    """
+
+    def __init__(self, path, worker):
+        self.path = path
+        self.name = path  # 與檔案物件相同的屬性
+        self.worker = worker
+        self.file = open(path, "ab")
+        self.pending = []
+        self.pending_size = 0
+        self.last_frame_time = time.monotonic()
+
+    def write(self, text):
+        self.pending.append(text)
+        self.pending_size += len(text)
+
+    def flush(self):
+        if self.pending_size >= FRAME_BYTES or time.monotonic() - self.last_frame_time >= FRAME_INTERVAL:
+            self._emit()
+
+    def _emit(self):
+        self.last_frame_time = time.monotonic()
+        if not self.pending:
+            return
+        data = "".join(self.pending).encode("utf-8")
+        self.pending = []
+        self.pending_size = 0
+        self.worker.submit(self, data)
+
+    def close(self):
+        self._emit()
+        self.worker.submit(self, None)
+
+
+def resolve_signal_path(path):
+    """
+    找出實際的訊號檔：path 本身存在即回傳，否則依序嘗試 .gz / .zst
+
+    Returns:
+        str 或 None
+    """
+    if os.path.exists(path):
+        return path
+    for extension in EXTENSIONS.values():
+        if os.path.exists(path + extension):
+            return path + extension
+    return None
+
+
+def _iter_frames(f, new_decompressor):
+    """逐區塊解壓；每個區塊完整後才輸出，檔尾不完整的區塊捨棄"""
+    decompressor = new_decompressor()
+    parts = []
+    while True:
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        while chunk:
+            parts.append(decompressor.decompress(chunk))
+            if decompressor.eof:
+                yield b"".join(parts)
+                parts = []
+                chunk = decompressor.unused_data
+                decompressor = new_decompressor()
+            else:
+                chunk = b""
+
+
+def iter_decompressed(path):
+    """
+    串流讀取訊號檔（.csv / .csv.gz / .csv.zst），逐區塊輸出解壓後的位元組
+
+    Yields:
+        bytes
+    """
+    codec = codec_for_path(path)
+    with open(path, "rb") as f:
+        if codec == CODEC_GZIP:
+            yield from _iter_frames(f, lambda: zlib.decompressobj(wbits=31))
+        elif codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ImportError(f"讀取 {path} 需要安裝 zstandard")
+            dctx = zstandard.ZstdDecompressor()
+            yield from _iter_frames(f, dctx.decompressobj)
+        else:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class _ChunkStream(io.RawIOBase):
+    """將解壓產生器包成可讀的串流"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = memoryview(b"")
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.position >= len(self.buffer):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.buffer = memoryview(chunk)
+            self.position = 0
+        size = min(len(b), len(self.buffer) - self.position)
+        b[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
+
+
+def open_signal_file(path, encoding="utf-8"):
+    """
+    以文字模式開啟訊號檔（自動判斷是否壓縮），可直接交給 csv.reader 或 pandas.read_csv
+
+    Returns:
+        io.TextIOWrapper
+    """
+    return io.TextIOWrapper(io.BufferedReader(_ChunkStream(iter_decompressed(path))),
+                            encoding=encoding, newline="")
+
+
+def iter_signal_lines(path, encoding="utf-8"):
+    """逐行讀取訊號檔（自動判斷是否壓縮）"""
+    with open_signal_file(path, encoding) as f:
+        yield from f
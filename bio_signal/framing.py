@@ -0,0 +1,54 @@
+# bio_signal/framing.py
+"""
+TCP 串流分幀與解析
+手機端以「一行一個 JSON」傳送，recv 取得的位元組可能切在任意位置
+（包含 UTF-8 多位元組字元中間），因此以位元組緩衝分行後再解碼。
+read_wireless 與擷取重播共用同一套流程，重播結果與現場一致。
+"""
+import json
+
+
+class LineFramer:
+    """以換行分割位元組串流（每條連線一個實例）"""
+
+    def __init__(self):
+        self.buffer = b""
+
+    def reset(self):
+        self.buffer = b""
+
+    def feed(self, data):
+        """
+        放入一段 recv 取得的位元組
+
+        Returns:
+            List[str]: 已完整的訊息（去除空白，略過空行）
+        """
+        self.buffer += data
+        if b"\n" not in self.buffer:
+            return []
+        *lines, self.buffer = self.buffer.split(b"\n")
+        messages = []
+        for line in lines:
+            message = line.decode("utf-8", errors="replace").strip()
+            if message:
+                messages.append(message)
+        return messages
+
+
+def parse_message(message):
+    """
+    解析單一訊息
+
+    Returns:
+        dict | None: 解析結果；無效的 JSON 回傳 None
+    """
+    try:
+        parsed_data = json.loads(message)
+    except json.JSONDecodeError:
+        print(f"無效的JSON格式: {message}. 跳過此訊息.")
+        return None
+    if not isinstance(parsed_data, dict):
+        print(f"訊息不是 JSON 物件: {message}. 跳過此訊息.")
+        return None
+    return parsed_data
@@ -0,0 +1,152 @@
+# bio_signal/ingest_metrics.py
+"""
+接收管線統計
+記錄各傳輸方式 (tcp / udp) 的延遲分佈與計數器（遺失、重複、亂序等），
+場次結束時寫入 bio_ingest_metrics.json。
+"""
+import json
+import os
+import sys
+import threading
+from collections import deque
+
+import numpy as np
+
+LATENCY_SAMPLE_SIZE = 20000  # 每種傳輸方式保留的最近延遲樣本數
+
+try:
+    import resource
+except ImportError:  # Windows 無 resource 模組
+    resource = None
+
+
+def process_stats():
+    """
+    目前行程的資源使用量（長時間測試用），無法取得的項目為 None
+
+    Returns:
+        dict: rss_mb, peak_rss_mb, threads, open_fds
+    """
+    stats = {"rss_mb": None, "peak_rss_mb": None, "threads": threading.active_count(), "open_fds": None}
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        stats["rss_mb"] = round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+        stats["open_fds"] = len(os.listdir("/proc/self/fd"))
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 單位為 KB，macOS 為 bytes
+        stats["peak_rss_mb"] = round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    return stats
+
+
+class IngestMetrics:
+    """執行緒安全的接收統計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {}   # transport -> deque[秒]
+            self.counters = {}    # transport -> {name: count}
+            self.reconnects = []  # 每次斷線到重新連線的紀錄
+
+    def record_latency(self, transport, seconds):
+        """記錄一筆接收延遲（伺服器接收時間 - 客戶端時間戳）"""
+        with self.lock:
+            samples = self.latencies.get(transport)
+            if samples is None:
+                samples = self.latencies[transport] = deque(maxlen=LATENCY_SAMPLE_SIZE)
+            samples.append(seconds)
+
+    def record_latencies(self, transport, seconds_list):
+        """一次記錄多筆延遲（寫檔執行緒整批記錄）"""
+        with self.lock:
+            samples = self.latencies.get(transport)
+            if samples is None:
+                samples = self.latencies[transport] = deque(maxlen=LATENCY_SAMPLE_SIZE)
+            samples.extend(seconds_list)
+
+    def increment(self, transport, name, count=1):
+        """累加計數器"""
+        with self.lock:
+            counters = self.counters.setdefault(transport, {})
+            counters[name] = counters.get(name, 0) + count
+
+    def record_reconnect(self, last_data_time, disconnect_time, reconnect_time):
+        """
+        記錄一次 TCP 斷線與重新連線
+
+        Args:
+            last_data_time: 舊連線最後收到資料的時間
+            disconnect_time: 伺服器關閉舊連線的時間
+            reconnect_time: 接受新連線的時間
+        """
+        with self.lock:
+            self.reconnects.append({
+                "last_data_at": round(last_data_time, 3),
+                "disconnected_at": round(disconnect_time, 3),
+                "reconnected_at": round(reconnect_time, 3),
+                "detection_ms": round((disconnect_time - last_data_time) * 1000.0, 1),
+                "reaccept_ms": round((reconnect_time - disconnect_time) * 1000.0, 1),
+                "downtime_ms": round((reconnect_time - last_data_time) * 1000.0, 1),
+            })
+
+    def reconnect_summary(self):
+        """本場次的重新連線次數與斷線總時間"""
+        with self.lock:
+            events = list(self.reconnects)
+        downtimes = [event["downtime_ms"] for event in events]
+        reaccepts = [event["reaccept_ms"] for event in events]
+        return {
+            "count": len(events),
+            "total_downtime_ms": round(sum(downtimes), 1),
+            "max_downtime_ms": max(downtimes) if downtimes else None,
+            "max_reaccept_ms": max(reaccepts) if reaccepts else None,
+            "reaccepted_under_1s": sum(1 for r in reaccepts if r < 1000.0),
+            "events": events,
+        }
+
+    def get_counter(self, transport, name):
+        with self.lock:
+            return self.counters.get(transport, {}).get(name, 0)
+
+    def latency_percentiles(self, transport, percentiles=(50, 90, 99)):
+        """取得延遲百分位數（毫秒）"""
+        with self.lock:
+            samples = np.array(self.latencies.get(transport, ()), dtype=float)
+        if len(samples) == 0:
+            return {}
+        values = np.percentile(samples, percentiles) * 1000.0
+        return {f"p{p}": round(float(v), 2) for p, v in zip(percentiles, values)}
+
+    def snapshot(self, extra=None):
+        """取得所有傳輸方式的統計摘要，extra 會併入最上層"""
+        with self.lock:
+            transports = set(self.latencies) | set(self.counters)
+            counters = {t: dict(self.counters.get(t, {})) for t in transports}
+            sizes = {t: len(self.latencies.get(t, ())) for t in transports}
+        summary = {
+            transport: {
+                "latency_ms": self.latency_percentiles(transport),
+                "latency_samples": sizes[transport],
+                "counters": counters[transport],
+            }
+            for transport in sorted(transports)
+        }
+        summary["reconnects"] = self.reconnect_summary()
+        if extra:
+            summary.update(extra)
+        return summary
+
+    def save(self, path, extra=None):
+        """寫出統計摘要 JSON"""
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(extra), f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"寫入接收統計失敗: {e}")
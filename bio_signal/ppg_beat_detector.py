@@ -0,0 +1,487 @@
+# bio_signal/ppg_beat_detector.py
+"""
+PPGRAW 即時心跳偵測
+以批次（chunk）方式向量化處理原始 PPG：
+帶通濾波（跨批次保留濾波器狀態）→ 收縮峰偵測 → 心跳間期 (IBI) 與品質標記
+
+原本設計為伺服器端的第二條心跳序列，用於與裝置回傳的 PPI / HR 交叉比對。
+
+限制：裝置的 PPGRAW 約 15.6 Hz（每秒一批 16 個樣本），在這個取樣率下此序列不適合作為交叉比對，
+只能作為參考。以 sample_data 與同場次的 bio_result_ppi 比較（--ppi）：脈搏振幅只有基線的約
+±20 counts，訊號功率集中在每批 1 秒的週期，裝置心率（PPI 約 700 ms）的頻帶只占約 5%；
+good 心跳中只有約 1/3 的間期與時間最接近的裝置 PPI 相差 15% 以內，每 10 秒的中位數心率誤差約 19%。
+調整帶通截止頻率或極性都沒有明顯改善。
+
+回歸檢查（以不同批次大小處理同一個檔案，結果必須完全相同，且心跳時間遞增、間期為正；
+指定 --ppi 時另印出與裝置 PPI 的一致程度，僅供參考，不影響結束碼）：
+
+    python -m bio_signal.ppg_beat_detector sample_data/bio_result_ppgraw.csv --ppi sample_data/bio_result_ppi.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+from collections import deque
+
+import numpy as np
+from scipy import signal as sp_signal
+
+# 品質標記
+QUALITY_GOOD = "good"          # 間期合理且與近期心跳一致
+QUALITY_ARTIFACT = "artifact"  # 間期超出生理範圍或與近期中位數差異過大
+QUALITY_GAP = "gap"            # 與前一拍之間有資料缺漏（跳過批次、時間戳中斷）
+
+# 取樣率估計：以最近 RATE_WINDOW_SECONDS 內各封包的 (樣本索引, 時間戳) 做最小平方擬合。
+# 裝置約每秒送出一批 16 個樣本、分成數個封包，單看兩個封包的時間差會有 ±1 Hz 以上的誤差
+RATE_WINDOW_SECONDS = 20.0
+RATE_MIN_SPAN = 10.0           # 時間戳至少涵蓋此長度才估計（開始時先暫存樣本）
+RATE_TOLERANCE = 0.01          # 估計值改變超過此比例才更新取樣率與濾波器
+
+
+class PPGBeat:
+    """單一偵測到的心跳"""
+    def __init__(self, beat_time, ibi_ms, quality, amplitude):
+        self.beat_time = beat_time    # 收縮峰時間（客戶端時間軸，秒）
+        self.ibi_ms = ibi_ms          # 與前一拍的間期（毫秒）
+        self.quality = quality        # QUALITY_* 其中之一
+        self.amplitude = amplitude    # 濾波後峰值振幅
+
+
+class PPGBeatDetector:
+    """
+    分批 PPG 收縮峰偵測器
+
+    輸出與批次大小無關：
+    - 開始時先暫存樣本，直到封包時間戳涵蓋 RATE_MIN_SPAN 秒，以時間戳估計的取樣率設計濾波器與
+      判定範圍；名目取樣率只用來排除不合理的估計
+    - 樣本時間由單調的樣本時鐘給定（第一個時間戳起，每個樣本前進 1 / 取樣率）；封包時間戳與時鐘
+      相差超過最長心跳間期時才重新對齊並視為資料缺漏，較小的差異（傳送抖動）不影響時鐘
+    - 取樣率在每個新封包時間戳時重新估計，改變超過 RATE_TOLERANCE 時重新設計濾波器
+    - 候選峰值在其前後各 max_ibi 秒的樣本都到齊後才判定，判定只使用這段固定範圍的資料，
+      因此心跳約延遲 max_ibi 秒輸出
+    """
+
+    def __init__(self, sample_rate=16.0, low_cut=0.5, high_cut=4.0,
+                 min_ibi=0.33, max_ibi=2.0, cpu_budget=0.05, invert=False, scale_seconds=4.0):
+        """
+        Args:
+            sample_rate: PPGRAW 名目取樣率 (Hz)；實際取樣率由時間戳估計，
+                         估計值超出名目值的 0.5 ~ 2 倍時才使用名目值
+            low_cut / high_cut: 帶通濾波截止頻率 (Hz)
+            min_ibi / max_ibi: 生理上合理的心跳間期範圍（秒），對應 180 ~ 30 bpm
+            cpu_budget: 每秒訊號可使用的 CPU 時間（秒），超出時跳過批次
+            invert: 收縮期為波谷的感測器（反射式綠光）設為 True
+            scale_seconds: 估計振幅尺度（峰值顯著度門檻）的訊號長度（秒）
+        """
+        self.nominal_rate = float(sample_rate)
+        self.low_cut = low_cut
+        self.high_cut = high_cut
+        self.min_ibi = min_ibi
+        self.max_ibi = max_ibi
+        self.cpu_budget = cpu_budget
+        self.invert = invert
+        self.scale_seconds = scale_seconds
+        self.reset()
+
+    def reset(self):
+        """清除所有跨批次狀態"""
+        self.sample_rate = None           # 取樣率估計完成前為 None
+        self._sos = None
+        self._zi = None
+        self._pending_values = np.empty(0)      # 估計取樣率前暫存的樣本
+        self._pending_timestamps = np.empty(0)
+        self._buffer = np.empty(0)        # 尚需保留的濾波後樣本
+        self._buffer_times = np.empty(0)  # 對應的樣本時間（客戶端時間軸，秒）
+        self._buffer_start = 0            # _buffer[0] 的全域樣本索引
+        self._sample_count = 0            # 已收到的樣本總數
+        self._checked_until = -1          # 已判定到的全域樣本索引
+        self._clock_time = None           # 樣本時鐘的基準時間
+        self._clock_index = 0             # 基準時間對應的全域樣本索引
+        self._last_timestamp = None       # 最近一個封包時間戳
+        self._rate_window = deque()       # (樣本索引, 時間戳) 用於估計取樣率
+        self._last_peak_index = None
+        self._last_peak_time = None
+        self._gaps = []                   # 資料缺漏處的全域樣本索引
+        self._recent_ibis = deque(maxlen=8)
+        # CPU 預算（以 token bucket 計）
+        self._cpu_credit = 0.0
+        self.cpu_seconds = 0.0
+        self.signal_seconds = 0.0
+        self.skipped_samples = 0
+        self.beat_count = 0
+        self.dropped_beats = 0            # 時間未晚於前一拍而捨棄的心跳
+        self.timestamp_jumps = 0          # 時間戳不連續而重新對齊時鐘的次數
+
+    def _design_filter(self, fs):
+        high = min(self.high_cut, 0.45 * fs)
+        self._sos = sp_signal.butter(2, [self.low_cut, high], btype="band", fs=fs, output="sos")
+
+    def _configure(self, rate):
+        """設定初始取樣率：設計濾波器並以此取樣率換算判定範圍（之後固定，不隨取樣率估計改變）"""
+        self.sample_rate = rate
+        self._design_filter(rate)
+        self._lookahead = int(self.max_ibi * rate)
+        self._scale_samples = max(int(self.scale_seconds * rate), 2)
+        self._min_distance = max(1, int(self.min_ibi * rate))
+
+    def _estimate_rate(self, indices, timestamps):
+        """以封包 (樣本索引, 時間戳) 的最小平方斜率估計取樣率；超出合理範圍時回傳 None"""
+        indices = np.asarray(indices, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        times = timestamps - timestamps.mean()
+        denom = np.dot(times, times)
+        if len(times) < 3 or denom <= 0:
+            return None
+        estimate = float(np.dot(times, indices - indices.mean()) / denom)
+        # 只接受合理範圍的估計，避免封包遺失時大幅偏移
+        if 0.5 * self.nominal_rate <= estimate <= 2.0 * self.nominal_rate:
+            return estimate
+        return None
+
+    def _warm_up(self, values, timestamps):
+        """
+        暫存樣本直到封包時間戳涵蓋 RATE_MIN_SPAN 秒，估計初始取樣率
+
+        在第一個涵蓋足夠長度的封包處決定（與批次如何切分無關），之後回傳所有暫存樣本交給一般流程；
+        尚未決定時回傳空陣列。時間戳中斷（封包間隔超過 max_ibi）時由中斷處重新累積。
+        """
+        self._pending_values = np.concatenate((self._pending_values, values))
+        self._pending_timestamps = np.concatenate((self._pending_timestamps, timestamps))
+        pending = self._pending_timestamps
+        heads = np.flatnonzero(np.concatenate(([True], pending[1:] != pending[:-1])))
+        anchor = 0
+        for position in range(1, len(heads)):
+            head_time = pending[heads[position]]
+            if head_time - pending[heads[position - 1]] > self.max_ibi:
+                anchor = position
+            elif head_time - pending[heads[anchor]] >= RATE_MIN_SPAN:
+                used = heads[anchor:position + 1]
+                rate = self._estimate_rate(used, pending[used])
+                self._configure(rate if rate is not None else self.nominal_rate)
+                values, timestamps = self._pending_values, self._pending_timestamps
+                self._pending_values, self._pending_timestamps = np.empty(0), np.empty(0)
+                return values, timestamps
+        return np.empty(0), np.empty(0)
+
+    def _update_sample_rate(self, index, timestamp):
+        """依封包時間戳估計實際取樣率（封包內樣本共用同一時間戳）；改變時重新設計濾波器"""
+        window = self._rate_window
+        window.append((index, timestamp))
+        while timestamp - window[0][1] > RATE_WINDOW_SECONDS:
+            window.popleft()
+        if timestamp - window[0][1] < RATE_MIN_SPAN:
+            return
+        indices, times = zip(*window)
+        estimate = self._estimate_rate(indices, times)
+        if estimate is not None and abs(estimate - self.sample_rate) > RATE_TOLERANCE * self.sample_rate:
+            # 時鐘基準移到取樣率改變處，之前的樣本時間不變
+            self._clock_time = self._clock_at(index)
+            self._clock_index = index
+            self.sample_rate = estimate
+            self._design_filter(estimate)
+
+    def _clock_at(self, index):
+        """樣本時鐘上第 index 個樣本的時間"""
+        return self._clock_time + (index - self._clock_index) / self.sample_rate
+
+    def _new_timestamp(self, index, timestamp):
+        """封包的第一個樣本：檢查時間戳與樣本時鐘是否連續，並更新取樣率估計"""
+        if self._clock_time is None:
+            self._clock_time, self._clock_index = timestamp, index
+        elif abs(timestamp - self._clock_at(index)) > self.max_ibi:
+            # 斷線後恢復或客戶端時鐘重設
+            self.timestamp_jumps += 1
+            self._clock_time, self._clock_index = timestamp, index
+            self._rate_window.clear()
+            self._gaps.append(index)
+        self._last_timestamp = timestamp
+        self._update_sample_rate(index, timestamp)
+
+    def mark_gap(self):
+        """通知資料中斷（斷線、佇列丟棄），跨越此處的下一拍間期標記為 gap"""
+        self._gaps.append(self._sample_count)
+
+    def process(self, values, timestamps):
+        """
+        處理一批 PPGRAW 樣本
+
+        Args:
+            values: 依時間排序的原始 PPG 數值
+            timestamps: 對應的客戶端時間戳（秒，float），與 values 等長
+
+        Returns:
+            List[PPGBeat]: 本批新確認的心跳
+        """
+        values = np.asarray(values, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        if self.sample_rate is None:
+            values, timestamps = self._warm_up(values, timestamps)
+        n = len(values)
+        if n == 0:
+            return []
+
+        chunk_seconds = n / self.sample_rate
+        self.signal_seconds += chunk_seconds
+        self._cpu_credit += chunk_seconds * self.cpu_budget
+        if self._cpu_credit < 0:
+            # 超出 CPU 預算：跳過此批，濾波器狀態保留、樣本時鐘照常前進，並標記中斷
+            self.skipped_samples += n
+            self._sample_count += n
+            self._last_timestamp = timestamps[-1]
+            self._buffer, self._buffer_times = np.empty(0), np.empty(0)
+            self._buffer_start = self._sample_count
+            self._checked_until = self._sample_count - 1
+            self.mark_gap()
+            return []
+
+        started = time.perf_counter()
+        beats = self._process_chunk(values, timestamps)
+        cost = time.perf_counter() - started
+        self.cpu_seconds += cost
+        # 信用上限為一秒訊號的預算，避免閒置後累積過多額度
+        self._cpu_credit = min(self._cpu_credit - cost, self.cpu_budget)
+        return beats
+
+    def _ingest(self, values, timestamps):
+        """
+        濾波並給定樣本時間
+
+        依封包邊界（時間戳改變處）分段：每段開頭檢查時鐘並更新取樣率，取樣率改變後的樣本
+        以新的濾波器處理，與批次如何切分無關。
+        """
+        base = self._sample_count
+        first_is_head = self._last_timestamp is None or timestamps[0] != self._last_timestamp
+        heads = np.flatnonzero(np.concatenate(([first_is_head], timestamps[1:] != timestamps[:-1])))
+        bounds = np.unique(np.concatenate(([0], heads, [len(values)])))
+        if self._zi is None:
+            # 以第一個樣本初始化濾波器穩態，避免起始暫態被誤判為峰值
+            self._zi = sp_signal.sosfilt_zi(self._sos) * values[0]
+
+        filtered = np.empty(len(values))
+        times = np.empty(len(values))
+        head_set = set(heads.tolist())
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            if begin in head_set:
+                self._new_timestamp(base + begin, timestamps[begin])
+            filtered[begin:end], self._zi = sp_signal.sosfilt(self._sos, values[begin:end], zi=self._zi)
+            times[begin:end] = self._clock_at(base + np.arange(begin, end))
+        self._sample_count += len(values)
+        return (-filtered if self.invert else filtered), times
+
+    def _process_chunk(self, values, timestamps):
+        filtered, times = self._ingest(values, timestamps)
+        self._buffer = np.concatenate((self._buffer, filtered))
+        self._buffer_times = np.concatenate((self._buffer_times, times))
+
+        window = self._buffer
+        start = self._buffer_start
+        lookahead = self._lookahead
+        limit = start + len(window) - 1 - lookahead  # 前後判定範圍都已到齊的最後索引
+        if limit <= self._checked_until:
+            return []
+
+        # 顯著度只在峰值前後 lookahead 個樣本內計算
+        peaks, props = sp_signal.find_peaks(window, prominence=0, wlen=2 * lookahead + 1)
+        global_peaks = peaks + start
+        judge = np.flatnonzero((global_peaks > self._checked_until) & (global_peaks <= limit))
+
+        # 振幅尺度：峰值前 scale_samples 至後 lookahead 個樣本的標準差
+        sums = np.concatenate(([0.0], np.cumsum(window)))
+        squares = np.concatenate(([0.0], np.cumsum(window ** 2)))
+        lower = np.maximum(peaks[judge] - self._scale_samples, 0)
+        upper = peaks[judge] + lookahead + 1
+        count = upper - lower
+        mean = (sums[upper] - sums[lower]) / count
+        scale = np.sqrt(np.maximum((squares[upper] - squares[lower]) / count - mean ** 2, 0.0))
+        gaps = np.asarray(self._gaps, dtype=np.int64)
+
+        beats = []
+        for position, threshold in zip(judge, 0.5 * scale):
+            peak, global_peak = peaks[position], global_peaks[position]
+            if props["prominences"][position] < threshold:
+                continue
+            # 判定範圍內有資料缺漏時，濾波結果不連續
+            if np.any((gaps > global_peak - lookahead) & (gaps <= global_peak + lookahead)):
+                continue
+            if self._last_peak_index is not None and global_peak - self._last_peak_index < self._min_distance:
+                continue
+            # 最短間期內之後還有更高的峰值時，由該峰值代表此次心跳
+            later = peaks[position + 1:]
+            later = later[later <= peak + self._min_distance]
+            if np.any(window[later] > window[peak]):
+                continue
+
+            # 拋物線內插取得次樣本精度的峰值位置
+            left, center, right = window[peak - 1], window[peak], window[peak + 1]
+            denom = left - 2 * center + right
+            offset = 0.5 * (left - right) / denom if denom != 0 else 0.0
+            step = (self._buffer_times[peak + 1] - self._buffer_times[peak - 1]) / 2
+            beat = self._emit_beat(global_peak, self._buffer_times[peak] + offset * step, center)
+            if beat is not None:
+                beats.append(beat)
+
+        self._checked_until = limit
+        # 保留之後判定所需的樣本：判定範圍與振幅尺度範圍，外加內插用的一個樣本
+        keep_from = self._checked_until - max(lookahead, self._scale_samples)
+        if keep_from > start:
+            self._buffer = self._buffer[keep_from - start:]
+            self._buffer_times = self._buffer_times[keep_from - start:]
+            self._buffer_start = keep_from
+        return beats
+
+    def _emit_beat(self, peak_index, peak_time, amplitude):
+        """依與前一拍的間期標記品質；時間未晚於前一拍時捨棄（不輸出非正的間期）"""
+        previous = self._last_peak_time
+        previous_index = self._last_peak_index
+        if previous is not None and peak_time <= previous:
+            self.dropped_beats += 1
+            return None
+        gap = any(previous_index is None or previous_index < g <= peak_index for g in self._gaps)
+        self._gaps = [g for g in self._gaps if g > peak_index]
+        self._last_peak_index = int(peak_index)
+        self._last_peak_time = peak_time
+        self.beat_count += 1
+        if previous is None:
+            return PPGBeat(peak_time, None, QUALITY_GAP, float(amplitude))
+
+        ibi = peak_time - previous
+        if gap:
+            quality = QUALITY_GAP
+        elif not (self.min_ibi <= ibi <= self.max_ibi):
+            quality = QUALITY_ARTIFACT
+        elif self._recent_ibis and abs(ibi - np.median(self._recent_ibis)) > 0.3 * np.median(self._recent_ibis):
+            quality = QUALITY_ARTIFACT
+        else:
+            quality = QUALITY_GOOD
+
+        if quality != QUALITY_GAP and self.min_ibi <= ibi <= self.max_ibi:
+            self._recent_ibis.append(ibi)
+        return PPGBeat(peak_time, round(ibi * 1000.0, 1), quality, float(amplitude))
+
+    def get_stats(self):
+        """取得偵測統計（CPU 使用量以每秒訊號計）"""
+        return {
+            "beats": self.beat_count,
+            "sample_rate": round(float(self.sample_rate), 2) if self.sample_rate is not None else None,
+            "signal_seconds": round(float(self.signal_seconds), 3),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "cpu_per_signal_second": float(self.cpu_seconds / self.signal_seconds) if self.signal_seconds else 0.0,
+            "cpu_budget": self.cpu_budget,
+            "skipped_samples": self.skipped_samples,
+            "dropped_beats": self.dropped_beats,
+            "timestamp_jumps": self.timestamp_jumps,
+        }
+
+
+def read_ppgraw_csv(path):
+    """讀取 bio_result_ppgraw.csv，回傳 (數值, 時間戳秒) 陣列"""
+    values, timestamps = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                values.append(float(row["Data"]))
+                timestamps.append(datetime.strptime(row["Time"], "%Y-%m-%d %H:%M:%S.%f").timestamp())
+            except (KeyError, TypeError, ValueError):
+                continue
+    return np.array(values), np.array(timestamps)
+
+
+def detect_in_batches(values, timestamps, batch_size, **kwargs):
+    """以固定批次大小處理整個序列（不限 CPU 預算）"""
+    detector = PPGBeatDetector(cpu_budget=float("inf"), **kwargs)
+    batch_size = batch_size or len(values)
+    beats = []
+    for start in range(0, len(values), batch_size):
+        beats.extend(detector.process(values[start:start + batch_size], timestamps[start:start + batch_size]))
+    return beats, detector
+
+
+def compare_with_ppi(beats, ppi_values, ppi_timestamps, tolerance=0.15, window_seconds=10.0,
+                     ppi_range_ms=(270.0, 2000.0)):
+    """
+    與裝置 PPI 比較心跳間期
+
+    裝置的 0.0（沒有偵測到心跳）與超出 ppi_range_ms 的數值不列入。
+
+    Returns:
+        dict: compared 為與裝置 PPI 相距 3 秒內的間期數，within_tolerance 為其中差異在 tolerance 以內的比例；
+              window_error 為各 window_seconds 時間窗中位數間期的相對誤差中位數，
+              windows_within_10pct 為誤差在 10% 以內的時間窗比例
+    """
+    ppi_values = np.asarray(ppi_values, dtype=float)
+    ppi_timestamps = np.asarray(ppi_timestamps, dtype=float)
+    valid = (ppi_values >= ppi_range_ms[0]) & (ppi_values <= ppi_range_ms[1])
+    ppi_values, ppi_timestamps = ppi_values[valid], ppi_timestamps[valid]
+    beat_times = np.array([beat.beat_time for beat in beats if beat.ibi_ms is not None])
+    ibis = np.array([beat.ibi_ms for beat in beats if beat.ibi_ms is not None])
+    result = {"compared": 0, "within_tolerance": None, "window_error": None, "windows_within_10pct": None}
+    if len(ppi_values) < 2 or len(ibis) == 0:
+        return result
+
+    # 時間最接近的裝置 PPI
+    nearest = np.clip(np.searchsorted(ppi_timestamps, beat_times), 1, len(ppi_timestamps) - 1)
+    earlier = np.abs(ppi_timestamps[nearest - 1] - beat_times) < np.abs(ppi_timestamps[nearest] - beat_times)
+    nearest = np.where(earlier, nearest - 1, nearest)
+    close = np.abs(ppi_timestamps[nearest] - beat_times) <= 3.0
+    reference = ppi_values[nearest[close]]
+    if close.any():
+        result["compared"] = int(close.sum())
+        result["within_tolerance"] = round(float(np.mean(np.abs(ibis[close] - reference) / reference <= tolerance)), 3)
+
+    errors = []
+    start = min(beat_times[0], ppi_timestamps[0])
+    for window_start in np.arange(start, max(beat_times[-1], ppi_timestamps[-1]), window_seconds):
+        device = ppi_values[(ppi_timestamps >= window_start) & (ppi_timestamps < window_start + window_seconds)]
+        detected = ibis[(beat_times >= window_start) & (beat_times < window_start + window_seconds)]
+        if len(device) >= 5 and len(detected) >= 5:
+            errors.append(abs(np.median(detected) - np.median(device)) / np.median(device))
+    if errors:
+        result["window_error"] = round(float(np.median(errors)), 3)
+        result["windows_within_10pct"] = round(float(np.mean(np.array(errors) <= 0.1)), 3)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPG 心跳偵測回歸檢查：結果不得隨批次大小改變")
+    parser.add_argument("path", nargs="?", default="sample_data/bio_result_ppgraw.csv")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 16, 64, 500, 0],
+                        help="批次大小（0 表示整個檔案一次處理）")
+    parser.add_argument("--ppi", help="同場次的 bio_result_ppi.csv，印出與裝置 PPI 的一致程度（僅供參考）")
+    args = parser.parse_args()
+
+    values, timestamps = read_ppgraw_csv(args.path)
+    reference = None
+    failures = 0
+    for batch_size in args.batch_sizes:
+        beats, detector = detect_in_batches(values, timestamps, batch_size)
+        summary = [(round(beat.beat_time, 6), beat.ibi_ms, beat.quality) for beat in beats]
+        times = np.array([beat.beat_time for beat in beats])
+        ibis = np.array([beat.ibi_ms for beat in beats if beat.ibi_ms is not None])
+        problems = []
+        if len(times) and (np.any(np.diff(times) <= 0) or times[0] < timestamps[0]):
+            problems.append("心跳時間未遞增或早於第一個樣本")
+        if len(ibis) and ibis.min() <= 0:
+            problems.append("間期非正")
+        if reference is None:
+            reference = summary
+        elif summary != reference:
+            problems.append("與第一個批次大小的結果不同")
+        failures += bool(problems)
+        qualities = [beat.quality for beat in beats]
+        print(f"batch={batch_size or len(values):>5}  beats={len(beats)}  "
+              f"good={qualities.count(QUALITY_GOOD)}  artifact={qualities.count(QUALITY_ARTIFACT)}  "
+              f"gap={qualities.count(QUALITY_GAP)}  "
+              f"{'；'.join(problems) if problems else 'OK'}")
+
+    if args.ppi:
+        if not os.path.exists(args.ppi):
+            print(f"找不到 PPI 檔案: {args.ppi}")
+        else:
+            ppi_values, ppi_timestamps = read_ppgraw_csv(args.ppi)
+            beats, detector = detect_in_batches(values, timestamps, 0)
+            print(f"估計取樣率 {detector.get_stats()['sample_rate']} Hz")
+            for label, subset in (("all", beats), ("good", [beat for beat in beats if beat.quality == QUALITY_GOOD])):
+                print(f"與裝置 PPI 比較 ({label}): {compare_with_ppi(subset, ppi_values, ppi_timestamps)}")
+    sys.exit(1 if failures else 0)
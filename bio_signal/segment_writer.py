@@ -0,0 +1,181 @@
+# bio_signal/segment_writer.py
+"""
+依實驗階段分段輸出
+每個訊號在 Current 標籤（set_current / EventLogger 階段切換）改變時換到新的分段檔：
+    bio_result_<訊號>_<序號>_<階段>.csv
+分段依數據點接收當下的標籤決定，延遲到達的封包仍寫入其所屬階段的檔案。
+
+bio_session_manifest.json 列出每個分段的檔名、時間範圍與筆數，
+下游分析可只讀取需要的階段，或平行處理各階段；程式中斷時只影響仍開啟的分段。
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+MANIFEST_FILE = "bio_session_manifest.json"
+MAX_OPEN_SEGMENTS = 2  # 目前階段與前一階段（延遲封包仍可能屬於前一階段）
+
+
+def segment_file_name(prefix, signal_name, index, phase):
+    """分段檔名，階段名稱中不適合當檔名的字元以底線取代"""
+    safe_phase = re.sub(r"[^\w.-]", "_", str(phase))
+    return f"{prefix}_{signal_name}_{index:02d}_{safe_phase}.csv"
+
+
+class SessionManifest:
+    """記錄一個場次所有分段的階段順序、時間範圍與筆數"""
+
+    def __init__(self, path, prefix):
+        self.path = path
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.phases = []      # 依第一次出現的順序
+        self.segments = {}    # (訊號, 階段) -> 分段資訊
+        self.closed = False
+
+    def phase_index(self, phase):
+        """階段序號（1 起算，各訊號共用，方便對齊同一階段的檔案）"""
+        with self.lock:
+            if phase not in self.phases:
+                self.phases.append(phase)
+            return self.phases.index(phase) + 1
+
+    def add_segment(self, signal_name, phase, index, file_name):
+        with self.lock:
+            self.segments[(signal_name, phase)] = {
+                "signal": signal_name,
+                "phase": phase,
+                "index": index,
+                "file": file_name,
+                "first_time": None,
+                "last_time": None,
+                "rows": 0,
+            }
+        self.save()
+
+    def record(self, signal_name, phase, timestamp):
+        """記錄一筆寫入分段的數據（時間戳為固定寬度字串，可直接比較大小）"""
+        with self.lock:
+            segment = self.segments[(signal_name, phase)]
+            if segment["first_time"] is None or timestamp < segment["first_time"]:
+                segment["first_time"] = timestamp
+            if segment["last_time"] is None or timestamp > segment["last_time"]:
+                segment["last_time"] = timestamp
+            segment["rows"] += 1
+
+    def to_dict(self):
+        with self.lock:
+            segments = sorted((dict(s) for s in self.segments.values()),
+                              key=lambda s: (s["index"], s["signal"]))
+            return {
+                "prefix": self.prefix,
+                "closed": self.closed,
+                "phases": list(self.phases),
+                "segments": segments,
+            }
+
+    def save(self):
+        save_manifest(os.path.dirname(self.path), self.to_dict())
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.save()
+
+
+class SegmentedSignalWriter:
+    """
+    單一訊號的分段輸出，與文字檔相同的 write() / flush() / close() 介面
+
+    寫入前以 select(階段, 時間戳) 指定該筆數據所屬的階段。
+    """
+
+    def __init__(self, prefix, signal_name, header, opener, manifest):
+        self.prefix = prefix
+        self.signal_name = signal_name
+        self.header = header
+        self.opener = opener          # 開檔函式（純文字或壓縮）
+        self.manifest = manifest
+        self.files = OrderedDict()    # 階段 -> 開啟中的檔案，最近使用的在最後
+        self.phase = None
+        self.file = None
+
+    def select(self, phase, timestamp):
+        if phase != self.phase:
+            self._switch(phase)
+        self.manifest.record(self.signal_name, phase, timestamp)
+
+    def _switch(self, phase):
+        self.phase = phase
+        self.file = self.files.get(phase)
+        if self.file is None:
+            index = self.manifest.phase_index(phase)
+            file_name = segment_file_name(self.prefix, self.signal_name, index, phase)
+            is_new = (self.signal_name, phase) not in self.manifest.segments
+            self.file = self.opener(os.path.join(os.path.dirname(self.manifest.path), file_name))
+            if is_new:
+                self.file.write(self.header)
+                # 壓縮輸出時實際檔名帶 .gz / .zst
+                self.manifest.add_segment(self.signal_name, phase, index, os.path.basename(self.file.name))
+            self.files[phase] = self.file
+        self.files.move_to_end(phase)
+        # 較早的階段不再接收數據，關閉以確保其已完整落地
+        while len(self.files) > MAX_OPEN_SEGMENTS:
+            _, old_file = self.files.popitem(last=False)
+            old_file.close()
+
+    def write(self, text):
+        self.file.write(text)
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+        self.file = None
+
+
+def load_manifest(session_dir):
+    """讀取場次目錄下的分段清單，不存在時回傳 None"""
+    path = os.path.join(session_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(session_dir, manifest):
+    """以暫存檔取代的方式寫出分段清單，中斷時不會留下寫一半的檔案"""
+    path = os.path.join(session_dir, MANIFEST_FILE)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"寫入分段清單失敗: {e}")
+
+
+def find_segments(session_dir, signal_name=None, phase=None):
+    """
+    依訊號與階段篩選分段檔
+
+    Returns:
+        List[dict]: 分段資訊，"path" 為完整路徑
+    """
+    manifest = load_manifest(session_dir)
+    if manifest is None:
+        return []
+    segments = []
+    for segment in manifest["segments"]:
+        if signal_name is not None and segment["signal"] != signal_name:
+            continue
+        if phase is not None and segment["phase"] != phase:
+            continue
+        segments.append(dict(segment, path=os.path.join(session_dir, segment["file"])))
+    return segments
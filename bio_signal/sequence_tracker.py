@@ -0,0 +1,183 @@
+# bio_signal/sequence_tracker.py
+"""
+斷線重連後的序號續傳與去重
+客戶端訊息可帶 "seq" 與 "device_id"，伺服器以滑動位元圖（sliding bitmap）
+判斷重複，並追蹤「已寫入」的最後連續序號，重連時回報給客戶端只補傳缺口。
+
+握手（客戶端連線後的第一行，可選）：
+  客戶端 → {"type": "hello", "device_id": "phone-01"}
+  伺服器 → {"type": "resume", "device_id": "phone-01", "last_seq": 1234}
+客戶端從 last_seq + 1 開始補傳；last_seq 為 -1 表示伺服器沒有此裝置的紀錄。
+
+客戶端未重新握手就從頭編號（例如程式重新啟動）時，序號會比已寫入的序號小超過視窗範圍，
+此時視為新的串流重新開始（記錄為 restarts），而不是把之後的訊息全部當成過舊丟棄。
+"""
+import threading
+
+WINDOW_SIZE = 4096  # 位元圖涵蓋的序號範圍
+
+
+class SequenceWindow:
+    """單一裝置的滑動位元圖"""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self.mask = (1 << window_size) - 1
+        self.highest = None    # 已收到的最大序號
+        self.bitmap = 0        # 第 i 位代表序號 highest - i 是否已收到
+        self.contiguous = -1   # 此序號（含）以前全部收到或已判定遺失
+        self.queued = -1       # 此序號（含）以前皆已放入處理佇列
+        self.durable = -1      # 此序號（含）以前皆已寫入檔案
+        # 統計
+        self.duplicates = 0
+        self.gap_opened = 0    # 跳號時缺少的序號數
+        self.gap_filled = 0    # 之後補齊的序號數
+        self.lost = 0          # 超出視窗仍未補齊的序號數
+        self.restarts = 0      # 序號重新起算的次數
+
+    def accept(self, seq):
+        """
+        判斷序號是否為新資料並記錄
+
+        Returns:
+            bool: True 表示應處理；False 表示重複或過舊
+        """
+        if self.highest is not None:
+            # 補傳從 durable + 1 開始，比它小超過視窗範圍只可能是序號重新起算
+            floor = self.durable if self.durable >= 0 else self.contiguous
+            if seq < floor - self.window_size:
+                self.restarts += 1
+                self.highest = None
+                self.queued = self.durable = -1
+        if self.highest is None:
+            # 第一筆（或新串流的第一筆）：之前的序號不在此場次範圍內
+            self.highest = seq
+            self.bitmap = 1
+            self.contiguous = seq
+            return True
+
+        if seq > self.highest:
+            new_oldest = seq - self.window_size + 1
+            if self.contiguous < new_oldest - 1:
+                # 即將掉出視窗且尚未收到的序號視為遺失
+                self.lost += self._missing_before(new_oldest)
+                self.contiguous = new_oldest - 1
+            shift = seq - self.highest
+            if shift > 1:
+                self.gap_opened += shift - 1
+            self.bitmap = ((self.bitmap << shift) | 1) & self.mask
+            self.highest = seq
+        else:
+            offset = self.highest - seq
+            if offset >= self.window_size or seq <= self.contiguous:
+                self.duplicates += 1
+                return False
+            bit = 1 << offset
+            if self.bitmap & bit:
+                self.duplicates += 1
+                return False
+            self.bitmap |= bit
+            self.gap_filled += 1
+
+        self._advance_contiguous()
+        return True
+
+    def _seen(self, seq):
+        offset = self.highest - seq
+        return 0 <= offset < self.window_size and bool(self.bitmap & (1 << offset))
+
+    def _missing_before(self, new_oldest):
+        """計算 contiguous+1 ~ new_oldest-1 之間未收到的序號數"""
+        dropped = new_oldest - 1 - self.contiguous
+        start, end = self.contiguous + 1, min(new_oldest - 1, self.highest)
+        received = 0
+        if start <= end:
+            low, high = self.highest - end, self.highest - start
+            received = bin((self.bitmap >> low) & ((1 << (high - low + 1)) - 1)).count("1")
+        return dropped - received
+
+    def _advance_contiguous(self):
+        while self.contiguous < self.highest and self._seen(self.contiguous + 1):
+            self.contiguous += 1
+
+    def mark_queued(self):
+        """訊息已放入處理佇列後呼叫"""
+        self.queued = self.contiguous
+
+    def missing(self):
+        """目前視窗內尚未補齊的序號數"""
+        if self.highest is None:
+            return 0
+        span = self.highest - self.contiguous
+        if span <= 0:
+            return 0
+        received = bin(self.bitmap & ((1 << span) - 1)).count("1")
+        return span - received
+
+    def to_dict(self):
+        return {
+            "highest": self.highest,
+            "contiguous": self.contiguous,
+            "durable": self.durable,
+            "missing": self.missing(),
+            "duplicates": self.duplicates,
+            "gap_opened": self.gap_opened,
+            "gap_filled": self.gap_filled,
+            "lost": self.lost,
+            "restarts": self.restarts,
+        }
+
+
+class SequenceTracker:
+    """所有裝置的序號狀態（跨重連保留，場次開始時重置）"""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.windows = {}
+
+    def _window(self, device_id):
+        window = self.windows.get(device_id)
+        if window is None:
+            window = self.windows[device_id] = SequenceWindow(self.window_size)
+        return window
+
+    def accept(self, device_id, seq):
+        with self.lock:
+            window = self._window(device_id)
+            restarts = window.restarts
+            accepted = window.accept(seq)
+            if window.restarts != restarts:
+                print(f"裝置 {device_id} 序號倒退至 {seq}，視為重新起算的新串流")
+            return accepted
+
+    def mark_queued(self, device_id):
+        with self.lock:
+            self._window(device_id).mark_queued()
+
+    def snapshot_queued(self):
+        """緩衝執行緒取出佇列前呼叫：回傳此刻各裝置已入佇列的序號"""
+        with self.lock:
+            return {device_id: window.queued for device_id, window in self.windows.items()}
+
+    def mark_durable(self, queued_snapshot):
+        """該批資料寫入並 flush 後呼叫"""
+        with self.lock:
+            for device_id, seq in queued_snapshot.items():
+                window = self.windows.get(device_id)
+                # 重新起算前取的快照可能大於新串流的序號，不可採用
+                if window is not None and window.durable < seq <= window.highest:
+                    window.durable = seq
+
+    def last_durable(self, device_id):
+        with self.lock:
+            window = self.windows.get(device_id)
+            return window.durable if window is not None else -1
+
+    def get_stats(self):
+        with self.lock:
+            return {device_id: window.to_dict() for device_id, window in self.windows.items()}
@@ -0,0 +1,282 @@
+# bio_signal/signal_quality.py
+"""
+逐訊號品質與資料時效監控
+每個樣本以 O(1) 更新：實際取樣率 vs 預期取樣率、平線（數值卡住）、
+飽和（卡在上下限）、時間戳缺口、缺少心跳（dropout），以及多久沒收到資料（stale）。
+品質不佳的區段會寫入場次目錄下的 bio_quality_log.csv，供事後排除（bio_analysis.quality）。
+區段起訖換算到客戶端時間軸，格式與 bio_result_*.csv 的 Time 欄相同（本地時間 "YYYY-mm-dd HH:MM:SS.fff"）；
+訊號沒有客戶端時間戳時與訊號檔一樣以伺服器接收時間記錄。
+"""
+import csv
+import datetime
+import os
+import threading
+
+from .clock import SystemClock
+
+# 狀態代碼（依嚴重程度排序，同時成立時回報最嚴重者）
+STATUS_OK = "ok"
+STATUS_NO_DATA = "no_data"
+STATUS_STALE = "stale"
+STATUS_SATURATED = "saturated"
+STATUS_FLATLINE = "flatline"
+STATUS_DROPOUT = "dropout"
+STATUS_GAP = "gap"
+STATUS_LOW_RATE = "low_rate"
+
+# 預期取樣率 (Hz)，依 sample_data 實測
+EXPECTED_RATES = {
+    "GSR": 14.0,
+    "HR": 1.0,
+    "SKT": 7.0,
+    "PPGRAW": 15.0,
+    "PPI": 1.0,
+    "ACT": 1.0,
+    "IMUX": 1.5,
+    "IMUY": 1.5,
+    "IMUZ": 1.5,
+}
+
+# 數值卡住多久視為平線（秒）；None 表示此訊號本來就可能長時間不變（HR、SKT、ACT）
+FLATLINE_SECONDS = {
+    "GSR": 5.0,
+    "PPGRAW": 3.0,
+    "PPI": None,
+    "HR": None,
+    "SKT": None,
+    "ACT": None,
+    "IMUX": 30.0,
+    "IMUY": 30.0,
+    "IMUZ": 30.0,
+}
+
+# 感測器輸出上下限，到達即視為飽和
+SATURATION_LIMITS = {
+    "GSR": (0.0, 16777215.0),   # 24-bit ADC
+    "PPGRAW": (0.0, 65535.0),   # 16-bit ADC
+    "SKT": (20.0, 42.0),
+    "HR": (30.0, 220.0),
+    "PPI": (270.0, 2000.0),
+}
+
+# 裝置表示「沒有偵測到心跳」的數值：不是量測值，不計入平線與飽和，只計為缺少的心跳
+MISSING_VALUES = {
+    "PPI": 0.0,
+}
+
+RATE_WINDOW_SECONDS = 5.0     # 取樣率統計視窗
+LOW_RATE_RATIO = 0.5          # 實際取樣率低於預期的比例即視為 low_rate
+STALE_SECONDS = 3.0           # 多久沒收到資料視為 stale
+SATURATION_HOLD_SECONDS = 1.0 # 持續卡在上下限多久才視為飽和
+DROPOUT_SECONDS = 10.0        # 連續沒有心跳多久視為 dropout（sample_data 中裝置短暫漏拍約 7~8 秒）
+
+
+def format_timestamp(seconds):
+    """unix 秒數轉為訊號檔 Time 欄的本地時間字串"""
+    dt = datetime.datetime.fromtimestamp(seconds)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt.microsecond // 1000:03d}"
+
+
+class SignalQualityState:
+    """單一訊號的增量品質狀態"""
+
+    def __init__(self, signal_type):
+        self.signal_type = signal_type
+        self.expected_rate = EXPECTED_RATES.get(signal_type, 1.0)
+        self.flatline_seconds = FLATLINE_SECONDS.get(signal_type)
+        self.limits = SATURATION_LIMITS.get(signal_type)
+        self.missing_value = MISSING_VALUES.get(signal_type)
+        # 批次時間戳間隔約 1 秒，缺口門檻至少 2 秒
+        self.gap_seconds = max(2.0, 5.0 / self.expected_rate)
+
+        self.total_samples = 0
+        self.last_receive_time = None
+        self.last_client_time = None
+        self.client_offset = None    # 最近一個樣本的 客戶端時間 - 接收時間（換算區段時間用）
+        self.window_start = None
+        self.window_count = 0
+        self.observed_rate = None
+
+        self.last_value = None
+        self.flat_since = None
+        self.saturated_since = None
+        self.gap_until = None        # 缺口狀態持續到此時間（接收端時間）
+        self.missing_since = None    # 連續缺少心跳的起點
+        self.missing_samples = 0
+
+        self.status = STATUS_NO_DATA
+        self.status_since = None
+        self.status_since_client = None  # status_since 換算到客戶端時間軸
+
+    def client_time_at(self, receive_time):
+        """接收時間換算為客戶端時間軸（沒有客戶端時間戳時即為接收時間）"""
+        return receive_time + (self.client_offset or 0.0)
+
+    def onset(self, status, now):
+        """狀態實際開始的時間：平線、飽和、dropout 在持續一段時間後才判定，區段由條件成立時起算"""
+        since = {
+            STATUS_FLATLINE: self.flat_since,
+            STATUS_SATURATED: self.saturated_since,
+            STATUS_DROPOUT: self.missing_since,
+        }.get(status)
+        return since if since is not None else now
+
+    def update(self, value, client_time, receive_time):
+        """以單一樣本更新狀態"""
+        self.total_samples += 1
+
+        # 取樣率：固定視窗計數
+        if self.window_start is None:
+            self.window_start = receive_time
+        self.window_count += 1
+        elapsed = receive_time - self.window_start
+        if elapsed >= RATE_WINDOW_SECONDS:
+            self.observed_rate = self.window_count / elapsed
+            self.window_start = receive_time
+            self.window_count = 0
+
+        # 時間戳缺口（客戶端時間軸）
+        if client_time is not None:
+            self.client_offset = client_time - receive_time
+            if self.last_client_time is not None and client_time - self.last_client_time > self.gap_seconds:
+                self.gap_until = receive_time + RATE_WINDOW_SECONDS
+            if self.last_client_time is None or client_time > self.last_client_time:
+                self.last_client_time = client_time
+
+        self.last_receive_time = receive_time
+
+        # 缺少心跳：不是量測值，不更新平線與飽和狀態
+        if self.missing_value is not None and value == self.missing_value:
+            self.missing_samples += 1
+            if self.missing_since is None:
+                self.missing_since = receive_time
+            return
+        self.missing_since = None
+
+        # 平線：連續相同數值的起點
+        if value != self.last_value:
+            self.flat_since = receive_time
+            self.last_value = value
+
+        # 飽和：到達上下限的起點
+        if self.limits and (value <= self.limits[0] or value >= self.limits[1]):
+            if self.saturated_since is None:
+                self.saturated_since = receive_time
+        else:
+            self.saturated_since = None
+
+    def evaluate(self, now):
+        """依目前時間判斷狀態"""
+        if self.last_receive_time is None:
+            return STATUS_NO_DATA
+        if now - self.last_receive_time > STALE_SECONDS:
+            return STATUS_STALE
+        if self.saturated_since is not None and now - self.saturated_since >= SATURATION_HOLD_SECONDS:
+            return STATUS_SATURATED
+        if (self.flatline_seconds is not None and self.flat_since is not None
+                and now - self.flat_since >= self.flatline_seconds):
+            return STATUS_FLATLINE
+        if self.missing_since is not None and now - self.missing_since >= DROPOUT_SECONDS:
+            return STATUS_DROPOUT
+        if self.gap_until is not None and now < self.gap_until:
+            return STATUS_GAP
+        if self.observed_rate is not None and self.observed_rate < LOW_RATE_RATIO * self.expected_rate:
+            return STATUS_LOW_RATE
+        return STATUS_OK
+
+    def to_dict(self, now):
+        return {
+            "status": self.status,
+            "rate": round(self.observed_rate, 2) if self.observed_rate is not None else None,
+            "expected_rate": self.expected_rate,
+            "age": round(now - self.last_receive_time, 3) if self.last_receive_time is not None else None,
+            "samples": self.total_samples,
+            "missing": self.missing_samples,
+        }
+
+
+class SignalQualityMonitor:
+    """所有訊號的品質監控器"""
+
+    def __init__(self, signal_types, log_path=None, clock=None):
+        """
+        Args:
+            signal_types: 要監控的訊號類型
+            log_path: 品質區段紀錄 CSV 路徑，None 則不寫檔
+            clock: 未指定時間時所用的時鐘（SystemClock / VirtualClock），預設實際時間
+        """
+        self.clock = clock or SystemClock()
+        self.states = {signal_type: SignalQualityState(signal_type) for signal_type in signal_types}
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        if log_path:
+            write_header = not os.path.exists(log_path)
+            with open(log_path, "a", newline="", encoding="utf-8") as f:
+                if write_header:
+                    csv.writer(f).writerow(["signal", "status", "start", "end", "duration"])
+
+    def update(self, signal_type, value, client_time=None, receive_time=None):
+        """更新單一樣本（O(1)）"""
+        state = self.states.get(signal_type)
+        if state is None:
+            return
+        if receive_time is None:
+            receive_time = self.clock.time()
+        with self.lock:
+            state.update(value, client_time, receive_time)
+            self._transition(state, state.evaluate(receive_time), receive_time)
+
+    def check(self, now=None):
+        """定期呼叫以偵測無資料造成的狀態變化（stale、平線到期）"""
+        if now is None:
+            now = self.clock.time()
+        with self.lock:
+            for state in self.states.values():
+                self._transition(state, state.evaluate(now), now)
+
+    def _transition(self, state, new_status, now):
+        if new_status == state.status:
+            return
+        if state.status not in (STATUS_OK, STATUS_NO_DATA) and state.status_since is not None:
+            self._log_segment(state, now)
+        state.status = new_status
+        state.status_since = state.onset(new_status, now)
+        state.status_since_client = state.client_time_at(state.status_since)
+
+    def _log_segment(self, state, end):
+        """寫出 state 目前狀態從 status_since 到 end（接收時間）的區段"""
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow([
+                    state.signal_type, state.status,
+                    format_timestamp(state.status_since_client), format_timestamp(state.client_time_at(end)),
+                    f"{end - state.status_since:.3f}",
+                ])
+        except OSError as e:
+            print(f"寫入品質紀錄失敗: {e}")
+
+    def get_status(self, now=None):
+        """取得每個訊號的精簡狀態"""
+        if now is None:
+            now = self.clock.time()
+        self.check(now)
+        with self.lock:
+            return {signal_type: state.to_dict(now) for signal_type, state in self.states.items()}
+
+    def is_ready(self, signal_types, now=None):
+        """指定訊號是否皆為 ok"""
+        status = self.get_status(now)
+        return all(status.get(signal_type, {}).get("status") == STATUS_OK for signal_type in signal_types)
+
+    def close(self, now=None):
+        """結束監控，寫出仍在進行中的不良區段"""
+        if now is None:
+            now = self.clock.time()
+        with self.lock:
+            for state in self.states.values():
+                if state.status not in (STATUS_OK, STATUS_NO_DATA) and state.status_since is not None:
+                    self._log_segment(state, now)
+                    state.status_since = now
+                    state.status_since_client = state.client_time_at(now)
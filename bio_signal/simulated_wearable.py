@@ -0,0 +1,108 @@
+# bio_signal/simulated_wearable.py
+"""
+模擬穿戴裝置（手機 APP）
+以 TCP 連到接收伺服器，依各訊號取樣率 × 倍速持續送出與手機相同格式的 JSON 行，
+供 headless_harness.py 與 soak_test.py 使用。
+"""
+import json
+import math
+import socket
+import threading
+import time
+from datetime import datetime
+
+# 模擬穿戴裝置的訊號取樣率 (Hz)，依 sample_data 實測
+WEARABLE_RATES = {
+    "GSR": 14.0,
+    "HR": 1.0,
+    "SKT": 7.0,
+    "PPGRAW": 15.0,
+    "PPI": 1.0,
+    "ACT": 1.0,
+    "IMUX": 1.5,
+    "IMUY": 1.5,
+    "IMUZ": 1.5,
+}
+
+
+def format_timestamp(t):
+    dt = datetime.fromtimestamp(t)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt.microsecond // 1000:03d}"
+
+
+class SimulatedWearable:
+    """模擬手機 APP：連到接收伺服器，依取樣率 × 倍速持續送出 JSON 行"""
+
+    def __init__(self, host, port, speed=1.0, tick=0.02):
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.tick = tick
+        self.running = False
+        self.thread = None
+        self.messages_sent = 0
+        self.samples_sent = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def _connect(self):
+        while self.running:
+            try:
+                return socket.create_connection((self.host, self.port), timeout=1.0)
+            except OSError:
+                time.sleep(0.1)
+        return None
+
+    def _value(self, signal_type, n):
+        if signal_type == "PPGRAW":
+            return round(59000 + 300 * math.sin(2 * math.pi * 1.2 * n / WEARABLE_RATES["PPGRAW"]), 1)
+        if signal_type == "GSR":
+            return 262000.0 + (n % 50)
+        if signal_type == "HR":
+            return 72
+        if signal_type == "SKT":
+            return 33.1
+        if signal_type == "PPI":
+            return 833
+        if signal_type == "ACT":
+            return 0
+        return round(0.01 * math.sin(n), 4)
+
+    def _run(self):
+        conn = self._connect()
+        if conn is None:
+            return
+        counts = {signal_type: 0 for signal_type in WEARABLE_RATES}
+        start = time.time()
+        try:
+            while self.running:
+                now = time.time()
+                elapsed = now - start
+                message = {}
+                for signal_type, rate in WEARABLE_RATES.items():
+                    due = int(elapsed * rate * self.speed)
+                    while counts[signal_type] < due:
+                        # 同一則訊息每種訊號只放一個樣本，其餘留到下一則
+                        if signal_type in message:
+                            break
+                        message[signal_type] = self._value(signal_type, counts[signal_type])
+                        message[f"{signal_type}_Timestamp"] = format_timestamp(now)
+                        counts[signal_type] += 1
+                if message:
+                    conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+                    self.messages_sent += 1
+                    self.samples_sent += len(message) // 2
+                else:
+                    time.sleep(self.tick)
+        except OSError as e:
+            print(f"[模擬裝置] 連線中斷: {e}")
+        finally:
+            conn.close()
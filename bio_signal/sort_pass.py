@@ -0,0 +1,218 @@
+# bio_signal/sort_pass.py
+"""
+場次結束時的排序檢查
+300ms 重排視窗之後才到達的封包仍會被附加在檔尾，造成檔案局部亂序。
+關檔後逐檔串流檢查 Time 欄是否遞增；亂序的檔案以外部合併排序
+（分批排序寫成暫存 run，再以 heapq.merge 合併）重寫，記憶體用量固定，
+最後以 os.replace 原子取代原檔。
+
+結果記錄在 bio_session_manifest.json 各檔的 "sorted" 欄位，
+讀取端看到 sorted 為 true 即可省略排序、直接以二分搜尋定位時間範圍。
+"""
+import heapq
+import os
+import tempfile
+import time
+
+from .compressed_sink import iter_signal_lines, codec_for_path, compress_frame, resolve_signal_path, FRAME_BYTES
+from .segment_writer import load_manifest, save_manifest
+
+RUN_ROWS = 200000  # 每個排序 run 的列數（約 10MB 記憶體）
+
+
+def _row_time(line):
+    """Time 欄為固定寬度字串（YYYY-mm-dd HH:MM:SS.fff），直接比較即為時間順序"""
+    return line.split(",", 1)[0]
+
+
+def check_sorted(path):
+    """
+    單次串流檢查檔案是否依時間排序
+
+    Returns:
+        dict: {"sorted", "rows", "first_time", "last_time", "inversions"}
+    """
+    rows = 0
+    inversions = 0
+    first_time = last_time = previous = None
+    lines = iter_signal_lines(path)
+    next(lines, None)  # 標題列
+    for line in lines:
+        row_time = _row_time(line)
+        if previous is not None and row_time < previous:
+            inversions += 1
+        else:
+            previous = row_time
+        if first_time is None or row_time < first_time:
+            first_time = row_time
+        if last_time is None or row_time > last_time:
+            last_time = row_time
+        rows += 1
+    return {
+        "sorted": inversions == 0,
+        "rows": rows,
+        "first_time": first_time,
+        "last_time": last_time,
+        "inversions": inversions,
+    }
+
+
+def _write_run(rows, directory):
+    """排序一批資料列並寫成暫存 run（穩定排序，同時間戳保持原順序）"""
+    rows.sort(key=_row_time)
+    fd, run_path = tempfile.mkstemp(prefix=".sort_run_", suffix=".csv", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        f.writelines(rows)
+    return run_path
+
+
+def _iter_run(run_path):
+    with open(run_path, encoding="utf-8", newline="") as f:
+        yield from f
+
+
+class _OutputFile:
+    """重寫用的輸出檔，壓縮檔同樣以獨立區塊寫出，維持串流讀取與中斷容錯"""
+
+    def __init__(self, path, codec):
+        self.codec = codec
+        self.file = open(path, "wb") if codec else open(path, "w", encoding="utf-8", newline="")
+        self.pending = []
+        self.pending_size = 0
+
+    def write(self, text):
+        if self.codec is None:
+            self.file.write(text)
+            return
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= FRAME_BYTES:
+            self._emit()
+
+    def _emit(self):
+        if self.pending:
+            self.file.write(compress_frame(self.codec, "".join(self.pending).encode("utf-8")))
+            self.pending = []
+            self.pending_size = 0
+
+    def close(self):
+        if self.codec:
+            self._emit()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def external_sort(path, run_rows=RUN_ROWS):
+    """
+    以固定記憶體的外部合併排序重寫檔案（保留標題列與壓縮格式），原子取代原檔
+
+    Returns:
+        int: 產生的 run 數
+    """
+    directory = os.path.dirname(path) or "."
+    run_paths = []
+    temp_path = None
+    try:
+        lines = iter_signal_lines(path)
+        header = next(lines, "")
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= run_rows:
+                run_paths.append(_write_run(batch, directory))
+                batch = []
+        if batch:
+            run_paths.append(_write_run(batch, directory))
+
+        fd, temp_path = tempfile.mkstemp(prefix=".sorting_", dir=directory)
+        os.close(fd)
+        output = _OutputFile(temp_path, codec_for_path(path))
+        output.write(header)
+        # heapq.merge 在同時間戳時依 run 順序輸出，維持原本的相對順序
+        for line in heapq.merge(*(_iter_run(p) for p in run_paths), key=_row_time):
+            output.write(line)
+        output.close()
+        os.replace(temp_path, path)
+        temp_path = None
+        return len(run_paths)
+    finally:
+        for run_path in run_paths:
+            os.remove(run_path)
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def ensure_sorted(path, run_rows=RUN_ROWS):
+    """
+    檢查並在必要時重寫為排序後的檔案
+
+    Returns:
+        dict: check_sorted 的結果，加上 "rewritten" 與 "runs"
+    """
+    result = check_sorted(path)
+    result["rewritten"] = False
+    result["runs"] = 0
+    if not result["sorted"]:
+        result["runs"] = external_sort(path, run_rows)
+        result["rewritten"] = True
+        result["sorted"] = True
+    return result
+
+
+def sort_session_files(session_dir, prefix, signal_names, run_rows=RUN_ROWS):
+    """
+    場次關閉時的排序步驟：檢查（必要時重寫）所有訊號檔並更新 bio_session_manifest.json
+
+    分段輸出時依清單逐段處理；未分段時以每個訊號的整場檔案建立清單。
+
+    Args:
+        session_dir: 場次目錄
+        prefix: 檔名前綴（bio_result）
+        signal_names: 未分段時要處理的訊號名稱（小寫，如 "gsr"）
+
+    Returns:
+        dict: 清單內容
+    """
+    start = time.time()
+    manifest = load_manifest(session_dir)
+    if manifest is None:
+        manifest = {"prefix": prefix, "closed": True, "phases": [], "segments": []}
+        for name in signal_names:
+            path = resolve_signal_path(os.path.join(session_dir, f"{prefix}_{name}.csv"))
+            if path is not None:
+                manifest["segments"].append({
+                    "signal": name, "phase": None, "index": 0, "file": os.path.basename(path)})
+
+    rewritten = 0
+    for segment in manifest["segments"]:
+        path = os.path.join(session_dir, segment["file"])
+        if not os.path.exists(path):
+            segment["sorted"] = False
+            continue
+        try:
+            result = ensure_sorted(path, run_rows)
+        except (OSError, ValueError) as e:
+            print(f"排序檢查失敗 {segment['file']}: {e}")
+            segment["sorted"] = False
+            continue
+        segment.update({
+            "sorted": result["sorted"],
+            "rows": result["rows"],
+            "first_time": result["first_time"],
+            "last_time": result["last_time"],
+            "inversions": result["inversions"],
+        })
+        if result["rewritten"]:
+            rewritten += 1
+
+    manifest["sorted"] = all(segment.get("sorted") for segment in manifest["segments"])
+    manifest["sort_pass"] = {
+        "files": len(manifest["segments"]),
+        "rewritten": rewritten,
+        "seconds": round(time.time() - start, 3),
+    }
+    save_manifest(session_dir, manifest)
+    print(f"[排序檢查] {len(manifest['segments'])} 個檔案，重寫 {rewritten} 個，"
+          f"耗時 {manifest['sort_pass']['seconds']} 秒")
+    return manifest
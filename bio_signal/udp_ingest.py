@@ -0,0 +1,198 @@
+# bio_signal/udp_ingest.py
+"""
+UDP 資料接收（高頻 PPGRAW / IMU 用）
+避免 TCP 在實驗室 Wi-Fi 上的 head-of-line blocking。
+
+每個 datagram 為一個 JSON 物件：
+{
+  "seq": 123,                # 每個裝置遞增的序號
+  "device_id": "phone-01",   # 可省略，省略時以來源位址區分
+  "samples": [ {...}, ... ]  # 與 TCP 逐行 JSON 相同格式的訊息
+}
+
+伺服器依序號重新排序，短暫等待遲到的 datagram，逾時即記為遺失；
+排序後的訊息交給與 TCP 相同的處理函式。序號倒退超過 REORDER_WINDOW（裝置重新開機後
+序號重新起算）時視為新的串流，重設排序緩衝並記錄為 restarts。
+
+等待與逾時判斷取自傳入的時鐘，換成 VirtualClock 時可直接呼叫 receive_datagram / flush
+在模擬時間上重現排序、逾時與重新啟動的判斷。
+"""
+import json
+import socket
+import threading
+
+from .clock import SystemClock
+
+REORDER_WINDOW = 64        # 最多暫存的亂序 datagram 數
+REORDER_TIMEOUT = 0.2      # 等待遺漏序號的最長時間（秒）
+
+
+class UDPReorderBuffer:
+    """單一裝置的序號重排緩衝"""
+
+    def __init__(self, deliver, metrics=None, name=None):
+        """
+        Args:
+            deliver: 依序交付 datagram 的回呼 deliver(payload)
+            metrics: IngestMetrics，可選
+            name: 裝置名稱（記錄訊息用）
+        """
+        self.deliver = deliver
+        self.metrics = metrics
+        self.name = name
+        self.expected_seq = None
+        self.highest_seq = None
+        self.pending = {}          # seq -> (到達時間, payload)
+
+    def _count(self, name, count=1):
+        if self.metrics is not None:
+            self.metrics.increment("udp", name, count)
+
+    def push(self, seq, payload, now):
+        """放入一個 datagram"""
+        if self.expected_seq is None:
+            self.expected_seq = seq
+        elif seq < self.expected_seq - REORDER_WINDOW:
+            self._restart(seq)
+        if seq < self.expected_seq or seq in self.pending:
+            # 已交付或已判定遺失的序號
+            self._count("duplicates_or_late")
+            return
+        if self.highest_seq is not None and seq < self.highest_seq:
+            # 比已收到的最大序號還小：亂序到達
+            self._count("reordered")
+        else:
+            self.highest_seq = seq
+        self.pending[seq] = (now, payload)
+        self._drain()
+        if len(self.pending) > REORDER_WINDOW:
+            self._skip_to(min(self.pending))
+
+    def flush_expired(self, now):
+        """等待逾時：放棄遺漏的序號，繼續交付後續 datagram"""
+        while self.pending:
+            oldest = min(self.pending)
+            if now - self.pending[oldest][0] < REORDER_TIMEOUT:
+                break
+            self._skip_to(oldest)
+
+    def _restart(self, seq):
+        """序號大幅倒退：交付舊串流暫存的 datagram 後，從新序號重新開始"""
+        print(f"UDP 裝置 {self.name or ''} 序號由 {self.expected_seq} 倒退至 {seq}，視為重新啟動的新串流")
+        self._count("restarts")
+        while self.pending:
+            self._skip_to(min(self.pending))
+        self.expected_seq = seq
+        self.highest_seq = None
+
+    def _skip_to(self, seq):
+        self._count("lost", seq - self.expected_seq)
+        self.expected_seq = seq
+        self._drain()
+
+    def _drain(self):
+        while self.expected_seq in self.pending:
+            _, payload = self.pending.pop(self.expected_seq)
+            self.expected_seq += 1
+            self.deliver(payload)
+
+
+class UDPIngestServer:
+    """UDP 接收伺服器"""
+
+    def __init__(self, handle_message, metrics=None, host="0.0.0.0", port=10000, clock=None):
+        """
+        Args:
+            handle_message: 單一訊息處理函式 handle_message(parsed_data, transport)
+            metrics: IngestMetrics，可選
+            host / port: 綁定位址
+            clock: 逾時判斷所用的時鐘（SystemClock / VirtualClock），預設實際時間
+        """
+        self.handle_message = handle_message
+        self.metrics = metrics
+        self.clock = clock or SystemClock()
+        self.host = host
+        self.port = port
+        self.buffers = {}
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def _deliver(self, payload):
+        for message in payload.get("samples", []):
+            if not isinstance(message, dict):
+                continue
+            try:
+                self.handle_message(message, "udp")
+            except Exception as e:
+                print(f"UDP 訊息處理錯誤: {e}")
+
+    def receive_datagram(self, data, addr, now=None):
+        """解析單一 datagram 並放入對應裝置的排序緩衝"""
+        if now is None:
+            now = self.clock.time()
+        try:
+            payload = json.loads(data.decode("utf-8"))
+            if not isinstance(payload, dict):
+                raise TypeError("datagram 必須為 JSON 物件")
+            seq = int(payload["seq"])
+        except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+            print(f"無效的 UDP datagram 來自 {addr}，略過")
+            if self.metrics is not None:
+                self.metrics.increment("udp", "invalid")
+            return
+        if self.metrics is not None:
+            self.metrics.increment("udp", "datagrams")
+        device_key = payload.get("device_id") or f"{addr[0]}:{addr[1]}"
+        buffer = self.buffers.get(device_key)
+        if buffer is None:
+            buffer = self.buffers[device_key] = UDPReorderBuffer(self._deliver, self.metrics, device_key)
+            print(f"UDP 客戶端: {device_key}")
+        buffer.push(seq, payload, now)
+
+    def flush(self, now=None):
+        """放棄等待逾時的遺漏序號"""
+        if now is None:
+            now = self.clock.time()
+        for buffer in self.buffers.values():
+            buffer.flush_expired(now)
+
+    def _run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((self.host, self.port))
+        except OSError as e:
+            print(f"UDP 接收埠綁定失敗 {self.host}:{self.port}: {e}")
+            sock.close()
+            return
+        sock.settimeout(REORDER_TIMEOUT / 2)
+        print(f"UDP 接收伺服器監聽於 {self.host}:{self.port}...")
+
+        try:
+            while self.running:
+                try:
+                    data, addr = sock.recvfrom(65535)
+                except socket.timeout:
+                    data = None
+                now = self.clock.time()
+
+                if data:
+                    self.receive_datagram(data, addr, now)
+                self.flush(now)
+        except Exception as e:
+            print(f"UDP 接收錯誤: {e}")
+        finally:
+            sock.close()
+            print("UDP 接收伺服器已關閉")
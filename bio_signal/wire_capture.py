@@ -0,0 +1,129 @@
+# bio_signal/wire_capture.py
+"""
+TCP 原始資料擷取與重播
+將每次 recv 收到的位元組原封不動附加到場次目錄下的 bio_wire_capture.bin，
+事後可逐位元組重播，重現解析、排序與效能問題。
+
+檔案格式（little-endian）：
+  檔頭  b"BIOWIRE1"
+  紀錄  kind (uint8) | 單調時鐘秒數 (float64) | 長度 (uint32) | 內容
+kind：
+  0 session     內容為 JSON {"wall_time", "monotonic"}，換算牆上時間用
+  1 connect     內容為客戶端位址 "ip:port"
+  2 data        recv 取得的原始位元組
+  3 disconnect  內容為空
+"""
+import json
+import os
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"BIOWIRE1"
+RECORD_HEADER = struct.Struct("<BdI")
+
+KIND_SESSION = 0
+KIND_CONNECT = 1
+KIND_DATA = 2
+KIND_DISCONNECT = 3
+
+WRITE_BUFFER_SIZE = 256 * 1024
+
+WireRecord = namedtuple("WireRecord", ["kind", "monotonic", "data"])
+
+
+class WireCaptureWriter:
+    """附加寫入的擷取檔（僅由 TCP 接收執行緒呼叫）"""
+
+    def __init__(self, path):
+        self.path = path
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab", buffering=WRITE_BUFFER_SIZE)
+        if is_new:
+            self.file.write(MAGIC)
+        self.bytes_written = 0
+        self._write(KIND_SESSION, json.dumps({
+            "wall_time": time.time(),
+            "monotonic": time.monotonic(),
+        }).encode("utf-8"))
+
+    def _write(self, kind, data):
+        # 檔頭與內容合併為一次緩衝寫入
+        self.file.write(RECORD_HEADER.pack(kind, time.monotonic(), len(data)) + data)
+        self.bytes_written += RECORD_HEADER.size + len(data)
+
+    def write_data(self, data):
+        self._write(KIND_DATA, data)
+
+    def write_connect(self, addr):
+        self._write(KIND_CONNECT, f"{addr[0]}:{addr[1]}".encode("utf-8"))
+
+    def write_disconnect(self):
+        self._write(KIND_DISCONNECT, b"")
+        # 斷線時才落地，平時交給緩衝
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_capture(path):
+    """
+    依序讀出擷取檔中的紀錄；檔尾不完整的紀錄（程式中斷）會被略過
+
+    Yields:
+        WireRecord
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是有效的擷取檔: {path}")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            kind, monotonic, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield WireRecord(kind, monotonic, data)
+
+
+class WireCapturePlayer:
+    """依擷取順序重播連線與資料"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def play(self, on_connect, on_data, on_disconnect, speed=None, sleep=time.sleep):
+        """
+        重播擷取檔
+
+        Args:
+            on_connect: on_connect(addr_str, monotonic)
+            on_data: on_data(data, monotonic)
+            on_disconnect: on_disconnect(monotonic)
+            speed: None 表示不等待、盡快重播；1.0 為原速，2.0 為兩倍速
+            sleep: 等待函式（可替換為虛擬時鐘）
+
+        Returns:
+            dict: 重播的紀錄與位元組數
+        """
+        stats = {"connections": 0, "chunks": 0, "bytes": 0}
+        previous = None
+        for record in read_capture(self.path):
+            if speed and previous is not None and record.monotonic > previous:
+                sleep((record.monotonic - previous) / speed)
+            previous = record.monotonic
+
+            if record.kind == KIND_CONNECT:
+                stats["connections"] += 1
+                on_connect(record.data.decode("utf-8"), record.monotonic)
+            elif record.kind == KIND_DATA:
+                stats["chunks"] += 1
+                stats["bytes"] += len(record.data)
+                on_data(record.data, record.monotonic)
+            elif record.kind == KIND_DISCONNECT:
+                on_disconnect(record.monotonic)
+        return stats
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# headless_harness.py
+"""
+無頭加速端對端測試 - 不需要螢幕即可跑完整個實驗流程
+
+流程：Baseline → 音樂1 → 問卷1 → 間隔1 → 音樂2 → 問卷2 → 間隔2 → 完成
+
+- 使用 Qt offscreen 平台，不開視窗
+- 各頁面的倒數刻度縮短為 1000/speed 毫秒（預設 100 倍速），階段長度仍為 ExperimentConfig 設定
+- 問卷依腳本自動作答
+- 音檔為暫存目錄中的靜音 wav
+- 模擬穿戴裝置以 TCP 連到真正的接收伺服器，依各訊號取樣率 × speed 串流
+- 結束後回報：總耗時、接收延遲、event_log 與生理訊號標籤的對齊誤差、記憶體用量
+
+用法：
+    python headless_harness.py                 # 100 倍速跑一次
+    python headless_harness.py --speed 50 --port 18000 --keep
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
+
+from ui.NewExperimentWindowWithBio import NewExperimentWindowWithBio, ExperimentConfig
+from ui.BaselinePage import BaselinePage
+from ui.MusicPageWithTimer import MusicPageWithTimer
+from ui.IntervalPage import IntervalPage
+from ui.InstructionPage import InstructionPage
+from ui.ARMO_EQ_ui import SimpleQuestionnairePage
+from bio_signal import bioDataUtils
+from bio_signal.simulated_wearable import SimulatedWearable
+from bio_signal.ingest_metrics import process_stats
+from bio_signal.compressed_sink import open_signal_file, resolve_signal_path
+
+PHASES = ["baseline", "music1", "questionnaire1", "interval1",
+          "music2", "questionnaire2", "interval2"]
+
+
+def parse_timestamp(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S.%f").timestamp()
+
+
+def write_silent_wav(path, seconds=1.0, sample_rate=8000):
+    """建立靜音 wav（音樂頁只需要檔案存在並可播放）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+
+class ExperimentDriver:
+    """以 QTimer 輪詢目前頁面，代替受測者操作"""
+
+    def __init__(self, window, answers=None, poll_ms=5):
+        self.window = window
+        self.answers = answers or {}
+        self.finished = False
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.step)
+        self.timer.start(poll_ms)
+
+    def choose(self, question_index, options):
+        """腳本作答：指定的選項索引，未指定時依題號輪流"""
+        scripted = self.answers.get(str(question_index + 1))
+        if scripted is not None:
+            return int(scripted) % len(options)
+        return question_index % len(options)
+
+    def step(self):
+        page = self.window.centralWidget()
+        if isinstance(page, InstructionPage):
+            page.name_input.setText("harness")
+            page.start_button.click()
+        elif isinstance(page, SimpleQuestionnairePage):
+            question = page.questions[page.current_index]
+            if question.get("multi_select", False):
+                page.checkboxes[self.choose(page.current_index, question["options"])].setChecked(True)
+            else:
+                page.button_group.buttons()[self.choose(page.current_index, question["options"])].setChecked(True)
+            page.next_button.click()
+        elif isinstance(page, IntervalPage):
+            if page.continue_button.isEnabled():
+                page.continue_button.click()
+        elif self.window.current_page_index == 8:
+            self.finished = True
+            self.timer.stop()
+            QApplication.instance().quit()
+
+
+def compute_alignment(result_dir):
+    """
+    以 event_log.csv 的 phase_start 與 PPGRAW 檔中第一筆帶該標籤的樣本比較
+
+    Returns:
+        dict: {phase: 誤差毫秒}
+    """
+    phase_starts = {}
+    with open(os.path.join(result_dir, "event_log.csv"), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["event_type"] == "phase_start" and row["phase"] not in phase_starts:
+                phase_starts[row["phase"]] = parse_timestamp(row["timestamp"])
+
+    first_sample = {}
+    with open_signal_file(resolve_signal_path(os.path.join(result_dir, "bio_result_ppgraw.csv"))) as f:
+        for row in csv.DictReader(f):
+            label = row["Current"]
+            if label not in first_sample:
+                first_sample[label] = parse_timestamp(row["Time"])
+
+    return {
+        phase: round((first_sample[phase] - phase_starts[phase]) * 1000.0, 1)
+        for phase in PHASES
+        if phase in phase_starts and phase in first_sample
+    }
+
+
+def run_harness(speed=100.0, port=18000, answers=None, timeout=600.0, keep=False):
+    work_dir = tempfile.mkdtemp(prefix="bio_harness_")
+    results_dir = os.path.join(work_dir, "test_result")
+    music_dir = os.path.join(work_dir, "music")
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # 加速各頁面的倒數刻度
+    tick_ms = max(1, int(round(1000 / speed)))
+    for page_class in (BaselinePage, MusicPageWithTimer, IntervalPage):
+        page_class.TICK_INTERVAL_MS = tick_ms
+
+    ExperimentConfig.results_base_path = results_dir
+    ExperimentConfig.music_base_path = music_dir
+    ExperimentConfig.bio_signal_host = "127.0.0.1"
+    ExperimentConfig.bio_signal_port = port
+    ExperimentConfig.bio_signal_udp_port = None
+
+    window = NewExperimentWindowWithBio(debug_mode=False)
+    category = window.music_catalog["categories"][0]
+    for song_id in ("001", "002"):
+        write_silent_wav(os.path.join(music_dir, category["name"], f"{category['code']}{song_id}.wav"))
+
+    rss_start = process_stats()["rss_mb"]
+    wearable = SimulatedWearable("127.0.0.1", port, speed=speed)
+    driver = ExperimentDriver(window, answers)
+
+    # 開始頁：勾選生理訊號後按下開始
+    window.category_combo.setCurrentIndex(0)
+    window.bio_checkbox.setChecked(True)
+    window.on_start_experiment()
+    wearable.start()
+
+    watchdog = QTimer()
+    watchdog.setSingleShot(True)
+    watchdog.timeout.connect(app.quit)
+    watchdog.start(int(timeout * 1000))
+
+    wall_start = time.time()
+    app.exec()
+    wall_time = time.time() - wall_start
+    wearable.stop()
+
+    result_dir = window.result_dir
+    end_stats = process_stats()
+    metrics = bioDataUtils.get_ingest_metrics()
+    alignment = compute_alignment(result_dir) if result_dir and driver.finished else {}
+    report = {
+        "completed": driver.finished,
+        "speed": speed,
+        "wall_time_s": round(wall_time, 2),
+        "simulated_time_s": round(wall_time * speed, 1),
+        "messages_sent": wearable.messages_sent,
+        "samples_sent": wearable.samples_sent,
+        "ingest_latency_ms": metrics.get("tcp", {}).get("latency_ms", {}),
+        "queue_counters": metrics.get("queue", {}).get("counters", {}),
+        "alignment_ms": alignment,
+        "max_alignment_ms": max((abs(v) for v in alignment.values()), default=None),
+        "rss_start_mb": rss_start,
+        "rss_end_mb": end_stats["rss_mb"],
+        "peak_rss_mb": end_stats["peak_rss_mb"],
+        "result_dir": result_dir,
+    }
+
+    window.close()
+    if result_dir:
+        with open(os.path.join(result_dir, "harness_report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if not keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        report["result_dir"] = None
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="無頭加速端對端實驗測試")
+    parser.add_argument("--speed", type=float, default=100.0, help="加速倍數（預設 100）")
+    parser.add_argument("--port", type=int, default=18000, help="生理訊號 TCP 端口（避免與實驗用 8000 衝突）")
+    parser.add_argument("--answers", help='問卷腳本 JSON，例如 {"1": 4, "2": 0}（題號 → 選項索引）')
+    parser.add_argument("--timeout", type=float, default=600.0, help="整體逾時秒數")
+    parser.add_argument("--keep", action="store_true", help="保留暫存結果目錄")
+    args = parser.parse_args()
+
+    report = run_harness(
+        speed=args.speed,
+        port=args.port,
+        answers=json.loads(args.answers) if args.answers else None,
+        timeout=args.timeout,
+        keep=args.keep,
+    )
+
+    print("=" * 70)
+    print("無頭實驗測試結果")
+    print("=" * 70)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0 if report["completed"] else 1)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# soak_test.py
+"""
+長時間浸泡測試 - 在同一個行程中連續跑完整個研究的所有場次
+
+- 受測者 × 場次數取自 ExperimentConfig.TOTAL_SUBJECTS / TOTAL_SESSIONS（30 × 6）
+- 每個場次經由 BioSignalManager 啟動接收、依實驗階段切換標籤、關閉，
+  模擬穿戴裝置以取樣率 × speed 串流
+- 每個場次結束後取樣：RSS、執行緒數、開啟的檔案描述子、寫檔延遲百分位數
+  （指定 --compression 時另記錄壓縮率與壓縮 CPU 時間）
+- 暖機後若出現成長趨勢即判定失敗（跨場次的狀態洩漏）
+
+用法：
+    python soak_test.py                       # 30 × 6 場次，500 倍速
+    python soak_test.py --subjects 3 --sessions 2 --speed 1000
+    python soak_test.py --compression gzip --level 6
+    python soak_test.py --output reports/soak    # 報告 soak_samples.csv / soak_summary.json 的位置
+
+未指定 --output 時報告寫入暫存目錄（--keep 時與各場次輸出放在一起），結束時印出路徑。
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ui.ExperimentConfig import ExperimentConfig
+from labels.LabelManager import LabelManager
+from bio_signal.bio_signal_manager import BioSignalManager
+from bio_signal.simulated_wearable import SimulatedWearable
+from bio_signal.ingest_metrics import process_stats
+from bio_signal.bioDataUtils import get_compression_stats
+
+# 標籤等設定檔以腳本位置為準，可在任何工作目錄執行
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUESTIONNAIRE_SECONDS = 60  # 問卷填寫時間（模擬）
+
+# (頁面索引, 階段長度秒)，頁面索引對應 labels/experiment_labels.json
+SESSION_PHASES = [
+    (1, ExperimentConfig.BASELINE_DURATION),
+    (2, ExperimentConfig.MUSIC_DURATION),
+    (3, QUESTIONNAIRE_SECONDS),
+    (4, ExperimentConfig.INTERVAL_MIN_DURATION),
+    (5, ExperimentConfig.MUSIC_DURATION),
+    (6, QUESTIONNAIRE_SECONDS),
+    (7, ExperimentConfig.INTERVAL_MIN_DURATION),
+]
+
+# 成長趨勢門檻
+RSS_GROWTH_LIMIT_MB = 30.0     # 依暖機後斜率推估整個研究的 RSS 成長上限
+THREAD_TOLERANCE = 1           # 場次結束後執行緒數可高於暖機基準的數量
+FD_TOLERANCE = 2               # 場次結束後檔案描述子可高於暖機基準的數量
+LATENCY_GROWTH_RATIO = 2.0     # 後段寫檔延遲 p99 相對前段的倍數上限
+LATENCY_GROWTH_MIN_MS = 10.0   # 同時須超過前段多少毫秒才算成長
+
+
+def run_session(label_manager, case_path, port, speed, compression=None, compression_level=None):
+    """跑一個場次，回傳該場次的寫檔與接收延遲"""
+    manager = BioSignalManager(label_manager)
+    manager.start_reading(case_path, host="127.0.0.1", port=port,
+                          compression=compression, compression_level=compression_level)
+    manager.start_writing()
+    wearable = SimulatedWearable("127.0.0.1", port, speed=speed)
+    wearable.start()
+
+    for page_index, duration in SESSION_PHASES:
+        label = label_manager.get_label_for_page(page_index)["label"]
+        manager.set_current(label)
+        manager.mark_label_event(label)
+        time.sleep(duration / speed)
+
+    wearable.stop()
+    metrics = manager.get_ingest_metrics()
+    manager.set_current(label_manager.get_label_for_page(8)["label"])
+    manager.close()
+    return {
+        "compression": get_compression_stats() if compression else None,
+        "write_latency_ms": metrics.get("write", {}).get("latency_ms", {}),
+        "ingest_latency_ms": metrics.get("tcp", {}).get("latency_ms", {}),
+        "samples_sent": wearable.samples_sent,
+        "queue_counters": metrics.get("queue", {}).get("counters", {}),
+    }
+
+
+def check_trends(samples, warmup):
+    """
+    依暖機後的取樣判斷是否有成長趨勢
+
+    Returns:
+        List[str]: 失敗原因，空清單表示通過
+    """
+    failures = []
+    steady = samples[warmup:]
+    if len(steady) < 3:
+        return failures
+    baseline = samples[warmup - 1] if warmup > 0 else samples[0]
+
+    rss = [s["rss_mb"] for s in steady if s["rss_mb"] is not None]
+    if len(rss) >= 3:
+        slope = np.polyfit(np.arange(len(rss)), rss, 1)[0]
+        projected = slope * len(samples)
+        if projected > RSS_GROWTH_LIMIT_MB:
+            failures.append(f"RSS 持續成長：{slope:.3f} MB/場次，推估整個研究 +{projected:.1f} MB")
+
+    max_threads = max(s["threads"] for s in steady)
+    if max_threads > baseline["threads"] + THREAD_TOLERANCE:
+        failures.append(f"執行緒未回收：暖機後 {baseline['threads']} → 最多 {max_threads}")
+
+    fds = [s["open_fds"] for s in steady if s["open_fds"] is not None]
+    if fds and baseline["open_fds"] is not None and max(fds) > baseline["open_fds"] + FD_TOLERANCE:
+        failures.append(f"檔案描述子未關閉：暖機後 {baseline['open_fds']} → 最多 {max(fds)}")
+
+    p99 = [s["write_p99_ms"] for s in steady if s["write_p99_ms"] is not None]
+    if len(p99) >= 4:
+        quarter = max(1, len(p99) // 4)
+        early, late = float(np.median(p99[:quarter])), float(np.median(p99[-quarter:]))
+        if late > early * LATENCY_GROWTH_RATIO and late - early > LATENCY_GROWTH_MIN_MS:
+            failures.append(f"寫檔延遲 p99 成長：{early:.1f} ms → {late:.1f} ms")
+    return failures
+
+
+def run_soak(subjects, sessions, speed, port, keep=False, compression=None, compression_level=None,
+             output_dir=None):
+    work_dir = tempfile.mkdtemp(prefix="bio_soak_")
+    label_manager = LabelManager(os.path.join(ROOT_DIR, ExperimentConfig.labels_path))
+    samples = []
+    start = time.time()
+
+    for subject_id in range(1, subjects + 1):
+        for session_number in range(1, sessions + 1):
+            group = "A" if subject_id % 2 else "B"
+            case_path = os.path.join(work_dir, f"P{subject_id:03d}_S{session_number}_G{group}_BIO_soak")
+            os.makedirs(case_path, exist_ok=True)
+
+            session_start = time.time()
+            result = run_session(label_manager, case_path, port, speed, compression, compression_level)
+            stats = process_stats()
+            sample = {
+                "index": len(samples),
+                "subject": subject_id,
+                "session": session_number,
+                "session_s": round(time.time() - session_start, 2),
+                "rss_mb": stats["rss_mb"],
+                "threads": stats["threads"],
+                "open_fds": stats["open_fds"],
+                "write_p50_ms": result["write_latency_ms"].get("p50"),
+                "write_p99_ms": result["write_latency_ms"].get("p99"),
+                "ingest_p99_ms": result["ingest_latency_ms"].get("p99"),
+                "samples_sent": result["samples_sent"],
+                "dropped": sum(v for k, v in result["queue_counters"].items() if k.startswith("dropped_")),
+                "compression_ratio": result["compression"]["ratio"] if result["compression"] else None,
+                "compression_cpu_ms": result["compression"]["cpu_ms"] if result["compression"] else None,
+            }
+            samples.append(sample)
+            print(f"[Soak] P{subject_id:03d} S{session_number}: RSS {sample['rss_mb']} MB, "
+                  f"執行緒 {sample['threads']}, fd {sample['open_fds']}, "
+                  f"寫檔 p99 {sample['write_p99_ms']} ms")
+
+            if not keep:
+                shutil.rmtree(case_path, ignore_errors=True)
+
+    warmup = min(5, max(1, len(samples) // 5))
+    failures = check_trends(samples, warmup)
+    summary = {
+        "passed": not failures,
+        "failures": failures,
+        "sessions": len(samples),
+        "warmup_sessions": warmup,
+        "speed": speed,
+        "compression": compression,
+        "wall_time_s": round(time.time() - start, 1),
+        "first": samples[0] if samples else None,
+        "last": samples[-1] if samples else None,
+    }
+
+    if output_dir:
+        report_dir = output_dir
+        os.makedirs(report_dir, exist_ok=True)
+    elif keep:
+        report_dir = work_dir
+    else:
+        report_dir = tempfile.mkdtemp(prefix="bio_soak_report_")
+    summary["report_dir"] = report_dir
+    if samples:
+        with open(os.path.join(report_dir, "soak_samples.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0].keys()))
+            writer.writeheader()
+            writer.writerows(samples)
+    with open(os.path.join(report_dir, "soak_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    if not keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="長時間浸泡測試（記憶體與延遲回歸）")
+    parser.add_argument("--subjects", type=int, default=ExperimentConfig.TOTAL_SUBJECTS)
+    parser.add_argument("--sessions", type=int, default=ExperimentConfig.TOTAL_SESSIONS)
+    parser.add_argument("--speed", type=float, default=500.0, help="加速倍數（預設 500）")
+    parser.add_argument("--port", type=int, default=18100, help="生理訊號 TCP 端口")
+    parser.add_argument("--keep", action="store_true", help="保留各場次輸出")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], help="輸出壓縮格式")
+    parser.add_argument("--level", type=int, help="壓縮等級")
+    parser.add_argument("--output", help="報告輸出目錄（預設為暫存目錄）")
+    args = parser.parse_args()
+
+    summary = run_soak(args.subjects, args.sessions, args.speed, args.port, args.keep,
+                       args.compression, args.level, args.output)
+    print("=" * 70)
+    print("浸泡測試結果：" + ("通過" if summary["passed"] else "失敗"))
+    print("=" * 70)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    sys.exit(0 if summary["passed"] else 1)
@@ -10,6 +10,8 @@ from PySide6.QtGui import QFont
 class BaselinePage(QWidget):
     """Baseline階段頁面 - 3分鐘倒數計時"""
 
+    TICK_INTERVAL_MS = 1000  # 每一秒倒數的實際毫秒數，無頭測試可調小以加速
+
     def __init__(self, duration_seconds: int, next_callback, debug_mode: bool = False):
         """
         初始化Baseline頁面
@@ -89,7 +91,7 @@ class BaselinePage(QWidget):
 
     def start_timer(self):
         """開始倒數計時"""
-        self.timer.start(1000)  # 每秒更新一次
+        self.timer.start(self.TICK_INTERVAL_MS)  # 每秒更新一次
 
     def update_timer(self):
         """更新計時器"""
@@ -0,0 +1,33 @@
+# ui/ExperimentConfig.py
+"""
+新實驗（含生理訊號）配置
+不依賴 Qt：soak_test、bio_analysis 等無頭工具可直接匯入，不需載入 PySide6。
+"""
+
+
+class ExperimentConfig:
+    """新實驗配置"""
+    # 時間設定（秒）
+    BASELINE_DURATION = 180      # 3分鐘
+    MUSIC_DURATION = 300         # 5分鐘
+    INTERVAL_MIN_DURATION = 180  # 至少3分鐘
+
+    # 受測者設定
+    TOTAL_SUBJECTS = 30
+    TOTAL_SESSIONS = 6
+
+    # 路徑設定
+    music_base_path = "./music/"
+    results_base_path = "./test_result/"
+    catalog_path = "./music_catalog.json"
+    questionnaire_path = "./ui/json/new_experiment/"
+    labels_path = "./labels/experiment_labels.json"
+
+    # 生理訊號設定
+    bio_signal_host = "0.0.0.0"
+    bio_signal_port = 8000
+    bio_signal_udp_port = 10000  # 高頻訊號可改走 UDP，由客戶端選擇
+    bio_signal_wire_capture = False  # 記錄 TCP 原始資料供事後重播
+    bio_signal_compression = None    # 輸出壓縮："gzip" / "zstd"，None 為純文字 CSV
+    bio_signal_compression_level = None
+    bio_signal_segment_by_phase = False  # 依實驗階段分段輸出（各階段獨立檔案＋分段清單）
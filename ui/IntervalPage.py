@@ -10,6 +10,8 @@ from PySide6.QtGui import QFont
 class IntervalPage(QWidget):
     """間隔休息頁面 - 至少3分鐘"""
 
+    TICK_INTERVAL_MS = 1000  # 每一秒倒數的實際毫秒數，無頭測試可調小以加速
+
     def __init__(self, min_duration_seconds: int, next_callback, debug_mode: bool = False):
         """
         初始化間隔休息頁面
@@ -108,7 +110,7 @@ class IntervalPage(QWidget):
 
     def start_timer(self):
         """開始計時"""
-        self.timer.start(1000)  # 每秒更新一次
+        self.timer.start(self.TICK_INTERVAL_MS)  # 每秒更新一次
 
     def update_timer(self):
         """更新計時器"""
@@ -11,6 +11,8 @@ from PySide6.QtGui import QFont
 class MusicPageWithTimer(QWidget):
     """音樂播放頁面 - 含5分鐘倒數計時"""
 
+    TICK_INTERVAL_MS = 1000  # 每一秒倒數的實際毫秒數，無頭測試可調小以加速
+
     def __init__(self, music_path: str, music_title: str, duration_seconds: int,
                  next_page_callback, debug_mode: bool = False):
         """
@@ -121,7 +123,7 @@ class MusicPageWithTimer(QWidget):
     def start_music(self):
         """開始播放音樂和倒數計時"""
         self.player.play()
-        self.countdown_timer.start(1000)  # 每秒更新一次
+        self.countdown_timer.start(self.TICK_INTERVAL_MS)  # 每秒更新一次
         print(f"[MusicPage] 開始播放：{self.music_path}，時長：{self.duration_seconds}秒")
 
     def update_countdown(self):
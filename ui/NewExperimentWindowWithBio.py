@@ -33,31 +33,8 @@ from ui.EventLogger import EventLogger, Phase
 from bio_signal.bio_signal_manager import BioSignalManager
 from labels.LabelManager import LabelManager
 
-# =============================================================================
-# 配置類別
-# =============================================================================
-
-class ExperimentConfig:
-    """新實驗配置"""
-    # 時間設定（秒）
-    BASELINE_DURATION = 180      # 3分鐘
-    MUSIC_DURATION = 300         # 5分鐘
-    INTERVAL_MIN_DURATION = 180  # 至少3分鐘
-
-    # 受測者設定
-    TOTAL_SUBJECTS = 30
-    TOTAL_SESSIONS = 6
-
-    # 路徑設定
-    music_base_path = "./music/"
-    results_base_path = "./test_result/"
-    catalog_path = "./music_catalog.json"
-    questionnaire_path = "./ui/json/new_experiment/"
-    labels_path = "./labels/experiment_labels.json"
-
-    # 生理訊號設定
-    bio_signal_host = "0.0.0.0"
-    bio_signal_port = 8000
+# 配置類別（不依賴 Qt，供 soak_test 等無頭工具直接匯入）
+from ui.ExperimentConfig import ExperimentConfig
 
 # =============================================================================
 # 主視窗
@@ -333,7 +310,12 @@ class NewExperimentWindowWithBio(QMainWindow):
             self.bio_signal_manager.start_reading(
                 case_path=self.result_dir,
                 host=self.config.bio_signal_host,
-                port=self.config.bio_signal_port
+                port=self.config.bio_signal_port,
+                udp_port=self.config.bio_signal_udp_port,
+                capture_wire=self.config.bio_signal_wire_capture,
+                compression=self.config.bio_signal_compression,
+                compression_level=self.config.bio_signal_compression_level,
+                segment_by_phase=self.config.bio_signal_segment_by_phase
             )
             # ✅ 開始寫入數據
             self.bio_signal_manager.start_writing()
@@ -416,7 +398,11 @@ class NewExperimentWindowWithBio(QMainWindow):
             "debug_mode": self.debug_mode,
             "bio_signal_enabled": self.enable_bio_signal,
             "bio_signal_host": self.config.bio_signal_host if self.enable_bio_signal else None,
-            "bio_signal_port": self.config.bio_signal_port if self.enable_bio_signal else None
+            "bio_signal_port": self.config.bio_signal_port if self.enable_bio_signal else None,
+            "bio_signal_udp_port": self.config.bio_signal_udp_port if self.enable_bio_signal else None,
+            "bio_signal_wire_capture": self.config.bio_signal_wire_capture if self.enable_bio_signal else None,
+            "bio_signal_compression": self.config.bio_signal_compression if self.enable_bio_signal else None,
+            "bio_signal_segment_by_phase": self.config.bio_signal_segment_by_phase if self.enable_bio_signal else None
         }
 
         info_path = os.path.join(self.result_dir, "experiment_info.json")